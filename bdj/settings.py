@@ -1,3 +1,4 @@
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -22,13 +23,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.JetonMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.AdmissionMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'bdj.urls'
@@ -51,19 +57,135 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'bdj.wsgi.application'
 
-from decouple import config 
+from decouple import config, Csv
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': config('DB_ENGINE', default='django.db.backends.postgresql'),
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
-        'PORT': config('DB_PORT', default='5432')
+        'PORT': config('DB_PORT', default='5432'),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['OPTIONS'] = {
+        # Server-wide ceiling; views may lower it through their query budget.
+        'options': f"-c statement_timeout={config('DB_STATEMENT_TIMEOUT_MS', default=30000, cast=int)}",
+    }
+    if config('DB_POOL', default=True, cast=bool):
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError:
+            pass
+        else:
+            DATABASES['default']['OPTIONS']['pool']['check'] = ConnectionPool.check_connection
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
+
+# Read replicas share the primary's credentials; tests mirror them onto the primary.
+for index, host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db_routers.PrimaryReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+
+# After a write, the client keeps reading from the primary for this many seconds.
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+REPLICA_PIN_COOKIE = 'bdj_primary'
+
+# Shared cache (rate-limit counters, token revocations, access rights). The
+# in-memory default is per process; production should point at Redis or Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+TESTING = sys.argv[1:2] == ['test']
+
+# Query budgets declared by views fail the test suite and are logged in production.
+QUERY_BUDGET_RAISE = config('QUERY_BUDGET_RAISE', default=TESTING, cast=bool)
+DEFAULT_QUERY_BUDGET = {'max_queries': 50, 'max_db_ms': 1000}
+
+# Opt-in per-view timing (DB / serialization / render), /metrics/ and X-Profile sampling.
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION', default=False, cast=bool)
+INSTRUMENTATION_ALLOWED_IPS = config('INSTRUMENTATION_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+PROFILE_DIR = Path(config('PROFILE_DIR', default=str(BASE_DIR / 'profiles')))
+if INSTRUMENTATION_ENABLED:
+    MIDDLEWARE.insert(0, 'core.middleware.InstrumentationMiddleware')
+
+# Server-sent events feed (/api/async/evenements/). The in-process broker only
+# reaches clients connected to the same ASGI process.
+EVENT_BROKER = config('EVENT_BROKER', default='core.events.InProcessBroker')
+EVENT_HEARTBEAT_SECONDS = 15
+EVENT_RETRY_MS = 3000
+
+# Signed API tokens (/api/jetons/) carry the user's resolved profile, so
+# authenticated requests need no database lookup. Revocations are shared
+# through the cache and re-read by each process at most this often.
+API_TOKEN_TTL_SECONDS = config('API_TOKEN_TTL_SECONDS', default=8 * 3600, cast=int)
+API_TOKEN_REVOCATION_REFRESH_SECONDS = 5
+
+# Rate limiting and load shedding for the classes views declare (rate_class,
+# concurrency_class). Token buckets are keyed by token user or client IP, so
+# REMOTE_ADDR must be the client address (set by the reverse proxy). Counters
+# live in the cache and need a shared backend (CACHE_BACKEND) to hold across
+# processes.
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=not TESTING, cast=bool)
+RATE_LIMITS = {
+    'auth': '10/min',
+    'search': '120/min',
+    'export': '30/min',
+    'stats': '30/min',
+}
+CONCURRENCY_LIMITS = {
+    'heavy': config('CONCURRENCY_HEAVY', default=8, cast=int),
+}
+CONCURRENCY_RETRY_AFTER_SECONDS = 2
+
+# Convocations to hearings (envoyer_convocations): hearings of the next
+# CONVOCATION_DELAI_JOURS days are queued, then sent by workers through the
+# transport configured for each channel. Failed sends are retried with
+# exponential backoff; a claimed batch is released after the lease.
+CONVOCATION_DELAI_JOURS = config('CONVOCATION_DELAI_JOURS', default=15, cast=int)
+CONVOCATION_TRANSPORTS = {
+    'EMAIL': config('CONVOCATION_EMAIL_TRANSPORT', default='core.convocations.ConsoleTransport'),
+    'COURRIER': config('CONVOCATION_COURRIER_TRANSPORT', default='core.convocations.FichierTransport'),
+}
+CONVOCATION_FILE = Path(config('CONVOCATION_FILE', default=str(BASE_DIR / 'convocations.jsonl')))
+CONVOCATION_MAX_TENTATIVES = 5
+CONVOCATION_BACKOFF_SECONDS = 60
+CONVOCATION_BACKOFF_MAX_SECONDS = 6 * 3600
+CONVOCATION_LEASE_SECONDS = 300
+CONVOCATION_POLL_SECONDS = 10
+
+# Delta sync (/api/sync/) leaves the most recent changes for the next call so
+# rows committed late by in-flight transactions are not skipped.
+SYNC_SETTLE_SECONDS = 2
+
+# Judicial numbers (numero_rg, numero_decision) follow each other per tribunal,
+# year and type. Each process reserves NUMERO_BLOC numbers at a time and hands
+# them out from memory; numbers left in an abandoned block show up as gaps.
+NUMERO_BLOC = config('NUMERO_BLOC', default=20, cast=int)
+NUMERO_FORMATS = {
+    'RG': 'RG/{tribunal}/{annee}/{numero:06d}',
+    'DECISION': 'DEC/{tribunal}/{annee}/{numero:06d}',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -102,6 +224,9 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -117,7 +242,21 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'core.authentication.JetonAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
+
+# API response compression; zstd and br are offered when zstandard/brotli are installed.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = ['application/json', 'text/csv', 'text/plain', 'application/javascript']
+COMPRESSION_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
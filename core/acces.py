@@ -0,0 +1,162 @@
+"""Confidentialité au niveau des lignes.
+
+Les droits d'un utilisateur se résument à un :class:`Acces` (magistrat,
+avocat, utilisateur, accès total), mis en cache par utilisateur. Il se
+compile en un unique filtre SQL par modèle — les attributions et les
+constitutions d'avocat y figurent en sous-requêtes — appliqué par
+``Model.objects.visibles(acces)`` : les listes ne vérifient jamais les
+droits ligne par ligne en Python.
+
+Sont réservés aux personnes ayant un accès direct au dossier (magistrat
+saisi ou tenant une audience, attributaire, avocat constitué) : les dossiers
+confidentiels et tout ce qui s'y rattache, les pièces confidentielles, les
+audiences non publiques et les notes non publiques (que leur auteur voit
+toujours). Une partie n'est visible qu'à travers l'un des dossiers où elle
+est constituée.
+"""
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+
+from .models import (
+    Attribution, Audience, Dossier, IndexPartie, MouvementScelle, Note, Partie, PartieAuDossier, PieceJointe,
+    VoieRecours,
+)
+
+
+CACHE_TIMEOUT = 300
+
+# Champ menant au dossier, pour les modèles qui ne l'atteignent pas par ``dossier``
+CHEMINS_DOSSIER = {
+    Dossier: '',
+    VoieRecours: 'dossier_recours',
+    MouvementScelle: 'scelle__dossier',
+    # Plusieurs dossiers : la partie est visible si l'un de ceux où elle est constituée l'est
+    Partie: 'dossiers__dossier',
+}
+
+# Index portant sa propre copie de la confidentialité du dossier (pas de jointure)
+CONFIDENTIALITE_LOCALE = {
+    IndexPartie: 'est_confidentiel',
+}
+
+# Lignes réservées à l'accès direct même quand le dossier est visible
+RESTREINTS = {
+    PieceJointe: Q(est_confidentielle=True),
+    Audience: Q(est_publique=False),
+    Note: Q(est_publique=False),
+}
+
+
+def chemin_dossier(model):
+    """Chemin ORM vers le dossier de ``model`` ; ``None`` si le modèle n'en dépend pas"""
+    if model in CHEMINS_DOSSIER:
+        return CHEMINS_DOSSIER[model]
+    try:
+        field = model._meta.get_field('dossier')
+    except FieldDoesNotExist:
+        return None
+    return 'dossier' if field.related_model is Dossier else None
+
+
+@dataclass(frozen=True)
+class Acces:
+    utilisateur_id: int = None
+    magistrat_id: object = None
+    avocat_id: object = None
+    tout: bool = False
+
+    def directs(self, chemin=''):
+        """Dossiers auxquels l'utilisateur a un accès direct"""
+        prefixe = f'{chemin}__' if chemin else ''
+        identifiant = f"{chemin or 'pk'}__in"
+        q = Q(pk__in=[])
+        if self.magistrat_id:
+            q |= Q(**{f'{prefixe}magistrat_siege_id': self.magistrat_id})
+            q |= Q(**{f'{prefixe}magistrat_parquet_id': self.magistrat_id})
+            q |= Q(**{identifiant: Audience.objects.filter(magistrat_id=self.magistrat_id).values('dossier_id')})
+        if self.avocat_id:
+            q |= Q(**{identifiant: PartieAuDossier.objects.filter(
+                avocat_id=self.avocat_id, est_actif=True).values('dossier_id')})
+        if self.utilisateur_id:
+            q |= Q(**{identifiant: Attribution.objects.filter(
+                attribue_a_id=self.utilisateur_id, est_actif=True).values('dossier_id')})
+        return q
+
+    def dossiers(self, chemin=''):
+        """Dossiers visibles : non confidentiels, ou en accès direct"""
+        if self.tout:
+            return Q()
+        prefixe = f'{chemin}__' if chemin else ''
+        return Q(**{f'{prefixe}est_confidentiel': False}) | self.directs(chemin)
+
+    def filtre(self, model):
+        """Filtre des lignes de ``model`` visibles"""
+        chemin = chemin_dossier(model)
+        if self.tout or chemin is None:
+            return Q()
+        if model in CONFIDENTIALITE_LOCALE:
+            q = Q(**{CONFIDENTIALITE_LOCALE[model]: False}) | self.directs(chemin)
+        else:
+            q = self.dossiers(chemin)
+        if model in RESTREINTS:
+            exception = self.directs(chemin)
+            if model is Note and self.utilisateur_id:
+                exception |= Q(auteur_id=self.utilisateur_id)
+            q &= ~RESTREINTS[model] | exception
+        lien = chemin.split('__')[0]
+        if lien and model._meta.get_field(lien).one_to_many:
+            # Relation multiple : une sous-requête plutôt qu'une jointure, qui dupliquerait les lignes
+            q = Q(pk__in=model.objects.filter(q, **{f'{lien}__est_actif': True}).values('pk'))
+        return q
+
+
+ANONYME = Acces()
+
+# Appels internes (commandes, tâches) : les vues passent toujours l'accès de la requête
+TOUT = Acces(tout=True)
+
+
+def cache_key(user_id):
+    return f'core:acces:{user_id}'
+
+
+def acces_pour(user):
+    """Accès de ``user``, lu en une requête puis mis en cache"""
+    if user is None or not user.is_authenticated:
+        return ANONYME
+    if isinstance(getattr(user, 'acces', None), Acces):
+        # Principal d'un jeton : l'accès y est déjà résolu
+        return user.acces
+    acces = cache.get(cache_key(user.pk))
+    if acces is None:
+        row = User.objects.filter(pk=user.pk).values('is_superuser', 'magistrat__id', 'avocat__id').first() or {}
+        acces = Acces(utilisateur_id=user.pk, magistrat_id=row.get('magistrat__id'),
+                      avocat_id=row.get('avocat__id'), tout=bool(row.get('is_superuser')))
+        cache.set(cache_key(user.pk), acces, CACHE_TIMEOUT)
+    return acces
+
+
+def invalider(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def acces_requete(request):
+    """Accès de l'utilisateur de la requête, calculé une fois par requête"""
+    if not hasattr(request, '_acces'):
+        request._acces = acces_pour(getattr(request, 'user', None))
+    return request._acces
+
+
+async def aacces_requete(request):
+    if not hasattr(request, '_acces'):
+        user = await request.auser() if hasattr(request, 'auser') else None
+        if user is None or not user.is_authenticated or isinstance(getattr(user, 'acces', None), Acces):
+            request._acces = acces_pour(user)
+        else:
+            request._acces = await sync_to_async(acces_pour)(user)
+    return request._acces
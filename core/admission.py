@@ -0,0 +1,108 @@
+"""Limitation de débit et délestage des endpoints coûteux.
+
+Les vues déclarent une classe de débit (``rate_class = 'search'``) et,
+pour les plus lourdes, une classe de concurrence (``concurrency_class =
+'heavy'``), éventuellement par action comme ``query_budget``.
+
+Le débit est un seau à jetons par client (utilisateur du jeton d'accès,
+sinon adresse IP) et par classe, de capacité et de recharge données par
+``RATE_LIMITS`` (``'60/min'`` : 60 requêtes d'affilée, puis une par
+seconde). La concurrence est un compteur global par classe, borné par
+``CONCURRENCY_LIMITS`` : au-delà, la requête est délestée (503) plutôt que
+mise en file. Les compteurs vivent dans le cache, partagé entre processus
+en production.
+"""
+import math
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PERIODES = {'s': 1, 'sec': 1, 'min': 60, 'h': 3600, 'hour': 3600, 'j': 86400, 'day': 86400}
+
+# Un compteur de concurrence qui aurait fui (processus tué en cours de requête)
+# est remis à zéro après ce délai sans nouvelle entrée
+CONCURRENCY_TTL = 300
+
+
+@dataclass(frozen=True)
+class Debit:
+    capacite: int
+    par_seconde: float
+
+    @classmethod
+    def depuis(cls, texte):
+        """``'60/min'`` → 60 jetons, rechargés à raison d'un par seconde"""
+        nombre, _, periode = texte.partition('/')
+        return cls(int(nombre), int(nombre) / PERIODES[periode])
+
+
+def debit(classe):
+    texte = settings.RATE_LIMITS.get(classe)
+    return Debit.depuis(texte) if texte else None
+
+
+def client(request):
+    principal = getattr(request, 'principal', None)
+    if principal is not None:
+        return f'u{principal.id}'
+    return f"ip{request.META.get('REMOTE_ADDR', '')}"
+
+
+def prendre(cle, debit, now=None):
+    """Prend un jeton du seau ``cle`` ; renvoie l'attente en secondes (0 si admis).
+
+    Lecture puis écriture sans verrou : sous forte contention, deux processus
+    peuvent consommer le même jeton, ce qui ne laisse passer que quelques
+    requêtes de trop.
+    """
+    now = time.time() if now is None else now
+    jetons, instant = cache.get(cle) or (debit.capacite, now)
+    jetons = min(debit.capacite, jetons + (now - instant) * debit.par_seconde)
+    if jetons < 1:
+        return (1 - jetons) / debit.par_seconde
+    cache.set(cle, (jetons - 1, now), math.ceil(debit.capacite / debit.par_seconde) + 1)
+    return 0
+
+
+def admettre(request, classe):
+    """Attente avant nouvel essai pour ce client, 0 s'il peut passer"""
+    limite = debit(classe)
+    if limite is None:
+        return 0
+    return prendre(f'core:debit:{classe}:{client(request)}', limite)
+
+
+def entrer(classe):
+    """Réserve une place parmi les requêtes concurrentes de ``classe`` ; ``False`` si tout est pris"""
+    limite = settings.CONCURRENCY_LIMITS.get(classe)
+    if limite is None:
+        return True
+    cle = f'core:concurrence:{classe}'
+    cache.add(cle, 0, CONCURRENCY_TTL)
+    try:
+        en_cours = cache.incr(cle)
+    except ValueError:
+        # Expiré entre add et incr
+        cache.add(cle, 1, CONCURRENCY_TTL)
+        en_cours = 1
+    # Prolongé à chaque entrée : il ne doit pas expirer sous des requêtes encore en cours
+    cache.touch(cle, CONCURRENCY_TTL)
+    if en_cours > limite:
+        sortir(classe)
+        return False
+    return True
+
+
+def sortir(classe):
+    if classe not in settings.CONCURRENCY_LIMITS:
+        return
+    cle = f'core:concurrence:{classe}'
+    try:
+        if cache.decr(cle) < 0:
+            # Compteur expiré puis recréé pendant la requête : jamais négatif, il relèverait la limite
+            cache.incr(cle)
+    except ValueError:
+        pass
@@ -0,0 +1,114 @@
+"""Vues asynchrones pour les endpoints dominés par les entrées/sorties.
+
+Servies par un serveur ASGI (``uvicorn bdj.asgi:application``), elles
+libèrent la boucle d'événements pendant les accès base et fichiers au lieu
+de bloquer un thread de travail. Elles reprennent les requêtes de
+:mod:`core.queries` et les réponses de leurs équivalents synchrones.
+"""
+import asyncio
+import json
+import mimetypes
+import uuid
+from pathlib import PurePath
+
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from . import events, queries
+from .acces import aacces_requete
+from .budgets import SESSION, query_budget
+from .models import PieceJointe
+from .views import parse_jour, search_params
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+@query_budget(max_queries=3 + SESSION, statement_timeout_ms=2000)
+async def recherche(request):
+    terme, limit = search_params(request)
+    if terme is None:
+        return JsonResponse({'detail': "Le terme de recherche doit compter au moins 2 caractères"}, status=400)
+    dossiers, parties = queries.recherche(terme, limit, await aacces_requete(request))
+    return JsonResponse({
+        'dossiers': [row async for row in dossiers],
+        'parties': [row async for row in parties],
+    })
+
+
+recherche.replica_actions = ('get',)
+recherche.rate_class = 'search'
+
+
+@query_budget(max_queries=2 + SESSION, statement_timeout_ms=2000)
+async def role_audience(request, tribunal_id):
+    jour = parse_jour(request)
+    if jour is None:
+        return JsonResponse({'detail': "Date invalide (AAAA-MM-JJ attendu)"}, status=400)
+    acces = await aacces_requete(request)
+    audiences = [row async for row in queries.role_audience(tribunal_id, jour, acces)]
+    return JsonResponse({'date': jour, 'audiences': audiences})
+
+
+role_audience.replica_actions = ('get',)
+role_audience.rate_class = 'search'
+
+
+async def read_chunks(fieldfile, chunk_size=CHUNK_SIZE):
+    """Lit le fichier par blocs dans un thread sans bloquer la boucle d'événements"""
+    handle = await asyncio.to_thread(fieldfile.storage.open, fieldfile.name, 'rb')
+    try:
+        while chunk := await asyncio.to_thread(handle.read, chunk_size):
+            yield chunk
+    finally:
+        await asyncio.to_thread(handle.close)
+
+
+@query_budget(max_queries=2 + SESSION)
+async def piece_fichier(request, pk):
+    try:
+        piece = await PieceJointe.objects.visibles(await aacces_requete(request)).aget(pk=pk, est_actif=True)
+    except PieceJointe.DoesNotExist:
+        raise Http404
+    if not piece.fichier or not await asyncio.to_thread(piece.fichier.storage.exists, piece.fichier.name):
+        raise Http404
+    name = PurePath(piece.fichier.name).name
+    response = StreamingHttpResponse(
+        read_chunks(piece.fichier),
+        content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream',
+    )
+    response['Content-Disposition'] = content_disposition_header(True, name)
+    response['Content-Length'] = await asyncio.to_thread(piece.fichier.storage.size, piece.fichier.name)
+    return response
+
+
+piece_fichier.rate_class = 'export'
+
+
+async def event_stream(channel, last_event_id=None):
+    """Flux Server-Sent Events : un message par événement, un commentaire en guise de heartbeat"""
+    yield f"retry: {settings.EVENT_RETRY_MS}\n\n"
+    stream = events.get_broker().subscribe(channel, last_event_id, settings.EVENT_HEARTBEAT_SECONDS)
+    async for item in stream:
+        if item is None:
+            yield ": ping\n\n"
+            continue
+        event_id, event = item
+        data = json.dumps(event, separators=(',', ':'), ensure_ascii=False)
+        yield f"id: {event_id}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+@query_budget(max_queries=0)
+async def evenements(request):
+    """Changements de dossiers, audiences et notes, filtrables par tribunal (``?tribunal=``)"""
+    tribunal = request.GET.get('tribunal')
+    try:
+        channel = events.tribunal_channel(uuid.UUID(tribunal)) if tribunal else events.ALL_CHANNEL
+        last_event_id = int(request.headers['Last-Event-ID']) if 'Last-Event-ID' in request.headers else None
+    except ValueError:
+        return JsonResponse({'detail': "Paramètre tribunal ou Last-Event-ID invalide"}, status=400)
+    response = StreamingHttpResponse(event_stream(channel, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
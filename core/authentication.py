@@ -0,0 +1,24 @@
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+
+from . import jetons
+
+
+class JetonAuthentication(BaseAuthentication):
+    """Authentification DRF par jeton signé (``Authorization: Bearer …``), sans accès à la base"""
+
+    def authenticate(self, request):
+        # Déjà vérifié par JetonMiddleware pour les requêtes qui l'ont traversé
+        principal = getattr(request._request, 'principal', None)
+        if principal is not None:
+            return principal, None
+        jeton = jetons.jeton_requete(request)
+        if jeton is None:
+            return None
+        try:
+            return jetons.lire(jeton), jeton
+        except jetons.JetonInvalide as exc:
+            raise exceptions.AuthenticationFailed(str(exc))
+
+    def authenticate_header(self, request):
+        return 'Bearer'
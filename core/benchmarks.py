@@ -0,0 +1,283 @@
+"""Suite de benchmarks des requêtes et endpoints clés.
+
+Chaque benchmark est une fabrique enregistrée avec :func:`benchmark` : appelée
+une fois pour préparer ses données, elle renvoie la fonction sans argument
+qui sera chronométrée. Les résultats sont comparés aux références de
+``benchmark_baselines.json``, rangées par moteur de base de données.
+"""
+import json
+import statistics
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.db import connection, reset_queries
+from django.db.models import Count, F, Sum
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import compression, ledger, parties, plans
+from .models import Audience, Dossier, Frais, Partie, PartieAuDossier, Tribunal
+from .renderers import FastJSONRenderer
+from .serializers import AudienceSerializer, DossierSerializer
+
+
+BASELINES_PATH = Path(__file__).resolve().parent / 'benchmark_baselines.json'
+
+registry = {}
+
+
+def benchmark(name):
+    """Enregistre une fabrique de benchmark sous ``name``"""
+    def decorator(factory):
+        registry[name] = factory
+        return factory
+    return decorator
+
+
+def measure(run, repeat):
+    """Exécute ``run`` ``repeat`` fois ; médiane et p95 en ms, requêtes par exécution.
+
+    Quand ``run`` renvoie des octets, leur taille est relevée (``bytes``).
+    """
+    output = run()  # Échauffement : caches, compilation des requêtes
+    timings = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    result = {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'queries': len(queries) // repeat,
+    }
+    if isinstance(output, bytes):
+        result['bytes'] = len(output)
+    return result
+
+
+def run_benchmarks(names=None, repeat=20):
+    results = {}
+    for name in names or sorted(registry):
+        results[name] = measure(registry[name](), repeat)
+        reset_queries()
+    return results
+
+
+def load_baselines():
+    if BASELINES_PATH.exists():
+        return json.loads(BASELINES_PATH.read_text()).get(connection.vendor, {})
+    return {}
+
+
+def save_baselines(results):
+    data = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+    data.setdefault(connection.vendor, {}).update(results)
+    BASELINES_PATH.write_text(json.dumps(data, indent=2, sort_keys=True) + '\n')
+
+
+def regressions(results, baselines, tolerance):
+    """Benchmarks plus lents que la référence au-delà de ``tolerance`` ou plus bavards en SQL"""
+    found = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        if result['median_ms'] > baseline['median_ms'] * (1 + tolerance):
+            found.append(f"{name}: {result['median_ms']} ms (référence {baseline['median_ms']} ms)")
+        if result['queries'] > baseline['queries']:
+            found.append(f"{name}: {result['queries']} requêtes (référence {baseline['queries']})")
+    return found
+
+
+# (référence, version optimisée) → gain minimal attendu, vérifié quand les deux sont exécutés.
+# Les plans compilés visent 5× sur la construction seule : de bout en bout, la lecture SQL
+# (compilation de la requête, décodage des dates et UUID) n'en dépend pas et borne le gain
+# entre 2 et 3× sous SQLite — ``serialize.*_list_plan`` n'a donc pas d'objectif.
+OBJECTIFS = {
+    ('serialize.dossier_build_drf', 'serialize.dossier_build_plan'): 5,
+    ('serialize.audience_build_drf', 'serialize.audience_build_plan'): 5,
+}
+
+
+def gains(results):
+    """``(référence, optimisé, gain mesuré, gain attendu)`` des objectifs dont les deux benchmarks ont tourné"""
+    return [
+        (reference, optimise, round(results[reference]['median_ms'] / results[optimise]['median_ms'], 1), facteur)
+        for (reference, optimise), facteur in OBJECTIFS.items()
+        if reference in results and optimise in results
+    ]
+
+
+@benchmark('api.tribunal_list')
+def tribunal_list():
+    client = Client()
+    return lambda: client.get('/api/core/')
+
+
+@benchmark('query.dossiers_par_etat')
+def dossiers_par_etat():
+    return lambda: list(Dossier.objects.values('tribunal', 'etat').annotate(total=Count('id')))
+
+
+@benchmark('query.audiences_a_venir')
+def audiences_a_venir():
+    tribunal = Tribunal.objects.first()
+    now = timezone.now()
+
+    def run():
+        return list(
+            Audience.objects.filter(dossier__tribunal=tribunal, etat='PROGRAMMEE',
+                                    date_prevue__range=(now, now + timedelta(days=30)))
+            .select_related('dossier', 'magistrat__utilisateur')
+            .order_by('date_prevue')
+        )
+    return run
+
+
+@benchmark('query.frais_impayes_par_tribunal')
+def frais_impayes_par_tribunal():
+    return lambda: list(
+        Frais.objects.exclude(etat__in=['PAYE', 'EXONERE'])
+        .values('dossier__tribunal')
+        .annotate(solde=Sum(F('montant') - F('montant_paye')))
+    )
+
+
+@benchmark('query.creances_par_dossier')
+def creances_par_dossier():
+    return lambda: list(ledger.creances('dossier'))
+
+
+def partie_recurrente(appearances=2000):
+    """Partie présente dans ``appearances`` dossiers (au plus autant qu'il en existe), créée une fois"""
+    partie, created = Partie.objects.get_or_create(
+        numero_identification='BENCH-RECURRENTE',
+        defaults={'prenom': "Jean", 'nom': "Recurrent", 'adresse': "Kinshasa"},
+    )
+    if created:
+        liens = PartieAuDossier.objects.bulk_create([
+            PartieAuDossier(dossier_id=dossier_id, partie=partie, qualite='TIERS')
+            for dossier_id in Dossier.objects.values_list('pk', flat=True)[:appearances]
+        ])
+        parties.indexer([lien.pk for lien in liens])
+    return partie
+
+
+@benchmark('query.historique_partie')
+def historique_partie():
+    partie = partie_recurrente()
+    return lambda: list(
+        PartieAuDossier.objects.filter(partie=partie)
+        .select_related('dossier__tribunal')
+    )
+
+
+@benchmark('query.historique_partie_index')
+def historique_partie_index():
+    partie = partie_recurrente()
+    return lambda: list(parties.dossiers_partie(partie.pk, limit=5000))
+
+
+DOSSIER_RELATIONS = (
+    'nature_affaire', 'tribunal', 'parquet__tribunal',
+    'magistrat_siege__utilisateur', 'magistrat_siege__tribunal', 'magistrat_siege__parquet__tribunal',
+    'magistrat_parquet__utilisateur', 'magistrat_parquet__tribunal', 'magistrat_parquet__parquet__tribunal',
+)
+
+
+@benchmark('serialize.dossier_list')
+def dossier_list():
+    queryset = Dossier.objects.select_related(*DOSSIER_RELATIONS).order_by('numero_rg')[:200]
+    return lambda: DossierSerializer(queryset.all(), many=True).data
+
+
+@benchmark('serialize.dossier_list_plan')
+def dossier_list_plan():
+    queryset = Dossier.objects.order_by('numero_rg')[:200]
+    return lambda: plans.serialiser(DossierSerializer, queryset.all())
+
+
+# Construction seule, sur des lignes déjà lues : la lecture SQL (dont le
+# décodage des dates, coûteux sous SQLite) dépend du moteur
+@benchmark('serialize.dossier_build_drf')
+def dossier_build_drf():
+    dossiers = list(Dossier.objects.select_related(*DOSSIER_RELATIONS).order_by('numero_rg')[:200])
+    return lambda: DossierSerializer(dossiers, many=True).data
+
+
+@benchmark('serialize.dossier_build_plan')
+def dossier_build_plan():
+    plan = plans.compiler(DossierSerializer)
+    rows = list(Dossier.objects.order_by('numero_rg').values_list(*plan.colonnes)[:200])
+    tz = timezone.get_current_timezone()
+    return lambda: [plan.construire(row, tz) for row in rows]
+
+
+def dossier_payload(size=1000):
+    """Liste sérialisée de ``size`` dossiers (les dossiers disponibles sont répétés au besoin)"""
+    rows = DossierSerializer(Dossier.objects.select_related(*DOSSIER_RELATIONS)[:size], many=True).data
+    return (list(rows) * (size // max(len(rows), 1) + 1))[:size]
+
+
+@benchmark('render.dossier_list_drf')
+def render_drf():
+    payload = dossier_payload()
+    return lambda: JSONRenderer().render(payload)
+
+
+@benchmark('render.dossier_list_fast')
+def render_fast():
+    payload = dossier_payload()
+    return lambda: FastJSONRenderer().render(payload)
+
+
+def compression_benchmark(encoding):
+    def factory():
+        content = FastJSONRenderer().render(dossier_payload())
+        return lambda: compression.compress(encoding, content)
+    return factory
+
+
+for _encoding in compression.CODECS:
+    benchmark(f'compress.dossier_list_{_encoding}')(compression_benchmark(_encoding))
+
+
+AUDIENCE_RELATIONS = (
+    'dossier__nature_affaire', 'dossier__tribunal', 'dossier__parquet__tribunal',
+    'dossier__magistrat_siege__utilisateur', 'dossier__magistrat_siege__tribunal',
+    'dossier__magistrat_siege__parquet__tribunal',
+    'dossier__magistrat_parquet__utilisateur', 'dossier__magistrat_parquet__tribunal',
+    'dossier__magistrat_parquet__parquet__tribunal',
+    'magistrat__utilisateur', 'magistrat__tribunal', 'magistrat__parquet__tribunal',
+)
+
+
+@benchmark('serialize.audience_list')
+def audience_list():
+    queryset = Audience.objects.select_related(*AUDIENCE_RELATIONS).order_by('date_prevue')[:200]
+    return lambda: AudienceSerializer(queryset.all(), many=True).data
+
+
+@benchmark('serialize.audience_list_plan')
+def audience_list_plan():
+    queryset = Audience.objects.order_by('date_prevue')[:200]
+    return lambda: plans.serialiser(AudienceSerializer, queryset.all())
+
+
+@benchmark('serialize.audience_build_drf')
+def audience_build_drf():
+    audiences = list(Audience.objects.select_related(*AUDIENCE_RELATIONS).order_by('date_prevue')[:200])
+    return lambda: AudienceSerializer(audiences, many=True).data
+
+
+@benchmark('serialize.audience_build_plan')
+def audience_build_plan():
+    plan = plans.compiler(AudienceSerializer)
+    rows = list(Audience.objects.order_by('date_prevue').values_list(*plan.colonnes)[:200])
+    tz = timezone.get_current_timezone()
+    return lambda: [plan.construire(row, tz) for row in rows]
@@ -0,0 +1,112 @@
+import logging
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .utils import view_declaration
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    """Budget base de données d'une vue (nombre de requêtes, temps cumulé, timeout)"""
+    max_queries: int | None = None
+    max_db_ms: float | None = None
+    statement_timeout_ms: int | None = None
+
+
+# Requêtes d'une authentification par session, à ajouter au budget des vues qui l'acceptent :
+# la session, l'utilisateur et, tant qu'il n'est pas en cache, son accès (un jeton n'en coûte aucune)
+SESSION = 3
+
+
+class QueryBudgetExceeded(Exception):
+    """Une vue a dépassé le budget base de données qu'elle déclare"""
+
+
+class QueryCounter:
+    """Wrapper d'exécution qui compte les requêtes et cumule leur durée"""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.duration += time.perf_counter() - start
+
+
+class StatementTimeout:
+    """Wrapper d'exécution qui applique un ``statement_timeout`` PostgreSQL.
+
+    Le timeout est posé sur chaque connexion à sa première requête, puis
+    réinitialisé par :meth:`reset` pour ne pas fuir vers la requête HTTP
+    suivante (connexions persistantes ou poolées).
+    """
+
+    def __init__(self, milliseconds=None):
+        self.milliseconds = milliseconds
+        self.applied = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        connection = context['connection']
+        if (self.milliseconds and connection.vendor == 'postgresql'
+                and connection.alias not in self.applied):
+            context['cursor'].cursor.execute(f"SET statement_timeout = {int(self.milliseconds)}")
+            self.applied[connection.alias] = connection
+        return execute(sql, params, many, context)
+
+    def reset(self):
+        for connection in self.applied.values():
+            if connection.connection is None:
+                continue
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("RESET statement_timeout")
+            except DatabaseError:
+                # Connexion inutilisable : on la ferme plutôt que de la rendre avec le timeout
+                connection.close()
+        self.applied.clear()
+
+
+def query_budget(**limits):
+    """Déclare le budget d'une vue fonction (``@query_budget(max_queries=5)``)"""
+    def decorator(view_func):
+        view_func.query_budget = QueryBudget(**limits)
+        return view_func
+    return decorator
+
+
+def budget_for(view_func, method):
+    """Budget déclaré par la vue, sinon ``DEFAULT_QUERY_BUDGET``"""
+    budget = view_declaration(view_func, method, 'query_budget')
+    if budget is None and settings.DEFAULT_QUERY_BUDGET:
+        budget = QueryBudget(**settings.DEFAULT_QUERY_BUDGET)
+    return budget
+
+
+def check_budget(budget, counter, label):
+    """Compare la consommation au budget : exception en test, journalisation sinon"""
+    overruns = []
+    if budget.max_queries is not None and counter.queries > budget.max_queries:
+        overruns.append(f"{counter.queries} requêtes (max {budget.max_queries})")
+    if budget.max_db_ms is not None and counter.duration_ms > budget.max_db_ms:
+        overruns.append(f"{counter.duration_ms:.1f} ms en base (max {budget.max_db_ms} ms)")
+    if not overruns:
+        return
+    message = f"Budget base de données dépassé pour {label} : {', '.join(overruns)}"
+    if settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
@@ -0,0 +1,105 @@
+"""Disponibilités des magistrats et recherche de créneaux libres.
+
+Les :class:`~core.models.RegleCalendrier` décrivent des disponibilités
+récurrentes (jours de la semaine, plage horaire, une semaine sur n) ; elles
+sont dépliées en créneaux :class:`~core.models.Calendrier` datés, indexés
+par (magistrat, date) et (tribunal, date). Un créneau peut ensuite être
+modifié à la main ou doublé d'une indisponibilité ; régénérer une année ne
+touche pas aux créneaux existants.
+
+Un créneau est libre s'il est disponible, ne chevauche aucune indisponibilité
+du magistrat et qu'aucune audience programmée du magistrat n'y commence.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Audience, Calendrier, RegleCalendrier
+
+
+ETATS_OCCUPES = ['PROGRAMMEE', 'EN_COURS']
+
+JOURS = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
+
+
+def masque(*jours):
+    """Masque de jours pour :attr:`RegleCalendrier.jours` (``masque('lundi', 'jeudi')``)"""
+    return sum(1 << JOURS.index(jour) for jour in jours)
+
+
+def occurrences(regle, debut, fin):
+    """Dates de ``regle`` entre ``debut`` et ``fin`` inclus"""
+    debut = max(debut, regle.date_debut)
+    if regle.date_fin is not None:
+        fin = min(fin, regle.date_fin)
+    # Les semaines se comptent depuis le lundi de la semaine où la règle commence
+    origine = regle.date_debut - timedelta(days=regle.date_debut.weekday())
+    lundi = debut - timedelta(days=debut.weekday())
+    while lundi <= fin:
+        if ((lundi - origine).days // 7) % regle.toutes_les_semaines == 0:
+            for decalage in range(7):
+                jour = lundi + timedelta(days=decalage)
+                if regle.jours >> decalage & 1 and debut <= jour <= fin:
+                    yield jour
+        lundi += timedelta(weeks=1)
+
+
+def regles_actives(debut, fin):
+    return RegleCalendrier.objects.filter(
+        Q(date_fin__isnull=True) | Q(date_fin__gte=debut), est_actif=True, date_debut__lte=fin,
+    )
+
+
+def generer(regles, debut, fin, batch_size=1000):
+    """Crée les créneaux des règles entre ``debut`` et ``fin`` ; renvoie le nombre de créneaux proposés.
+
+    Les créneaux déjà présents (même magistrat, date et heure de début) sont
+    conservés tels quels, retouches manuelles comprises.
+    """
+    creneaux = [
+        Calendrier(magistrat_id=regle.magistrat_id, tribunal_id=regle.tribunal_id, date=jour,
+                   heure_debut=regle.heure_debut, heure_fin=regle.heure_fin, regle_id=regle.pk)
+        for regle in regles
+        for jour in occurrences(regle, debut, fin)
+    ]
+    Calendrier.objects.bulk_create(creneaux, batch_size=batch_size, ignore_conflicts=True)
+    return len(creneaux)
+
+
+def chevauche(debut, fin, autres):
+    return any(autre_debut < fin and debut < autre_fin for autre_debut, autre_fin in autres)
+
+
+def creneaux_libres(tribunal_id, debut, fin, magistrat_id=None):
+    """Créneaux libres du tribunal entre deux dates, par date, heure et magistrat (deux requêtes)"""
+    creneaux = Calendrier.objects.filter(tribunal_id=tribunal_id, date__range=(debut, fin), est_actif=True)
+    if magistrat_id is not None:
+        creneaux = creneaux.filter(magistrat_id=magistrat_id)
+    rows = list(creneaux.values_list('magistrat_id', 'date', 'heure_debut', 'heure_fin', 'est_disponible'))
+    indisponible = defaultdict(list)
+    for magistrat, jour, heure_debut, heure_fin, disponible in rows:
+        if not disponible:
+            indisponible[magistrat, jour].append((heure_debut, heure_fin))
+
+    tz = timezone.get_current_timezone()
+    audiences = Audience.objects.filter(
+        magistrat_id__in={row[0] for row in rows}, etat__in=ETATS_OCCUPES, est_actif=True,
+        date_prevue__gte=datetime.combine(debut, time.min, tz),
+        date_prevue__lt=datetime.combine(fin + timedelta(days=1), time.min, tz),
+    ).values_list('magistrat_id', 'date_prevue') if rows else []
+    occupe = defaultdict(list)
+    for magistrat, date_prevue in audiences:
+        moment = timezone.localtime(date_prevue, tz)
+        occupe[magistrat, moment.date()].append(moment.time())
+
+    libres = []
+    for magistrat, jour, heure_debut, heure_fin, disponible in rows:
+        if not disponible or chevauche(heure_debut, heure_fin, indisponible[magistrat, jour]):
+            continue
+        if any(heure_debut <= heure < heure_fin for heure in occupe[magistrat, jour]):
+            continue
+        libres.append({'magistrat': magistrat, 'date': jour, 'heure_debut': heure_debut, 'heure_fin': heure_fin})
+    libres.sort(key=lambda creneau: (creneau['date'], creneau['heure_debut'], str(creneau['magistrat'])))
+    return libres
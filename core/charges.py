@@ -0,0 +1,186 @@
+"""Index de charge de travail et répartition équilibrée des dossiers.
+
+:class:`~core.models.ChargeTravail` tient, par utilisateur (magistrat ou
+greffier), le nombre de dossiers ouverts, leur poids selon l'urgence et les
+audiences à venir. Les signaux recalculent les lignes des utilisateurs
+touchés par un changement ; la commande ``recalculer_charges`` rattrape
+chaque nuit le glissement de l'horizon des audiences.
+
+:class:`Repartiteur` choisit le magistrat le moins chargé en O(log n) à
+l'aide d'un tas, ce qui permet d'attribuer un lot entier de dossiers en
+tenant compte des attributions déjà faites dans le lot.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from . import events
+from .models import Attribution, Audience, ChargeTravail, Dossier, Magistrat
+
+
+ETATS_TERMINES = ['JUGE', 'CLOS', 'RADIE', 'DESISTEMENT', 'CLASSE_SANS_SUITE']
+
+POIDS_URGENCE = {
+    'NORMALE': 1,
+    'URGENTE': 2,
+    'TRES_URGENTE': 3,
+    'REFERE': 3,
+    'FLAGRANT_DELIT': 4,
+}
+
+HORIZON_AUDIENCES = timedelta(days=30)
+
+CHAMPS_FONCTION = {
+    'SIEGE': 'magistrat_siege',
+    'PARQUET': 'magistrat_parquet',
+}
+
+# Champs des dossiers à attribuer lus par l'événement diffusé après attribution
+CHAMPS_DIFFUSION = ('numero_rg', 'etat', 'tribunal', 'est_confidentiel')
+
+
+def poids(urgence):
+    return POIDS_URGENCE.get(urgence, 1)
+
+
+def poids_expression(prefix=''):
+    return Case(*[When(**{f'{prefix}urgence': urgence}, then=Value(value))
+                  for urgence, value in POIDS_URGENCE.items()],
+                default=Value(1), output_field=IntegerField())
+
+
+def recalculer(user_ids=None):
+    """Recalcule, en quelques GROUP BY, la charge des utilisateurs donnés (tous par défaut)"""
+    if user_ids is None:
+        user_ids = set(Magistrat.objects.values_list('utilisateur_id', flat=True))
+        user_ids |= set(Attribution.objects.values_list('attribue_a_id', flat=True))
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return 0
+    rows = defaultdict(lambda: {'dossiers_ouverts': 0, 'poids_dossiers': 0, 'audiences_a_venir': 0})
+    ouverts = Dossier.objects.filter(est_actif=True).exclude(etat__in=ETATS_TERMINES)
+    for field in CHAMPS_FONCTION.values():
+        user = f'{field}__utilisateur'
+        for user_id, nombre, total in (
+            ouverts.filter(**{f'{user}__in': user_ids}).values_list(user)
+            .annotate(nombre=Count('id'), total=Sum(poids_expression())).order_by()
+        ):
+            rows[user_id]['dossiers_ouverts'] += nombre
+            rows[user_id]['poids_dossiers'] += total
+    for user_id, nombre, total in (
+        Attribution.objects.filter(est_actif=True, attribue_a__in=user_ids,
+                                   dossier__in=ouverts.values('pk'))
+        .values_list('attribue_a')
+        .annotate(nombre=Count('id'), total=Sum(poids_expression('dossier__')))
+        .order_by()
+    ):
+        rows[user_id]['dossiers_ouverts'] += nombre
+        rows[user_id]['poids_dossiers'] += total
+    now = timezone.now()
+    for user_id, nombre in (
+        Audience.objects.filter(est_actif=True, etat='PROGRAMMEE', magistrat__utilisateur__in=user_ids,
+                                date_prevue__range=(now, now + HORIZON_AUDIENCES))
+        .values_list('magistrat__utilisateur').annotate(nombre=Count('id')).order_by()
+    ):
+        rows[user_id]['audiences_a_venir'] = nombre
+    charges = [
+        ChargeTravail(utilisateur_id=user_id, **rows[user_id],
+                      score=rows[user_id]['poids_dossiers'] + rows[user_id]['audiences_a_venir'])
+        for user_id in user_ids
+    ]
+    ChargeTravail.objects.bulk_create(
+        charges, update_conflicts=True, unique_fields=['utilisateur'],
+        update_fields=['dossiers_ouverts', 'poids_dossiers', 'audiences_a_venir', 'score', 'date_modification'],
+    )
+    return len(charges)
+
+
+def recalculer_magistrats(magistrat_ids, dossier_id=None):
+    """Recalcule la charge des magistrats donnés et des greffiers attributaires de ``dossier_id``"""
+    users = set(Magistrat.objects.filter(pk__in=magistrat_ids).values_list('utilisateur_id', flat=True))
+    if dossier_id is not None:
+        users |= set(Attribution.objects.filter(dossier_id=dossier_id).values_list('attribue_a_id', flat=True))
+    return recalculer(users)
+
+
+class Repartiteur:
+    """File de priorité des magistrats candidats, du moins au plus chargé"""
+
+    def __init__(self, candidats):
+        # L'identifiant départage les ex aequo de façon déterministe
+        self.heap = [(score, str(pk), pk) for pk, score in candidats]
+        heapq.heapify(self.heap)
+
+    @classmethod
+    def pour_tribunal(cls, tribunal_id, fonction='SIEGE'):
+        candidats = (
+            Magistrat.objects.filter(tribunal_id=tribunal_id, type_magistrat=fonction, est_actif=True)
+            .values_list('pk', 'utilisateur__charge_travail__score')
+        )
+        return cls((pk, score or 0) for pk, score in candidats)
+
+    def __bool__(self):
+        return bool(self.heap)
+
+    def choisir(self, charge=1):
+        """Magistrat le moins chargé, dont la charge augmente aussitôt de ``charge``"""
+        score, key, pk = self.heap[0]
+        heapq.heapreplace(self.heap, (score + charge, key, pk))
+        return pk
+
+    def attribuer(self, dossiers, fonction='SIEGE'):
+        """Attribue un lot de dossiers ; renvoie ``{dossier_id: magistrat_id}``.
+
+        Les dossiers les plus lourds sont placés d'abord (heuristique LPT), le
+        lot est enregistré en un seul ``bulk_update`` puis l'index mis à jour.
+        """
+        field = CHAMPS_FONCTION[fonction]
+        dossiers = sorted(dossiers, key=lambda dossier: -poids(dossier.urgence))
+        now = timezone.now()
+        anciens = set()
+        for dossier in dossiers:
+            anciens.add(getattr(dossier, f'{field}_id'))
+            setattr(dossier, f'{field}_id', self.choisir(poids(dossier.urgence)))
+            dossier.date_modification = now
+        Dossier.objects.bulk_update(dossiers, [field, 'date_modification'], batch_size=500)
+        resultat = {dossier.pk: getattr(dossier, f'{field}_id') for dossier in dossiers}
+        recalculer_magistrats(anciens | set(resultat.values()))
+        # bulk_update n'émet pas post_save : les changements sont diffusés ici, après validation
+        transaction.on_commit(partial(diffuser, [
+            (dossier.tribunal_id, events.dossier_event(dossier, 'update'))
+            for dossier in dossiers if not dossier.est_confidentiel
+        ]))
+        return resultat
+
+
+def diffuser(evenements):
+    for tribunal_id, event in evenements:
+        events.publish(tribunal_id, event)
+
+
+def dossiers_a_attribuer(tribunal_id, fonction='SIEGE'):
+    """Dossiers ouverts du tribunal sans magistrat pour ``fonction``"""
+    return (
+        Dossier.objects.filter(tribunal_id=tribunal_id, est_actif=True,
+                               **{f'{CHAMPS_FONCTION[fonction]}__isnull': True})
+        .exclude(etat__in=ETATS_TERMINES)
+        .only('pk', 'urgence', CHAMPS_FONCTION[fonction], *CHAMPS_DIFFUSION)
+    )
+
+
+def charges_tribunal(tribunal_id):
+    """Charge des magistrats d'un tribunal, du moins au plus chargé"""
+    return (
+        Magistrat.objects.filter(tribunal_id=tribunal_id, est_actif=True)
+        .values('id', 'type_magistrat', 'utilisateur__first_name', 'utilisateur__last_name',
+                'utilisateur__charge_travail__dossiers_ouverts',
+                'utilisateur__charge_travail__poids_dossiers',
+                'utilisateur__charge_travail__audiences_a_venir',
+                'utilisateur__charge_travail__score')
+        .order_by('utilisateur__charge_travail__score', 'id')
+    )
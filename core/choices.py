@@ -0,0 +1,60 @@
+"""Bundle des listes de choix et tables de référence pour les formulaires du front.
+
+Le bundle est sérialisé une fois, mis en cache et identifié par l'empreinte
+de son contenu : servi sous ``/api/choix/<version>/`` il est immuable et
+cacheable indéfiniment, toute modification produisant une nouvelle version.
+"""
+import hashlib
+import json
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import NatureAffaire, Tribunal
+
+
+CACHE_KEY = 'core:choix'
+
+
+def choice_sets():
+    """``{modèle: {champ: [{value, label}, …]}}`` pour chaque champ à choix des modèles"""
+    sets = {}
+    for model in apps.get_app_config('core').get_models():
+        fields = {
+            field.name: [{'value': value, 'label': str(label)} for value, label in field.flatchoices]
+            for field in model._meta.concrete_fields if field.choices
+        }
+        if fields:
+            sets[model._meta.model_name] = fields
+    return sets
+
+
+def build_bundle():
+    """(version, contenu JSON) du bundle courant"""
+    data = {
+        'choix': choice_sets(),
+        'natures_affaire': list(
+            NatureAffaire.objects.filter(est_actif=True).order_by('code')
+            .values('id', 'code', 'nom', 'matiere')
+        ),
+        'tribunaux': list(
+            Tribunal.objects.filter(est_actif=True).order_by('nom', 'id')
+            .values('id', 'nom', 'type_tribunal', 'juridiction')
+        ),
+    }
+    content = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False,
+                         separators=(',', ':'), sort_keys=True).encode()
+    return hashlib.sha256(content).hexdigest()[:16], content
+
+
+def get_bundle():
+    bundle = cache.get(CACHE_KEY)
+    if bundle is None:
+        bundle = build_bundle()
+        cache.set(CACHE_KEY, bundle, timeout=3600)
+    return bundle
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
@@ -0,0 +1,86 @@
+"""Compression négociée des réponses (zstd, brotli, gzip).
+
+zstd et brotli sont utilisés quand leurs modules (``zstandard``, ``brotli``)
+sont installés ; gzip est toujours disponible.
+"""
+import gzip
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+
+def compress_zstd(content, level):
+    return zstandard.ZstdCompressor(level=level).compress(content)
+
+
+def compress_br(content, level):
+    return brotli.compress(content, quality=level)
+
+
+def compress_gzip(content, level):
+    return gzip.compress(content, compresslevel=level, mtime=0)
+
+
+def available_codecs():
+    """Codages disponibles, par ordre de préférence du serveur"""
+    codecs = {}
+    if zstandard is not None:
+        codecs['zstd'] = compress_zstd
+    if brotli is not None:
+        codecs['br'] = compress_br
+    codecs['gzip'] = compress_gzip
+    return codecs
+
+
+CODECS = available_codecs()
+
+
+def parse_accept_encoding(header):
+    """Codages acceptés par le client avec leur poids ``q``"""
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def negotiate(header, codecs=None):
+    """Meilleur codage disponible accepté par le client, ou ``None``"""
+    codecs = CODECS if codecs is None else codecs
+    accepted = parse_accept_encoding(header or '')
+    wildcard = accepted.get('*', 0.0)
+    candidates = [(accepted.get(name, wildcard), -rank, name) for rank, name in enumerate(codecs)]
+    quality, _, name = max(candidates, default=(0.0, 0, None))
+    return name if quality > 0 else None
+
+
+def compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return (
+        not response.streaming
+        and response.status_code == 200
+        and not response.has_header('Content-Encoding')
+        and content_type in settings.COMPRESSION_CONTENT_TYPES
+        and len(response.content) >= settings.COMPRESSION_MIN_SIZE
+    )
+
+
+def compress(name, content):
+    return CODECS[name](content, settings.COMPRESSION_LEVELS[name])
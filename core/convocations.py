@@ -0,0 +1,256 @@
+"""Convocations aux audiences : planification par lots et file d'envoi.
+
+:func:`planifier` parcourt les audiences programmées des prochains
+``CONVOCATION_DELAI_JOURS`` jours par lots de clés : pour chaque lot, trois
+requêtes (audiences, parties et avocats constitués, convocations déjà en
+file) puis un ``bulk_create``. Les gabarits sont compilés une fois par
+processus. Une convocation est propre à une date d'audience : un renvoi en
+appelle une nouvelle, et replanifier ne duplique rien.
+
+Les workers (:func:`traiter`) prennent un lot de convocations dues en le
+marquant d'un identifiant de lot, si bien que deux workers ne prennent
+jamais la même ligne ; une convocation prise par un worker disparu redevient
+due après ``CONVOCATION_LEASE_SECONDS``. L'envoi passe par le transport
+configuré pour le canal (``CONVOCATION_TRANSPORTS``) ; un échec est retenté
+avec un délai exponentiel, puis abandonné après ``CONVOCATION_MAX_TENTATIVES``.
+"""
+import json
+import random
+import sys
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .jobs import keyset_chunks
+from .models import Audience, Convocation, Partie, PartieAuDossier
+
+
+QUALITES = dict(Partie.TYPES_PARTIE)
+TYPES_AUDIENCE = dict(Audience.TYPES_AUDIENCE)
+
+# États d'une convocation qu'un worker peut prendre (en cours : bail expiré)
+A_TRAITER = ['EN_ATTENTE', 'EN_COURS']
+
+CHAMPS_RESULTAT = ['etat', 'tentatives', 'prochain_essai', 'lot', 'derniere_erreur', 'date_envoi',
+                   'date_modification']
+
+
+@lru_cache(maxsize=None)
+def gabarit(nom):
+    """Gabarit compilé, gardé pour la durée du processus"""
+    return get_template(f'convocations/{nom}.txt')
+
+
+def rendre(contexte):
+    return gabarit('objet').render(contexte).strip(), gabarit('corps').render(contexte)
+
+
+def nom_partie(lien):
+    if lien['partie__est_personne_morale']:
+        return lien['partie__raison_sociale']
+    return f"{lien['partie__prenom']} {lien['partie__nom']}"
+
+
+def destinataires(lien):
+    """``(partie, avocat, canal, adresse, civilité, qualité)`` des personnes à convoquer pour une participation"""
+    nom = nom_partie(lien)
+    qualite = QUALITES.get(lien['qualite'], lien['qualite']).lower()
+    adresse = lien['partie__email'] or lien['partie__adresse']
+    if adresse:
+        canal = 'EMAIL' if lien['partie__email'] else 'COURRIER'
+        yield lien['partie_id'], None, canal, adresse, f"{nom}, Madame, Monsieur", qualite
+    if lien['avocat_id']:
+        adresse = lien['avocat__utilisateur__email'] or lien['avocat__adresse']
+        if adresse:
+            canal = 'EMAIL' if lien['avocat__utilisateur__email'] else 'COURRIER'
+            yield (None, lien['avocat_id'], canal, adresse, f"Maître {lien['avocat__utilisateur__last_name']}",
+                   f"conseil de {nom} ({qualite})")
+
+
+def planifier_lot(pks):
+    """Met en file les convocations manquantes des audiences ``pks`` ; renvoie leur nombre"""
+    audiences = list(Audience.objects.filter(pk__in=pks).values(
+        'id', 'date_prevue', 'type_audience', 'salle', 'dossier_id', 'dossier__numero_rg', 'dossier__intitule',
+        'dossier__tribunal__nom',
+    ))
+    liens = {}
+    for lien in PartieAuDossier.objects.filter(
+        dossier_id__in={audience['dossier_id'] for audience in audiences}, est_actif=True, partie__est_actif=True,
+    ).order_by('date_constitution', 'id').values(
+        'dossier_id', 'qualite', 'partie_id', 'partie__prenom', 'partie__nom', 'partie__est_personne_morale',
+        'partie__raison_sociale', 'partie__email', 'partie__adresse', 'avocat_id', 'avocat__utilisateur__email',
+        'avocat__utilisateur__last_name', 'avocat__adresse',
+    ):
+        liens.setdefault(lien['dossier_id'], []).append(lien)
+    deja = set(Convocation.objects.filter(audience_id__in=pks).values_list(
+        'audience_id', 'date_audience', 'canal', 'destinataire', 'partie_id', 'avocat_id'))
+
+    convocations = []
+    for audience in audiences:
+        contexte = {
+            'date': audience['date_prevue'], 'salle': audience['salle'],
+            'type_audience': TYPES_AUDIENCE.get(audience['type_audience'], audience['type_audience']).lower(),
+            'tribunal': audience['dossier__tribunal__nom'], 'numero_rg': audience['dossier__numero_rg'],
+            'intitule': audience['dossier__intitule'],
+        }
+        for lien in liens.get(audience['dossier_id'], []):
+            for partie_id, avocat_id, canal, adresse, civilite, qualite in destinataires(lien):
+                # Deux parties à la même adresse reçoivent chacune leur convocation
+                cle = (audience['id'], audience['date_prevue'], canal, adresse, partie_id, avocat_id)
+                if cle in deja:
+                    continue
+                deja.add(cle)
+                objet, corps = rendre({**contexte, 'civilite': civilite, 'qualite': qualite})
+                convocations.append(Convocation(
+                    audience_id=audience['id'], date_audience=audience['date_prevue'], partie_id=partie_id,
+                    avocat_id=avocat_id, canal=canal, destinataire=adresse, objet=objet, corps=corps,
+                ))
+    # Planifications concurrentes : les contraintes d'unicité départagent
+    Convocation.objects.bulk_create(convocations, ignore_conflicts=True)
+    return len(convocations)
+
+
+def planifier(debut=None, fin=None, batch_size=500):
+    """Met en file les convocations des audiences programmées entre ``debut`` et ``fin``"""
+    debut = debut or timezone.now()
+    fin = fin or debut + timedelta(days=settings.CONVOCATION_DELAI_JOURS)
+    audiences = Audience.objects.filter(etat='PROGRAMMEE', est_actif=True, date_prevue__range=(debut, fin))
+    return sum(planifier_lot(pks) for pks in keyset_chunks(audiences, batch_size))
+
+
+class Transport:
+    """Interface d'un transport de convocations, ouvert pour la durée d'un lot"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def envoyer(self, convocation):
+        """Envoie ``convocation`` ; toute exception vaut échec, retenté plus tard"""
+        raise NotImplementedError
+
+
+class ConsoleTransport(Transport):
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def envoyer(self, convocation):
+        self.stream.write(f"À : {convocation.destinataire} ({convocation.canal})\n"
+                          f"Objet : {convocation.objet}\n\n{convocation.corps}\n{'-' * 72}\n")
+
+
+class FichierTransport(Transport):
+    """Une ligne JSON par convocation, ajoutée à ``CONVOCATION_FILE`` (courriers à imprimer, essais)"""
+
+    def __init__(self, path=None):
+        self.path = path or settings.CONVOCATION_FILE
+
+    def __enter__(self):
+        self.fichier = open(self.path, 'a', encoding='utf-8')
+        return self
+
+    def __exit__(self, *exc_info):
+        self.fichier.close()
+
+    def envoyer(self, convocation):
+        self.fichier.write(json.dumps({
+            'id': str(convocation.pk), 'audience': str(convocation.audience_id), 'canal': convocation.canal,
+            'destinataire': convocation.destinataire, 'objet': convocation.objet, 'corps': convocation.corps,
+        }, ensure_ascii=False) + '\n')
+
+
+class EmailTransport(Transport):
+    """Courriels par le backend de messagerie de Django, sur une connexion par lot"""
+
+    def __enter__(self):
+        self.connection = get_connection()
+        self.connection.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.connection.close()
+
+    def envoyer(self, convocation):
+        EmailMessage(convocation.objet, convocation.corps, to=[convocation.destinataire],
+                     connection=self.connection).send()
+
+
+def transports():
+    return {canal: import_string(chemin)() for canal, chemin in settings.CONVOCATION_TRANSPORTS.items()}
+
+
+def attente(tentatives):
+    """Délai avant le prochain essai : exponentiel, plafonné, avec ±20 % d'aléa pour étaler les reprises"""
+    delai = min(settings.CONVOCATION_BACKOFF_SECONDS * 2 ** (tentatives - 1), settings.CONVOCATION_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delai * random.uniform(0.8, 1.2))
+
+
+def prendre(limite, now=None):
+    """Réserve jusqu'à ``limite`` convocations dues pour ce worker et les renvoie"""
+    now = now or timezone.now()
+    dues = Q(etat__in=A_TRAITER, prochain_essai__lte=now)
+    pks = list(Convocation.objects.filter(dues).order_by('prochain_essai').values_list('pk', flat=True)[:limite])
+    if not pks:
+        return []
+    lot = uuid.uuid4()
+    # Condition rejouée dans l'UPDATE : un autre worker a pu prendre ces lignes entre-temps
+    Convocation.objects.filter(dues, pk__in=pks).update(
+        etat='EN_COURS', lot=lot, prochain_essai=now + timedelta(seconds=settings.CONVOCATION_LEASE_SECONDS),
+        date_modification=now,
+    )
+    return list(Convocation.objects.filter(lot=lot).select_related('audience'))
+
+
+def traiter(limite=200, canaux=None):
+    """Envoie un lot de convocations dues ; renvoie le décompte des états obtenus"""
+    convocations = prendre(limite)
+    if not convocations:
+        return Counter()
+    canaux = canaux or transports()
+    with ExitStack() as stack:
+        ouverts = {}
+        for convocation in convocations:
+            audience = convocation.audience
+            if (audience.etat != 'PROGRAMMEE' or not audience.est_actif
+                    or audience.date_prevue != convocation.date_audience):
+                convocation.etat = 'ANNULEE'
+                continue
+            try:
+                if convocation.canal not in ouverts:
+                    ouverts[convocation.canal] = stack.enter_context(canaux[convocation.canal])
+                ouverts[convocation.canal].envoyer(convocation)
+            except Exception as exc:
+                convocation.tentatives += 1
+                convocation.derniere_erreur = f"{type(exc).__name__}: {exc}"
+                if convocation.tentatives >= settings.CONVOCATION_MAX_TENTATIVES:
+                    convocation.etat = 'ECHEC'
+                else:
+                    convocation.etat = 'EN_ATTENTE'
+                    convocation.prochain_essai = timezone.now() + attente(convocation.tentatives)
+            else:
+                convocation.etat, convocation.date_envoi = 'ENVOYEE', timezone.now()
+    now = timezone.now()
+    for convocation in convocations:
+        convocation.lot, convocation.date_modification = None, now
+    Convocation.objects.bulk_update(convocations, CHAMPS_RESULTAT)
+    return Counter(convocation.etat for convocation in convocations)
+
+
+def vider(limite=200, canaux=None):
+    """Traite les convocations dues jusqu'à épuisement de la file"""
+    total = Counter()
+    while resultat := traiter(limite, canaux):
+        total += resultat
+    return total
@@ -0,0 +1,48 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .utils import view_action, view_class
+
+
+PRIMARY_DATABASE = 'default'
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """Autorise (ou interdit) les lectures sur réplica pour le bloc courant"""
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def replica_eligible(view_func, method):
+    """Indique si la vue déclare l'action demandée dans ``replica_actions``"""
+    allowed = getattr(view_class(view_func), 'replica_actions', ())
+    return view_action(view_func, method) in allowed
+
+
+class PrimaryReplicaRouter:
+    """Écritures sur le primaire, lectures sur un réplica uniquement quand autorisé"""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if replicas and _read_from_replica.get():
+            return random.choice(replicas)
+        return PRIMARY_DATABASE
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les réplicas portent les mêmes données que le primaire
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_DATABASE
@@ -0,0 +1,353 @@
+"""Génération des actes du greffe (décisions, convocations, procès-verbaux).
+
+Un :class:`Modele` lit ses données sources par lots — deux requêtes pour
+tout un lot d'objets : l'objet avec son dossier, puis les parties des
+dossiers — et en tire un contexte de gabarit. Les gabarits texte sont
+compilés une fois par processus ; le rendu en PDF ou en ODT est écrit ici
+même (texte seul, sans bibliothèque externe) et peut être réparti sur un
+pool de processus. La police standard du PDF ne couvre que le jeu WinAnsi :
+un texte qui en sort est refusé plutôt qu'altéré, l'ODT le rend en entier.
+
+Le document produit est rattaché au dossier comme :class:`PieceJointe` ; son
+fichier n'est écrit qu'une fois la pièce validée en base. Le dernier rendu
+de chaque objet est noté dans :class:`DocumentGenere` avec la version des
+sources — empreinte des lignes lues et de leur date de modification : tant
+qu'elle ne change pas, la pièce existante est servie sans nouveau rendu ; si
+elle change mais que le fichier produit est identique, la pièce est conservée.
+"""
+import hashlib
+import re
+import textwrap
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .acces import TOUT
+from .jobs import init_worker
+from .models import Audience, Decision, DocumentGenere, Partie, PartieAuDossier, PieceJointe
+
+
+QUALITES = dict(Partie.TYPES_PARTIE)
+
+
+class DocumentIrrepresentable(ValueError):
+    """Le texte contient des caractères que le format demandé ne sait pas rendre"""
+
+CHAMPS_DOSSIER = ['id', 'date_modification', 'dossier_id', 'dossier__date_modification', 'dossier__numero_rg',
+                  'dossier__intitule', 'dossier__chambre', 'dossier__tribunal__nom']
+
+
+@lru_cache(maxsize=None)
+def gabarit(nom):
+    """Gabarit compilé, gardé pour la durée du processus"""
+    return get_template(f'documents/{nom}.txt')
+
+
+def nom_complet(row, prefixe):
+    return f"{row[prefixe + 'first_name']} {row[prefixe + 'last_name']}".strip()
+
+
+def version_sources(lignes):
+    """Empreinte des lignes ``(id, date de modification)`` lues : change si l'une est modifiée, ajoutée ou retirée"""
+    contenu = '|'.join(sorted(f'{pk}@{date.isoformat()}' for pk, date in set(lignes)))
+    return hashlib.sha256(contenu.encode()).hexdigest()
+
+
+def parties(dossier_ids):
+    """Parties de chaque dossier et ``(id, date de modification)`` des lignes lues, en une requête"""
+    resultat = {}
+    for lien in PartieAuDossier.objects.filter(
+        dossier_id__in=dossier_ids, est_actif=True, partie__est_actif=True,
+    ).order_by('date_constitution', 'id').values(
+        'id', 'dossier_id', 'qualite', 'date_modification', 'partie_id', 'partie__date_modification',
+        'partie__prenom', 'partie__nom', 'partie__est_personne_morale', 'partie__raison_sociale', 'avocat_id',
+        'avocat__utilisateur__first_name', 'avocat__utilisateur__last_name',
+    ):
+        liste, lignes = resultat.setdefault(lien['dossier_id'], ([], []))
+        liste.append({
+            'nom': lien['partie__raison_sociale'] if lien['partie__est_personne_morale']
+            else f"{lien['partie__prenom']} {lien['partie__nom']}",
+            'qualite': QUALITES.get(lien['qualite'], lien['qualite']).lower(),
+            'avocat': nom_complet(lien, 'avocat__utilisateur__') if lien['avocat_id'] else '',
+        })
+        lignes += [(lien['id'], lien['date_modification']), (lien['partie_id'], lien['partie__date_modification'])]
+    return resultat
+
+
+class Modele:
+    """Document tiré d'un modèle source ; les sous-classes décrivent champs, pièce et contexte"""
+    nom = ''
+    source = None
+    champs = []
+
+    def type_piece(self, row):
+        raise NotImplementedError
+
+    def titre(self, row):
+        raise NotImplementedError
+
+    def contexte(self, row):
+        raise NotImplementedError
+
+    def sources(self, pks, acces=TOUT):
+        """``{pk: (row, version, contexte)}`` des objets visibles parmi ``pks``"""
+        rows = list(self.source.objects.visibles(acces).filter(pk__in=pks).values(*CHAMPS_DOSSIER, *self.champs))
+        par_dossier = parties({row['dossier_id'] for row in rows})
+        resultat = {}
+        for row in rows:
+            liste, lignes = par_dossier.get(row['dossier_id'], ([], []))
+            version = version_sources([(row['id'], row['date_modification']),
+                                       (row['dossier_id'], row['dossier__date_modification']), *lignes])
+            contexte = {
+                'tribunal': row['dossier__tribunal__nom'], 'chambre': row['dossier__chambre'],
+                'numero_rg': row['dossier__numero_rg'], 'intitule': row['dossier__intitule'], 'parties': liste,
+                **self.contexte(row),
+            }
+            resultat[row['id']] = row, version, contexte
+        return resultat
+
+
+class ModeleDecision(Modele):
+    nom = 'decision'
+    source = Decision
+    champs = ['type_decision', 'numero_decision', 'date_decision', 'sens_decision', 'dispositif', 'motifs',
+              'est_contradictoire', 'est_executoire', 'dossier__objet_litige',
+              'dossier__magistrat_siege__utilisateur__first_name', 'dossier__magistrat_siege__utilisateur__last_name']
+    PIECES = {'JUGEMENT': 'JUGEMENT', 'ARRET': 'ARRET', 'ORDONNANCE': 'ORDONNANCE'}
+
+    def type_piece(self, row):
+        return self.PIECES.get(row['type_decision'], 'AUTRE')
+
+    def titre(self, row):
+        return f"{dict(Decision.TYPES_DECISION)[row['type_decision']]} n°{row['numero_decision']}"
+
+    def contexte(self, row):
+        return {
+            'type_decision': dict(Decision.TYPES_DECISION)[row['type_decision']],
+            'numero_decision': row['numero_decision'], 'date_decision': row['date_decision'],
+            'sens_decision': dict(Decision.SENS_DECISION).get(row['sens_decision'], row['sens_decision']),
+            'dispositif': row['dispositif'], 'motifs': row['motifs'], 'objet_litige': row['dossier__objet_litige'],
+            'contradictoire': 'contradictoire' if row['est_contradictoire'] else 'par défaut',
+            'est_executoire': row['est_executoire'],
+            'magistrat': nom_complet(row, 'dossier__magistrat_siege__utilisateur__'),
+        }
+
+
+class ModeleAudience(Modele):
+    source = Audience
+    champs = ['type_audience', 'date_prevue', 'heure_debut_reelle', 'heure_fin_reelle', 'salle', 'etat',
+              'observations', 'magistrat__utilisateur__first_name', 'magistrat__utilisateur__last_name']
+
+    def contexte(self, row):
+        return {
+            'type_audience': dict(Audience.TYPES_AUDIENCE)[row['type_audience']].lower(),
+            'date': row['date_prevue'], 'debut': row['heure_debut_reelle'], 'fin': row['heure_fin_reelle'],
+            'salle': row['salle'], 'etat': dict(Audience.ETATS_AUDIENCE)[row['etat']].lower(),
+            'observations': row['observations'], 'magistrat': nom_complet(row, 'magistrat__utilisateur__'),
+        }
+
+
+class ModeleConvocation(ModeleAudience):
+    nom = 'convocation'
+
+    def type_piece(self, row):
+        return 'CITATION'
+
+    def titre(self, row):
+        return f"Convocation à l'audience du {timezone.localtime(row['date_prevue']):%d/%m/%Y}"
+
+
+class ModeleProcesVerbal(ModeleAudience):
+    nom = 'proces_verbal'
+
+    def type_piece(self, row):
+        return 'AUTRE'
+
+    def titre(self, row):
+        return f"Procès-verbal d'audience du {timezone.localtime(row['date_prevue']):%d/%m/%Y}"
+
+
+MODELES = {modele.nom: modele for modele in [ModeleDecision(), ModeleConvocation(), ModeleProcesVerbal()]}
+
+
+# Rendu texte (Helvetica 10 pt sur A4, marges de 2 cm)
+LARGEUR_LIGNE = 90
+LIGNES_PAR_PAGE = 50
+
+
+def chaine_pdf(texte):
+    try:
+        texte = texte.encode('cp1252')
+    except UnicodeEncodeError as exc:
+        raise DocumentIrrepresentable(
+            f"« {exc.object[exc.start:exc.end]} » n'existe pas dans la police du PDF : générer le document en ODT"
+        ) from exc
+    return b'(' + texte.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def couper(paragraphe):
+    retrait = paragraphe[:len(paragraphe) - len(paragraphe.lstrip())]
+    return textwrap.wrap(paragraphe.strip(), LARGEUR_LIGNE, initial_indent=retrait, subsequent_indent=retrait) or ['']
+
+
+def pdf(titre, texte):
+    """PDF texte minimal ; même entrée, mêmes octets (aucune date n'y figure)"""
+    lignes = [ligne for paragraphe in texte.splitlines() for ligne in couper(paragraphe)]
+    pages = [lignes[i:i + LIGNES_PAR_PAGE] for i in range(0, len(lignes), LIGNES_PAR_PAGE)] or [[]]
+    kids = ' '.join(f'{5 + 2 * i} 0 R' for i in range(len(pages)))
+    objets = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'.encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Title ' + chaine_pdf(titre) + b' /Producer (bdj) >>',
+    ]
+    for i, page in enumerate(pages):
+        flux = b'BT /F1 10 Tf 14 TL 56 790 Td ' + b''.join(chaine_pdf(ligne) + b" '" for ligne in page) + b' ET'
+        objets.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> '
+                      f'/Contents {6 + 2 * i} 0 R >>'.encode())
+        objets.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(flux), flux))
+    sortie = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    positions = []
+    for numero, objet in enumerate(objets, 1):
+        positions.append(len(sortie))
+        sortie += b'%d 0 obj\n%s\nendobj\n' % (numero, objet)
+    xref = len(sortie)
+    sortie += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objets) + 1)
+    sortie += b''.join(b'%010d 00000 n \n' % position for position in positions)
+    sortie += b'trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objets) + 1, xref)
+    return bytes(sortie)
+
+
+ODT_MIMETYPE = 'application/vnd.oasis.opendocument.text'
+
+ODT_MANIFEST = f"""<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">
+ <manifest:file-entry manifest:full-path="/" manifest:media-type="{ODT_MIMETYPE}"/>
+ <manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>
+ <manifest:file-entry manifest:full-path="meta.xml" manifest:media-type="text/xml"/>
+</manifest:manifest>
+"""
+
+ODT_NAMESPACES = ('xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+                  'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+                  'xmlns:dc="http://purl.org/dc/elements/1.1/" office:version="1.2"')
+
+
+def paragraphe_odt(ligne):
+    """Les espaces de tête ou répétés doivent être explicites : ODF fusionne les autres"""
+    def espaces(match):
+        tete = match.start() == 0
+        return ('' if tete else ' ') + f'<text:s text:c="{len(match.group()) - (0 if tete else 1)}"/>'
+    return '<text:p>' + re.sub(r'^ +| {2,}', espaces, escape(ligne)) + '</text:p>'
+
+
+def odt(titre, texte):
+    """Document ODF texte ; horodatages de l'archive fixés pour un rendu reproductible"""
+    contenu = (f'<?xml version="1.0" encoding="UTF-8"?>\n<office:document-content {ODT_NAMESPACES}>'
+               f'<office:body><office:text>{"".join(map(paragraphe_odt, texte.splitlines()))}</office:text>'
+               f'</office:body></office:document-content>')
+    meta = (f'<?xml version="1.0" encoding="UTF-8"?>\n<office:document-meta {ODT_NAMESPACES}>'
+            f'<office:meta><dc:title>{escape(titre)}</dc:title></office:meta></office:document-meta>')
+    tampon = BytesIO()
+    with zipfile.ZipFile(tampon, 'w') as archive:
+        # « mimetype » en premier et non compressé, comme l'exige ODF
+        for nom, donnees, compression in [
+            ('mimetype', ODT_MIMETYPE, zipfile.ZIP_STORED),
+            ('META-INF/manifest.xml', ODT_MANIFEST, zipfile.ZIP_DEFLATED),
+            ('meta.xml', meta, zipfile.ZIP_DEFLATED),
+            ('content.xml', contenu, zipfile.ZIP_DEFLATED),
+        ]:
+            archive.writestr(zipfile.ZipInfo(nom, date_time=(1980, 1, 1, 0, 0, 0)), donnees, compress_type=compression)
+    return tampon.getvalue()
+
+
+FORMATS = {'pdf': pdf, 'odt': odt}
+
+
+def rendre(modele, format, titre, contexte):
+    """Octets du document ; fonction pure, exécutable dans un worker"""
+    return FORMATS[format](titre, gabarit(modele).render(contexte))
+
+
+def rendre_tous(taches, pool=None):
+    """Rendu d'une liste de tâches ``(modèle, format, titre, contexte)``, dans ``pool`` s'il est fourni"""
+    if pool is None or len(taches) < 2:
+        return [rendre(*tache) for tache in taches]
+    return list(pool.map(rendre, *zip(*taches), chunksize=max(1, len(taches) // 32)))
+
+
+def pool_rendu(workers):
+    """Pool de processus de rendu, à réutiliser d'un appel de :func:`generer` à l'autre"""
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+
+
+def generer(nom, pks, format='pdf', acces=TOUT, depose_par_id=None, pool=None):
+    """Pièce à jour pour chacun des objets ``pks`` visibles : ``{pk: (pièce, regénérée)}``.
+
+    Seuls les objets dont les sources ont changé depuis le dernier rendu
+    sont rendus, dans ``pool`` (voir :func:`pool_rendu`) s'il est fourni.
+    """
+    modele = MODELES[nom]
+    if format not in FORMATS:
+        raise ValueError(f"Format inconnu : {format}")
+    sources = modele.sources(pks, acces)
+    existants = {
+        document.objet_id: document for document in DocumentGenere.objects.filter(
+            modele=nom, format=format, objet_id__in=sources).select_related('piece')
+    }
+    a_rendre = [
+        pk for pk, (row, version, contexte) in sources.items()
+        if pk not in existants or existants[pk].version != version or not existants[pk].piece.est_actif
+    ]
+    fichiers = rendre_tous([(nom, format, modele.titre(sources[pk][0]), sources[pk][2]) for pk in a_rendre], pool)
+
+    resultat = {pk: (document.piece, False) for pk, document in existants.items() if pk not in a_rendre}
+    if not a_rendre:
+        return resultat
+    champ = PieceJointe._meta.get_field('fichier')
+    nouvelles, documents, remplacees, fichiers_a_ecrire = [], [], [], {}
+    for pk, donnees in zip(a_rendre, fichiers):
+        row, version, contexte = sources[pk]
+        empreinte = hashlib.sha256(donnees).hexdigest()
+        ancien = existants.get(pk)
+        if ancien is not None and ancien.empreinte == empreinte and ancien.piece.est_actif:
+            piece = ancien.piece
+        else:
+            # Nom tiré du contenu : il est connu avant l'écriture, qui attend la validation
+            nom_fichier = champ.generate_filename(None, f'{nom}_{pk}_{empreinte[:12]}.{format}')
+            fichiers_a_ecrire[nom_fichier] = donnees
+            piece = PieceJointe(dossier_id=row['dossier_id'], titre=modele.titre(row)[:200], fichier=nom_fichier,
+                                type_piece=modele.type_piece(row), depose_par_id=depose_par_id,
+                                description=f"Généré ({format.upper()})")
+            nouvelles.append(piece)
+            if ancien is not None:
+                remplacees.append(ancien.piece_id)
+        documents.append(DocumentGenere(modele=nom, objet_id=pk, format=format, version=version,
+                                        empreinte=empreinte, piece=piece))
+        resultat[pk] = piece, True
+    with transaction.atomic():
+        PieceJointe.objects.bulk_create(nouvelles)
+        # L'ancienne version reste au dossier, désactivée
+        if remplacees:
+            PieceJointe.objects.filter(pk__in=remplacees).update(est_actif=False, date_modification=timezone.now())
+        DocumentGenere.objects.bulk_create(
+            documents, update_conflicts=True, unique_fields=['modele', 'objet_id', 'format'],
+            update_fields=['version', 'empreinte', 'piece', 'date_modification'],
+        )
+        # Annulée, la transaction ne laisse aucun fichier orphelin
+        transaction.on_commit(partial(ecrire, champ.storage, fichiers_a_ecrire))
+    return resultat
+
+
+def ecrire(storage, fichiers):
+    for nom_fichier, donnees in fichiers.items():
+        # Même nom, même contenu : un fichier déjà écrit n'est pas dupliqué
+        if not storage.exists(nom_fichier):
+            storage.save(nom_fichier, ContentFile(donnees))
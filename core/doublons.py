@@ -0,0 +1,271 @@
+"""Détection et fusion des parties en double.
+
+Les parties sont saisies dossier par dossier : une même personne existe
+souvent plusieurs fois sous des graphies voisines. Plutôt que de comparer
+toutes les paires (O(n²)), chaque partie reçoit quelques clés de blocage
+(identifiant, début du nom et date de naissance, jetons du nom complet,
+raison sociale) et seules les parties qui partagent une clé sont comparées.
+Un bloc trop grand (homonymes courants, même raison sociale saisie des
+dizaines de fois) n'est pas comparé paire à paire : ses fiches sont triées
+puis chacune n'est comparée qu'à ses voisines dans une fenêtre glissante.
+Les paires dont le score atteint le seuil sont regroupées par union-find ;
+un groupe que la transitivité a formé autour d'identifiants ou de dates de
+naissance contradictoires est refusé et ses paires passent en revue. Chaque
+groupe retenu est fusionné sur sa fiche la plus complète en repointant les
+``PartieAuDossier`` par UPDATE groupés, les doublons étant désactivés.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import Case, UUIDField, Value, When
+from django.utils import timezone
+
+from . import parties
+from .models import FusionPartie, IndexPartie, Partie, PartieAuDossier
+
+
+# Au-delà, un bloc est parcouru par fenêtre glissante sur ses fiches triées
+TAILLE_MAX_BLOC = 50
+# Voisines auxquelles chaque fiche d'un grand bloc est comparée
+FENETRE = 10
+
+FORMES_JURIDIQUES = {'sa', 'sarl', 'sas', 'sasu', 'sprl', 'snc', 'scs', 'asbl', 'eurl', 'ets', 'etablissements',
+                     'societe', 'ste', 'cie', 'compagnie', 'groupe'}
+
+CHAMPS = ('id', 'prenom', 'nom', 'date_naissance', 'numero_identification', 'est_personne_morale',
+          'raison_sociale', 'date_creation')
+
+CHAMPS_COMPLETUDE = ('nom_usage', 'date_naissance', 'lieu_naissance', 'telephone', 'email',
+                     'numero_identification', 'forme_juridique')
+
+
+def normaliser(texte):
+    """Minuscules sans accents ni ponctuation, espaces simples"""
+    texte = unicodedata.normalize('NFKD', texte or '').encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', texte.lower()).split())
+
+
+def normaliser_identifiant(identifiant):
+    return re.sub(r'[^A-Z0-9]', '', (identifiant or '').upper())
+
+
+@dataclass(frozen=True)
+class Fiche:
+    """Forme compacte d'une partie, utilisée pour le blocage et le score"""
+    pk: object
+    morale: bool
+    nom: str
+    famille: str
+    naissance: date
+    identifiant: str
+    creation: object
+
+    @classmethod
+    def depuis(cls, row):
+        if row['est_personne_morale']:
+            # Points retirés avant normalisation : « S.A.R.L. » devient « sarl »
+            raison_sociale = (row['raison_sociale'] or row['nom']).replace('.', '')
+            jetons = [jeton for jeton in normaliser(raison_sociale).split() if jeton not in FORMES_JURIDIQUES]
+        else:
+            # Jetons triés : « KABILA Joseph » et « Joseph Kabila » coïncident
+            jetons = sorted(normaliser(f"{row['prenom']} {row['nom']}").split())
+        return cls(row['id'], row['est_personne_morale'], ' '.join(jetons), normaliser(row['nom']),
+                   row['date_naissance'], normaliser_identifiant(row['numero_identification']),
+                   row['date_creation'])
+
+    def cles(self):
+        if self.identifiant:
+            yield f'id:{self.identifiant}'
+        if not self.nom:
+            return
+        if self.morale:
+            yield f'rs:{self.nom}'
+        else:
+            yield f'pp:{self.nom}'
+            if self.naissance and self.famille:
+                # Préfixe du nom de famille : tolère les fautes de frappe en fin de nom
+                yield f'nd:{self.famille[:4]}|{self.naissance.isoformat()}'
+
+
+def score(a, b):
+    """Vraisemblance (0 à 1) que deux fiches désignent la même partie"""
+    if a.morale != b.morale:
+        return 0.0
+    if a.identifiant and b.identifiant:
+        return 1.0 if a.identifiant == b.identifiant else 0.0
+    if a.naissance and b.naissance and a.naissance != b.naissance:
+        return 0.0
+    ressemblance = SequenceMatcher(None, a.nom, b.nom).ratio()
+    if a.morale:
+        return ressemblance
+    return 0.85 * ressemblance + (0.15 if a.naissance and a.naissance == b.naissance else 0.0)
+
+
+class UnionFind:
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        racine = x
+        while self.parent[racine] != racine:
+            racine = self.parent[racine]
+        while self.parent[x] != racine:
+            self.parent[x], x = racine, self.parent[x]
+        return racine
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+    def groupes(self):
+        groupes = defaultdict(list)
+        for x in self.parent:
+            groupes[self.find(x)].append(x)
+        return [membres for membres in groupes.values() if len(membres) > 1]
+
+
+def fiches(queryset=None, chunk_size=5000):
+    queryset = Partie.objects.filter(est_actif=True) if queryset is None else queryset
+    for row in queryset.values(*CHAMPS).iterator(chunk_size=chunk_size):
+        yield Fiche.depuis(row)
+
+
+def paires(membres, index):
+    """Paires à comparer dans un bloc : toutes, ou celles d'une fenêtre glissante si le bloc est trop grand"""
+    if len(membres) <= TAILLE_MAX_BLOC:
+        yield from combinations(membres, 2)
+        return
+    # Tri par nom puis par identifiants forts : les fiches semblables deviennent voisines
+    tries = sorted(membres, key=lambda pk: (index[pk].nom, index[pk].identifiant,
+                                            index[pk].naissance.isoformat() if index[pk].naissance else '', str(pk)))
+    for i, a in enumerate(tries):
+        for b in tries[i + 1:i + FENETRE]:
+            yield a, b
+
+
+def contradictoire(groupe):
+    """Vrai si le groupe réunit des identifiants ou des dates de naissance différents"""
+    identifiants = {fiche.identifiant for fiche in groupe if fiche.identifiant}
+    naissances = {fiche.naissance for fiche in groupe if fiche.naissance}
+    return len(identifiants) > 1 or len(naissances) > 1
+
+
+def detecter(queryset=None, seuil=0.92, seuil_revue=0.8):
+    """Groupes de doublons (score ≥ ``seuil``) et paires à revoir (entre les deux seuils).
+
+    Renvoie ``(groupes, a_revoir, scores)`` : ``groupes`` est une liste de
+    listes de fiches, ``scores`` le meilleur score retenu par paire fusionnée.
+    Les paires d'un groupe refusé (identifiants forts contradictoires) sont
+    renvoyées dans ``a_revoir``.
+    """
+    index, blocs = {}, defaultdict(list)
+    for fiche in fiches(queryset):
+        index[fiche.pk] = fiche
+        for cle in fiche.cles():
+            blocs[cle].append(fiche.pk)
+    # Pas d'ensemble des paires déjà comparées : il croîtrait avec toutes les comparaisons. Une paire
+    # revue dans un autre bloc est sautée si elle est déjà réunie, sinon recalculée à l'identique.
+    union, a_revoir, scores = UnionFind(), {}, {}
+    for membres in blocs.values():
+        for a, b in paires(membres, index):
+            if union.find(a) == union.find(b):
+                continue
+            paire = (a, b) if str(a) < str(b) else (b, a)
+            valeur = score(index[a], index[b])
+            if valeur >= seuil:
+                union.union(a, b)
+                scores[paire] = valeur
+            elif valeur >= seuil_revue:
+                a_revoir[paire] = (index[paire[0]], index[paire[1]], valeur)
+    groupes = []
+    for membres in union.groupes():
+        groupe = [index[pk] for pk in membres]
+        if not contradictoire(groupe):
+            groupes.append(groupe)
+            continue
+        refuses = set(membres)
+        for paire in [paire for paire in scores if paire[0] in refuses]:
+            a_revoir[paire] = (index[paire[0]], index[paire[1]], scores.pop(paire))
+    return groupes, list(a_revoir.values()), scores
+
+
+def survivants(groupes):
+    """``{doublon: survivant}`` : la fiche la plus complète (puis la plus ancienne) de chaque groupe"""
+    pks = [fiche.pk for groupe in groupes for fiche in groupe]
+    completude = {}
+    for row in Partie.objects.filter(pk__in=pks).values('id', *CHAMPS_COMPLETUDE).iterator():
+        completude[row['id']] = sum(1 for champ in CHAMPS_COMPLETUDE if row[champ])
+    correspondance = {}
+    for groupe in groupes:
+        survivant = max(groupe, key=lambda f: (completude.get(f.pk, 0), -f.creation.timestamp(), str(f.pk)))
+        correspondance.update({fiche.pk: survivant.pk for fiche in groupe if fiche.pk != survivant.pk})
+    return correspondance
+
+
+def repointer(queryset, correspondance, champ='partie_id'):
+    """Un UPDATE ``champ = CASE …`` pour tout le lot de correspondances"""
+    # L'UPDATE contourne auto_now : sans date de modification, /api/sync/ ne verrait pas le changement
+    return queryset.filter(**{f'{champ}__in': list(correspondance)}).update(date_modification=timezone.now(), **{
+        champ: Case(
+            *[When(**{champ: doublon}, then=Value(survivant)) for doublon, survivant in correspondance.items()],
+            output_field=UUIDField(),
+        ),
+    })
+
+
+@transaction.atomic
+def fusionner(correspondance, scores=None):
+    """Fusionne un lot de doublons sur leurs survivants ; renvoie le nombre de liens repointés.
+
+    Un doublon et son survivant peuvent figurer au même dossier avec la même
+    qualité : l'unicité ``(dossier, partie, qualite)`` interdit alors de
+    repointer. Le lien du doublon reste sur lui, désactivé : sa désactivation
+    se propage aux clients synchronisés, ce que ne ferait pas une suppression.
+    """
+    if not correspondance:
+        return 0
+    concernes = set(correspondance) | set(correspondance.values())
+    liens = PartieAuDossier.objects.filter(partie_id__in=concernes).values_list('id', 'dossier_id', 'partie_id', 'qualite')
+    gardes, en_trop = set(), []
+    # Les liens des survivants d'abord : ce sont eux qui restent en cas de collision
+    for pk, dossier_id, partie_id, qualite in sorted(liens, key=lambda lien: lien[2] in correspondance):
+        cle = (dossier_id, correspondance.get(partie_id, partie_id), qualite)
+        if cle in gardes:
+            en_trop.append(pk)
+        else:
+            gardes.add(cle)
+    PartieAuDossier.objects.filter(pk__in=en_trop).update(est_actif=False, date_modification=timezone.now())
+    parties.indexer(en_trop)
+    repointes = repointer(PartieAuDossier.objects.exclude(pk__in=en_trop), correspondance)
+    repointer(IndexPartie.objects.all(), correspondance)
+    Partie.objects.filter(pk__in=list(correspondance)).update(est_actif=False, date_modification=timezone.now())
+    scores = scores or {}
+    # Sans score direct, le doublon a rejoint le groupe par transitivité
+    FusionPartie.objects.bulk_create([
+        FusionPartie(doublon_id=doublon, survivant_id=survivant,
+                     score=scores.get(tuple(sorted((doublon, survivant), key=str))))
+        for doublon, survivant in correspondance.items()
+    ])
+    return repointes
+
+
+def dedoublonner(queryset=None, seuil=0.92, seuil_revue=0.8, lot=500, dry_run=False):
+    """Détecte puis fusionne par lots de ``lot`` doublons ; renvoie un résumé"""
+    groupes, a_revoir, scores = detecter(queryset, seuil, seuil_revue)
+    correspondance = survivants(groupes)
+    repointes = 0
+    if not dry_run:
+        items = list(correspondance.items())
+        for start in range(0, len(items), lot):
+            repointes += fusionner(dict(items[start:start + lot]), scores)
+    return {'groupes': groupes, 'doublons': len(correspondance), 'liens_repointes': repointes,
+            'a_revoir': a_revoir, 'correspondance': correspondance}
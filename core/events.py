@@ -0,0 +1,122 @@
+"""Diffusion des changements de dossiers, audiences et notes vers les clients.
+
+Les modèles publient des événements compacts sur un canal par tribunal (et
+sur le canal ``tous``) ; la vue SSE de :mod:`core.async_views` s'y abonne.
+Le courtier est configurable par ``EVENT_BROKER`` : le courtier en mémoire
+suffit pour un seul processus ASGI, un déploiement multi-processus doit
+fournir une implémentation de :class:`Broker` adossée à un courtier partagé.
+"""
+import asyncio
+import itertools
+import threading
+from collections import defaultdict, deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+ALL_CHANNEL = 'tous'
+
+
+def tribunal_channel(tribunal_id):
+    return f"tribunal:{tribunal_id}"
+
+
+class Broker:
+    """Interface d'un courtier d'événements"""
+
+    def publish(self, channel, event):
+        """Publie ``event`` (dictionnaire sérialisable en JSON) sur ``channel``"""
+        raise NotImplementedError
+
+    async def subscribe(self, channel, last_event_id=None, heartbeat=None):
+        """Itérateur asynchrone de couples ``(id, événement)``.
+
+        Rejoue les événements postérieurs à ``last_event_id`` encore disponibles,
+        puis produit ``None`` après ``heartbeat`` secondes sans événement.
+        """
+        raise NotImplementedError
+        yield
+
+
+class InProcessBroker(Broker):
+    """Courtier en mémoire du processus, avec historique court pour la reprise.
+
+    ``publish`` peut être appelé depuis n'importe quel thread : les événements
+    sont remis à chaque abonné dans sa boucle d'événements. Un abonné trop lent
+    perd ses événements les plus anciens plutôt que de bloquer les autres.
+    """
+
+    def __init__(self, history_size=1000, queue_size=200):
+        self.history_size = history_size
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history = defaultdict(lambda: deque(maxlen=self.history_size))
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, event):
+        with self._lock:
+            item = (next(self._ids), event)
+            self._history[channel].append(item)
+            subscribers = list(self._subscribers[channel])
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, item)
+            except RuntimeError:
+                # Boucle fermée : l'abonné a disparu sans se désinscrire
+                with self._lock:
+                    self._subscribers[channel].discard((loop, queue))
+
+    @staticmethod
+    def _deliver(queue, item):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def subscribe(self, channel, last_event_id=None, heartbeat=None):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+            backlog = [] if last_event_id is None else [
+                item for item in self._history[channel] if item[0] > last_event_id
+            ]
+        try:
+            for item in backlog:
+                yield item
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENT_BROKER)()
+
+
+def publish(tribunal_id, event):
+    broker = get_broker()
+    broker.publish(ALL_CHANNEL, event)
+    if tribunal_id is not None:
+        broker.publish(tribunal_channel(tribunal_id), event)
+
+
+def dossier_event(dossier, op):
+    return {'type': 'dossier', 'op': op, 'id': str(dossier.pk), 'numero_rg': dossier.numero_rg,
+            'etat': dossier.etat, 'urgence': dossier.urgence}
+
+
+def audience_event(audience, op):
+    return {'type': 'audience', 'op': op, 'id': str(audience.pk), 'dossier': str(audience.dossier_id),
+            'etat': audience.etat, 'date_prevue': audience.date_prevue.isoformat(),
+            'salle': audience.salle}
+
+
+def note_event(note, op):
+    return {'type': 'note', 'op': op, 'id': str(note.pk), 'dossier': str(note.dossier_id)}
@@ -0,0 +1,190 @@
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+
+PHASES = ('db', 'serialization', 'render')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Temps d'une requête ventilé par phase, en temps propre (phases exclusives).
+
+    Une phase imbriquée suspend sa phase parente : une requête SQL déclenchée
+    pendant la sérialisation compte en ``db`` et non en ``serialization``.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.queries = 0
+        self._stack = []
+
+    def enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.phases[parent[0]] += now - parent[1]
+        self._stack.append([name, now])
+
+    def exit(self):
+        now = time.perf_counter()
+        name, since = self._stack.pop()
+        self.phases[name] += now - since
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def breakdown(self):
+        """Durées en secondes par phase, plus ``other`` (code de la vue) et ``total``"""
+        total = time.perf_counter() - self.started
+        durations = {name: self.phases.get(name, 0.0) for name in PHASES}
+        durations['other'] = max(total - sum(durations.values()), 0.0)
+        durations['total'] = total
+        return durations
+
+
+@contextmanager
+def phase(name):
+    """Impute le bloc à la phase ``name`` de la requête instrumentée en cours"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    timings.enter(name)
+    try:
+        yield
+    finally:
+        timings.exit()
+
+
+@contextmanager
+def track_request():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """Wrapper d'exécution imputant les requêtes SQL à la phase ``db``"""
+    timings = _current.get()
+    if timings is not None:
+        timings.queries += 1
+    with phase('db'):
+        return execute(sql, params, many, context)
+
+
+class MetricsRegistry:
+    """Histogrammes et compteurs en mémoire du processus, exposés au format Prometheus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter()
+            self.queries = Counter()
+            self.buckets = defaultdict(lambda: [0] * len(BUCKETS))
+            self.sums = defaultdict(float)
+            self.counts = Counter()
+
+    def observe(self, view, method, status, durations, queries):
+        with self._lock:
+            self.requests[(view, method, str(status))] += 1
+            self.queries[view] += queries
+            for name, seconds in durations.items():
+                key = (view, name)
+                self.sums[key] += seconds
+                self.counts[key] += 1
+                counts = self.buckets[key]
+                for index, bound in enumerate(BUCKETS):
+                    if seconds <= bound:
+                        counts[index] += 1
+
+    def render(self):
+        lines = [
+            '# HELP bdj_requests_total Requêtes HTTP traitées',
+            '# TYPE bdj_requests_total counter',
+        ]
+        with self._lock:
+            for (view, method, status), value in sorted(self.requests.items()):
+                lines.append(f'bdj_requests_total{{view="{view}",method="{method}",status="{status}"}} {value}')
+            lines += [
+                '# HELP bdj_db_queries_total Requêtes SQL exécutées',
+                '# TYPE bdj_db_queries_total counter',
+            ]
+            for view, value in sorted(self.queries.items()):
+                lines.append(f'bdj_db_queries_total{{view="{view}"}} {value}')
+            lines += [
+                '# HELP bdj_request_phase_seconds Durée des requêtes par phase',
+                '# TYPE bdj_request_phase_seconds histogram',
+            ]
+            for (view, name), counts in sorted(self.buckets.items()):
+                labels = f'view="{view}",phase="{name}"'
+                for bound, value in zip(BUCKETS, counts):
+                    lines.append(f'bdj_request_phase_seconds_bucket{{{labels},le="{bound}"}} {value}')
+                lines.append(f'bdj_request_phase_seconds_bucket{{{labels},le="+Inf"}} {self.counts[(view, name)]}')
+                lines.append(f'bdj_request_phase_seconds_sum{{{labels}}} {self.sums[(view, name)]:.6f}')
+                lines.append(f'bdj_request_phase_seconds_count{{{labels}}} {self.counts[(view, name)]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class SamplingProfiler:
+    """Échantillonne la pile d'un thread et l'écrit au format « folded » des flamegraphs.
+
+    Chaque ligne du fichier produit est ``module:fonction;...;module:fonction N``,
+    lisible par flamegraph.pl, speedscope ou inferno.
+    """
+
+    def __init__(self, thread_id=None, interval=0.001):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('w') as output:
+            for stack, count in self.samples.most_common():
+                output.write(f"{stack} {count}\n")
+        return path
+
+
+def client_allowed(request):
+    return request.META.get('REMOTE_ADDR') in settings.INSTRUMENTATION_ALLOWED_IPS
@@ -0,0 +1,216 @@
+"""Jetons d'accès signés pour l'API.
+
+Un jeton porte le profil résolu de l'utilisateur (rôle, magistrat ou avocat,
+tribunal et parquet) : signé avec ``SECRET_KEY``, il suffit à authentifier
+et à filtrer une requête sans aucun accès à la base. Seule l'émission lit
+l'utilisateur et son profil, en une requête.
+
+La révocation passe par le cache, une clé par jeton révoqué et une par
+utilisateur (date avant laquelle tous ses jetons sont refusés) : deux
+révocations simultanées ne s'écrasent pas. Chaque processus garde ce qu'il
+a lu au plus ``API_TOKEN_REVOCATION_REFRESH_SECONDS`` ; les clés expirent
+avec les jetons qu'elles visent.
+"""
+import secrets
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from functools import cached_property
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+
+from .acces import Acces
+
+
+SALT = 'core.jetons'
+
+# Lectures de révocations gardées par processus au-delà desquelles les périmées sont purgées
+LECTURES_MAX = 10000
+
+# Attributs du modèle ``User`` lisibles sur un principal : les seuls qui le chargent
+ATTRIBUTS_UTILISATEUR = frozenset({
+    'email', 'first_name', 'last_name', 'is_staff', 'last_login', 'date_joined', 'groups', 'user_permissions',
+    'get_full_name', 'get_short_name', 'has_perm', 'has_perms', 'has_module_perms', 'get_all_permissions',
+    'get_group_permissions', 'get_user_permissions',
+})
+
+
+class JetonInvalide(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Utilisateur authentifié par jeton, utilisable comme ``request.user``"""
+    id: int
+    username: str
+    role: str
+    magistrat_id: str = None
+    avocat_id: str = None
+    tribunal_id: str = None
+    parquet_id: str = None
+    is_superuser: bool = False
+    jti: str = ''
+    emis: float = 0.0
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def expiration(self):
+        return self.emis + settings.API_TOKEN_TTL_SECONDS
+
+    @property
+    def acces(self):
+        return Acces(utilisateur_id=self.id, magistrat_id=self.magistrat_id, avocat_id=self.avocat_id,
+                     tout=self.is_superuser)
+
+    @cached_property
+    def utilisateur(self):
+        """Modèle ``User`` complet, chargé seulement si une vue en a besoin"""
+        return User.objects.get(pk=self.id)
+
+    def __getattr__(self, name):
+        # Un attribut inconnu ne doit pas coûter une requête en silence
+        if name not in ATTRIBUTS_UTILISATEUR:
+            raise AttributeError(f"'Principal' object has no attribute '{name}'")
+        return getattr(self.utilisateur, name)
+
+    def get_username(self):
+        return self.username
+
+    def __str__(self):
+        return self.username
+
+
+def role(row):
+    if row['is_superuser']:
+        return 'ADMIN'
+    if row['magistrat__id']:
+        return row['magistrat__type_magistrat']
+    if row['avocat__id']:
+        return 'AVOCAT'
+    return 'UTILISATEUR'
+
+
+def str_ou_none(value):
+    return None if value is None else str(value)
+
+
+def principal_pour(user_id):
+    """Profil de l'utilisateur, résolu en une requête"""
+    row = User.objects.filter(pk=user_id, is_active=True).values(
+        'id', 'username', 'is_superuser', 'magistrat__id', 'magistrat__type_magistrat',
+        'magistrat__tribunal_id', 'magistrat__parquet_id', 'avocat__id',
+    ).first()
+    if row is None:
+        raise JetonInvalide("Utilisateur inconnu ou désactivé")
+    return Principal(
+        id=row['id'], username=row['username'], role=role(row),
+        magistrat_id=str_ou_none(row['magistrat__id']), avocat_id=str_ou_none(row['avocat__id']),
+        tribunal_id=str_ou_none(row['magistrat__tribunal_id']),
+        parquet_id=str_ou_none(row['magistrat__parquet_id']),
+        is_superuser=row['is_superuser'], jti=secrets.token_urlsafe(9), emis=round(time.time(), 3),
+    )
+
+
+def emettre(user):
+    """``(jeton, principal)`` pour ``user``"""
+    principal = principal_pour(user.pk)
+    payload = {
+        'u': principal.id, 'n': principal.username, 'r': principal.role,
+        'm': principal.magistrat_id, 'a': principal.avocat_id,
+        't': principal.tribunal_id, 'p': principal.parquet_id,
+        's': principal.is_superuser, 'j': principal.jti, 'i': principal.emis,
+    }
+    return signing.dumps(payload, salt=SALT, compress=True), principal
+
+
+def lire(jeton):
+    """Principal d'un jeton valide, non expiré et non révoqué ; :class:`JetonInvalide` sinon"""
+    try:
+        payload = signing.loads(jeton, salt=SALT)
+    except signing.BadSignature as exc:
+        raise JetonInvalide("Jeton invalide") from exc
+    principal = Principal(
+        id=payload['u'], username=payload['n'], role=payload['r'],
+        magistrat_id=payload['m'], avocat_id=payload['a'],
+        tribunal_id=payload['t'], parquet_id=payload['p'],
+        is_superuser=payload['s'], jti=payload['j'], emis=payload['i'],
+    )
+    if principal.expiration <= time.time():
+        raise JetonInvalide("Jeton expiré")
+    if revocations.contient(principal):
+        raise JetonInvalide("Jeton révoqué")
+    return principal
+
+
+def expiration_iso(principal):
+    return datetime.fromtimestamp(principal.expiration, dt_timezone.utc).isoformat()
+
+
+def cle_jeton(jti):
+    return f'core:jetons:revoque:{jti}'
+
+
+def cle_utilisateur(user_id):
+    return f'core:jetons:revoque:u:{user_id}'
+
+
+class ListeRevocation:
+    """Révocations lues dans le cache, gardées localement le temps du rafraîchissement"""
+
+    def __init__(self):
+        # Clé de cache → (valeur, lue à) ; ``None`` : aucune révocation
+        self.lues = {}
+
+    def lire(self, cles):
+        now = time.time()
+        a_lire = [cle for cle in cles
+                  if cle not in self.lues or now - self.lues[cle][1] >= settings.API_TOKEN_REVOCATION_REFRESH_SECONDS]
+        if a_lire:
+            if len(self.lues) > LECTURES_MAX:
+                self.lues = {cle: lue for cle, lue in self.lues.items()
+                             if now - lue[1] < settings.API_TOKEN_REVOCATION_REFRESH_SECONDS}
+            valeurs = cache.get_many(a_lire)
+            self.lues.update({cle: (valeurs.get(cle), now) for cle in a_lire})
+        return [self.lues[cle][0] for cle in cles]
+
+    def contient(self, principal):
+        jeton, utilisateur = self.lire([cle_jeton(principal.jti), cle_utilisateur(principal.id)])
+        return jeton is not None or principal.emis < (utilisateur or 0)
+
+    def ajouter(self, jetons=None, utilisateurs=None):
+        valeurs = {cle_jeton(jti): fin for jti, fin in (jetons or {}).items()}
+        valeurs.update({cle_utilisateur(user_id): date for user_id, date in (utilisateurs or {}).items()})
+        # Une révocation ne sert plus une fois expirés les jetons qu'elle vise
+        cache.set_many(valeurs, settings.API_TOKEN_TTL_SECONDS)
+        now = time.time()
+        self.lues.update({cle: (valeur, now) for cle, valeur in valeurs.items()})
+
+
+revocations = ListeRevocation()
+
+
+def revoquer(principal):
+    """Révoque un jeton jusqu'à son expiration"""
+    revocations.ajouter(jetons={principal.jti: principal.expiration})
+
+
+def revoquer_utilisateur(user_id):
+    """Révoque tous les jetons déjà émis pour l'utilisateur"""
+    revocations.ajouter(utilisateurs={user_id: time.time()})
+
+
+def jeton_requete(request):
+    """Jeton ``Authorization: Bearer …`` de la requête, ou ``None``"""
+    scheme, _, jeton = request.headers.get('Authorization', '').partition(' ')
+    return jeton.strip() if scheme.lower() == 'bearer' and jeton.strip() else None
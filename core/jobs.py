@@ -0,0 +1,162 @@
+"""Cadre des traitements de maintenance par lots (commandes de gestion).
+
+Une tâche hérite de :class:`BaseJobCommand` et fournit le queryset à
+parcourir et le traitement d'un lot de clés primaires. Le parcours se fait
+par pagination sur la clé (``pk > dernier``), jamais par OFFSET ; les lots
+sont traités dans un pool de processus et la progression est enregistrée
+dans :class:`~core.models.JobCheckpoint`, si bien qu'une tâche interrompue
+reprend après le dernier lot validé — si elle est relancée avec les mêmes
+options : d'autres options désignent d'autres lignes, et la tâche repart
+alors du début. Un lot pouvant être rejoué après une
+panne, son traitement doit être idempotent.
+"""
+import hashlib
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management import load_command_class
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from .models import JobCheckpoint
+
+
+# Options propres à BaseCommand, inutiles (et parfois non sérialisables) dans les workers
+COMMAND_OPTIONS = {'stdout', 'stderr', 'verbosity', 'settings', 'pythonpath', 'traceback',
+                   'no_color', 'force_color', 'skip_checks'}
+
+# Options de conduite de l'exécution, sans effet sur les lignes parcourues
+RUN_OPTIONS = {'chunk_size', 'workers', 'restart'}
+
+
+def init_worker():
+    django.setup()  # Sans effet après un fork, nécessaire avec spawn/forkserver
+    for conn in connections.all(initialized_only=True):
+        # Connexion héritée du parent : abandonnée sans la fermer, le parent s'en sert encore
+        conn.connection = None
+
+
+def run_chunk(app_name, command_name, pks, options):
+    """Point d'entrée d'un worker : recharge la commande et traite un lot"""
+    command = load_command_class(app_name, command_name)
+    return command.process_chunk(pks, options)
+
+
+def parametres(options):
+    """Empreinte des options qui déterminent les lignes traitées"""
+    contenu = json.dumps({key: value for key, value in options.items() if key not in RUN_OPTIONS},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(contenu.encode()).hexdigest()
+
+
+def keyset_chunks(queryset, chunk_size, after=None):
+    """Lots successifs de clés primaires de ``queryset``, par ordre croissant"""
+    while True:
+        page = queryset.order_by('pk')
+        if after is not None:
+            page = page.filter(pk__gt=after)
+        pks = list(page.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return
+        yield pks
+        after = pks[-1]
+
+
+class BaseJobCommand(BaseCommand):
+    """Commande de tâche par lots, reprenable.
+
+    Les sous-classes définissent :meth:`get_queryset` et :meth:`process_chunk`,
+    qui renvoie le nombre de lignes effectivement modifiées.
+    """
+    chunk_size = 1000
+
+    @property
+    def job_name(self):
+        return self.__module__.rsplit('.', 1)[-1]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=self.chunk_size)
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Processus de traitement (0 : dans le processus courant)")
+        parser.add_argument('--restart', action='store_true',
+                            help="Ignore le point de reprise et repart du début")
+
+    def get_queryset(self, options):
+        raise NotImplementedError
+
+    def process_chunk(self, pks, options):
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        job_options = {key: value for key, value in options.items() if key not in COMMAND_OPTIONS}
+        empreinte = parametres(job_options)
+        checkpoint, _ = JobCheckpoint.objects.get_or_create(nom=self.job_name)
+        after = None
+        if checkpoint.etat in ('EN_COURS', 'ECHEC') and not options['restart']:
+            if checkpoint.parametres == empreinte:
+                after = checkpoint.dernier_pk or None
+            elif checkpoint.dernier_pk:
+                self.stdout.write("Point de reprise laissé par d'autres options : la tâche repart du début")
+        if after:
+            self.stdout.write(f"Reprise après {after} ({checkpoint.traites} lignes déjà traitées)")
+        else:
+            checkpoint.traites = checkpoint.modifies = 0
+            checkpoint.dernier_pk = ''
+            checkpoint.date_debut = timezone.now()
+        checkpoint.etat, checkpoint.date_fin, checkpoint.parametres = 'EN_COURS', None, empreinte
+        checkpoint.save()
+
+        chunks = keyset_chunks(self.get_queryset(options), options['chunk_size'], after)
+        start, seen = time.perf_counter(), 0
+        try:
+            for pks, changed in self.run(chunks, job_options, options['workers']):
+                seen += len(pks)
+                checkpoint.dernier_pk = str(pks[-1])
+                checkpoint.traites += len(pks)
+                checkpoint.modifies += changed
+                checkpoint.save(update_fields=['dernier_pk', 'traites', 'modifies', 'date_modification'])
+                if options['verbosity'] > 1:
+                    self.report(seen, start)
+        except BaseException:
+            checkpoint.etat = 'ECHEC'
+            checkpoint.save(update_fields=['etat', 'date_modification'])
+            raise
+        checkpoint.etat, checkpoint.date_fin = 'TERMINE', timezone.now()
+        checkpoint.dernier_pk = ''
+        checkpoint.save()
+        self.report(seen, start, final=True, changed=checkpoint.modifies)
+
+    def run(self, chunks, options, workers):
+        """``(pks, modifiés)`` de chaque lot, dans l'ordre des lots.
+
+        Avec un pool, les lots s'achèvent dans le désordre : on ne rend un lot
+        qu'une fois tous les précédents terminés, pour que le point de reprise
+        ne saute jamais un lot inachevé.
+        """
+        if workers < 1:
+            for pks in chunks:
+                yield pks, self.process_chunk(pks, options)
+            return
+        app_name, command_name = self.__module__.split('.')[0], self.job_name
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            for pks in chunks:
+                pending.append((pks, pool.submit(run_chunk, app_name, command_name, pks, options)))
+                while len(pending) > workers * 2 or (pending and pending[0][1].done()):
+                    pks, future = pending.popleft()
+                    yield pks, future.result()
+            while pending:
+                pks, future = pending.popleft()
+                yield pks, future.result()
+
+    def report(self, seen, start, final=False, changed=None):
+        elapsed = time.perf_counter() - start
+        rate = seen / elapsed if elapsed else 0
+        message = f"{seen} lignes en {elapsed:.1f} s ({rate:.0f} lignes/s)"
+        if final:
+            message = f"{self.job_name} : {message}, {changed} modifiées"
+        self.stdout.write(message)
@@ -0,0 +1,119 @@
+"""Grand livre des frais de justice.
+
+Les paiements sont des écritures (:class:`PaiementFrais`) ; ``montant_paye``
+et ``etat`` de :class:`Frais` en sont la projection, tenue à jour par des
+UPDATE ensemblistes plutôt que par des ``save()`` ligne à ligne. La bascule
+quotidienne vers ``EN_RETARD`` et les états des créances se calculent de
+même entièrement en SQL.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .models import Frais, PaiementFrais
+
+
+# États qui ne changent plus avec le temps ni les paiements
+ETATS_CLOS = ('PAYE', 'EXONERE')
+
+GROUPEMENTS = {
+    'tribunal': ('dossier__tribunal', 'dossier__tribunal__nom'),
+    'dossier': ('dossier', 'dossier__numero_rg'),
+}
+
+
+class PaiementInvalide(ValueError):
+    pass
+
+
+def solde():
+    return F('montant') - F('montant_paye')
+
+
+def etat_expression(cumul, today):
+    """Expression SQL de l'état d'un frais dont le cumul payé vaut ``cumul``"""
+    return Case(
+        When(etat='EXONERE', then=Value('EXONERE')),
+        When(montant__lte=cumul, then=Value('PAYE')),
+        When(date_echeance__lt=today, then=Value('EN_RETARD')),
+        When(GreaterThan(cumul, 0), then=Value('PARTIEL')),
+        default=Value('A_PAYER'),
+    )
+
+
+def basculer_retards(today=None, queryset=None):
+    """Passe en ``EN_RETARD`` les frais échus non soldés, en un seul UPDATE ; renvoie leur nombre"""
+    today = today or timezone.localdate()
+    queryset = Frais.objects.all() if queryset is None else queryset
+    # update() contourne auto_now : date_modification est posée pour la synchronisation
+    return queryset.filter(etat__in=['A_PAYER', 'PARTIEL'], date_echeance__lt=today).update(
+        etat='EN_RETARD', date_modification=timezone.now(),
+    )
+
+
+def recalculer_etats(today=None, queryset=None):
+    """Recalcule l'état de chaque frais ouvert à partir de son cumul payé (un seul UPDATE)"""
+    today = today or timezone.localdate()
+    queryset = Frais.objects.all() if queryset is None else queryset
+    return queryset.exclude(etat__in=ETATS_CLOS).update(
+        etat=etat_expression(F('montant_paye'), today), date_modification=timezone.now(),
+    )
+
+
+@transaction.atomic
+def enregistrer_paiement(frais, montant, date_paiement=None, mode_paiement='', numero_recu='', utilisateur=None):
+    """Ajoute une écriture de paiement et met à jour la projection du frais.
+
+    La mise à jour s'exprime relativement (``F('montant_paye') + montant``) :
+    deux paiements concurrents sur le même frais s'additionnent sans verrou.
+    """
+    montant = Decimal(montant)
+    if montant <= 0:
+        raise PaiementInvalide("Le montant d'un paiement doit être positif")
+    if frais.etat == 'EXONERE':
+        raise PaiementInvalide("Ce frais est exonéré")
+    date_paiement = date_paiement or timezone.localdate()
+    paiement = PaiementFrais.objects.create(
+        frais=frais, montant=montant, date_paiement=date_paiement,
+        mode_paiement=mode_paiement, numero_recu=numero_recu, enregistre_par=utilisateur,
+    )
+    cumul = F('montant_paye') + montant
+    Frais.objects.filter(pk=frais.pk).update(
+        montant_paye=cumul,
+        etat=etat_expression(cumul, timezone.localdate()),
+        date_paiement=date_paiement,
+        mode_paiement=mode_paiement,
+        numero_recu=numero_recu,
+        date_modification=timezone.now(),
+    )
+    frais.refresh_from_db(fields=['montant_paye', 'etat', 'date_paiement', 'mode_paiement',
+                                  'numero_recu', 'date_modification'])
+    return paiement
+
+
+def creances(par='tribunal', today=None, queryset=None):
+    """Créances agrégées par tribunal ou par dossier : dû, payé, solde, part échue"""
+    if par not in GROUPEMENTS:
+        raise ValueError(f"Groupement inconnu : {par}")
+    today = today or timezone.localdate()
+    queryset = Frais.objects.all() if queryset is None else queryset
+    montant = DecimalField(max_digits=14, decimal_places=2)
+    zero = Value(Decimal('0'), output_field=montant)
+    return (
+        queryset.filter(est_actif=True).exclude(etat='EXONERE')
+        .values(*GROUPEMENTS[par])
+        .annotate(
+            nombre=Count('id'),
+            total_du=Coalesce(Sum('montant'), zero),
+            total_paye=Coalesce(Sum('montant_paye'), zero),
+            solde=Coalesce(Sum(solde(), output_field=montant), zero),
+            solde_echu=Coalesce(Sum(solde(), output_field=montant,
+                                    filter=Q(date_echeance__lt=today) & ~Q(etat='PAYE')), zero),
+            nombre_en_retard=Count('id', filter=Q(etat='EN_RETARD')),
+        )
+        .order_by('-solde')
+    )
@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.utils import timezone
+
+from core import ledger
+from core.jobs import BaseJobCommand
+from core.models import Frais
+
+
+class Command(BaseJobCommand):
+    help = "Bascule en retard les frais échus non soldés (à planifier quotidiennement)"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help="Date de référence (AAAA-MM-JJ), aujourd'hui par défaut")
+        parser.add_argument('--recalculer', action='store_true',
+                            help="Recalcule l'état de tous les frais ouverts d'après leur cumul payé")
+
+    def get_queryset(self, options):
+        if options['recalculer']:
+            return Frais.objects.exclude(etat__in=ledger.ETATS_CLOS)
+        today = options['date'] or timezone.localdate()
+        return Frais.objects.filter(etat__in=['A_PAYER', 'PARTIEL'], date_echeance__lt=today)
+
+    def process_chunk(self, pks, options):
+        queryset = Frais.objects.filter(pk__in=pks)
+        if options['recalculer']:
+            return ledger.recalculer_etats(options['date'], queryset)
+        return ledger.basculer_retards(options['date'], queryset)
@@ -0,0 +1,24 @@
+from django.utils import timezone
+
+from core.charges import ETATS_TERMINES
+from core.jobs import BaseJobCommand
+from core.models import Dossier
+
+
+class Command(BaseJobCommand):
+    help = "Archive les dossiers terminés depuis plus de --annees ans"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--annees', type=int, default=5)
+
+    def get_queryset(self, options):
+        today = timezone.localdate()
+        limite = today.replace(year=today.year - options['annees'], day=min(today.day, 28))
+        return Dossier.objects.filter(etat__in=ETATS_TERMINES, date_cloture__lt=limite,
+                                      date_archivage__isnull=True)
+
+    def process_chunk(self, pks, options):
+        return self.get_queryset(options).filter(pk__in=pks).update(
+            date_archivage=timezone.localdate(), date_modification=timezone.now(),
+        )
@@ -0,0 +1,91 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def fetch(reader, writer, host, target):
+    """Envoie une requête GET HTTP/1.1 keep-alive et lit la réponse complète ; renvoie le statut"""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nAccept: application/json\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        while size := int((await reader.readline()).strip() or b'0', 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status
+
+
+async def client(url, deadline, latencies, errors):
+    """Un client : une connexion persistante, des requêtes enchaînées jusqu'à l'échéance"""
+    parts = urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else '')
+    try:
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    except OSError:
+        errors.append('connexion')
+        return
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = await fetch(reader, writer, parts.netloc, target)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+        errors.append('coupure')
+    finally:
+        writer.close()
+
+
+async def load(url, clients, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(url, deadline, latencies, errors) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+class Command(BaseCommand):
+    help = ("Mesure le débit d'endpoints sous N clients concurrents, typiquement la même "
+            "vue servie en WSGI (gunicorn bdj.wsgi) et en ASGI (uvicorn bdj.asgi:application)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', metavar='label=url',
+                            help="Ex. wsgi=http://127.0.0.1:8000/api/recherche/?q=RG "
+                                 "asgi=http://127.0.0.1:8001/api/async/recherche/?q=RG")
+        parser.add_argument('--clients', type=int, default=1000,
+                            help="Clients simultanés (relever ulimit -n au-delà d'environ 1000)")
+        parser.add_argument('--duration', type=float, default=20.0, help="Durée par cible en secondes")
+
+    def handle(self, *args, **options):
+        targets = []
+        for item in options['urls']:
+            label, separator, url = item.partition('=')
+            if not separator or '://' in label:
+                label, url = item, item
+            if not url.startswith('http://'):
+                raise CommandError(f"URL http:// attendue : {item}")
+            targets.append((label, url))
+
+        self.stdout.write(f"{'cible':<12} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erreurs':>8}")
+        for label, url in targets:
+            latencies, errors, elapsed = asyncio.run(load(url, options['clients'], options['duration']))
+            if not latencies:
+                self.stdout.write(f"{label:<12} aucune réponse ({len(errors)} erreurs)")
+                continue
+            latencies.sort()
+            quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            self.stdout.write(
+                f"{label:<12} {len(latencies) / elapsed:>10.1f} {quantiles[49] * 1000:>9.1f} "
+                f"{quantiles[94] * 1000:>9.1f} {quantiles[98] * 1000:>9.1f} {len(errors):>8}"
+            )
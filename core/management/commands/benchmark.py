@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core import benchmarks
+from core.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = ("Exécute les benchmarks sur une base de test peuplée de données synthétiques "
+            "et compare aux références enregistrées")
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Benchmarks à exécuter (tous par défaut)")
+        parser.add_argument('--scale', type=float, default=0.5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Ralentissement toléré par rapport à la référence (0.25 = 25 %%)")
+        parser.add_argument('--record', action='store_true',
+                            help="Enregistre les résultats comme nouvelles références")
+        parser.add_argument('--use-existing', action='store_true',
+                            help="Utilise la base configurée telle quelle au lieu d'une base de test")
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(benchmarks.registry)
+        if unknown:
+            raise CommandError(f"Benchmarks inconnus : {', '.join(sorted(unknown))}")
+
+        setup_test_environment()
+        old_name = None
+        try:
+            if not options['use_existing']:
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                generate(options['scale'], seed=options['seed'])
+            results = benchmarks.run_benchmarks(options['names'], repeat=options['repeat'])
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        baselines = benchmarks.load_baselines()
+        self.stdout.write(f"{'benchmark':<36} {'médiane':>10} {'p95':>10} {'réf.':>10} "
+                          f"{'requêtes':>9} {'octets':>10}")
+        for name, result in results.items():
+            baseline = baselines.get(name, {}).get('median_ms', '-')
+            self.stdout.write(f"{name:<36} {result['median_ms']:>10} {result['p95_ms']:>10} "
+                              f"{baseline:>10} {result['queries']:>9} {result.get('bytes', '-'):>10}")
+        for reference, optimise, gain, facteur in benchmarks.gains(results):
+            self.stdout.write(f"{optimise} : {gain}× plus rapide que {reference} (objectif {facteur}×)")
+
+        if options['record']:
+            benchmarks.save_baselines(results)
+            self.stdout.write(self.style.SUCCESS(f"Références enregistrées ({connection.vendor})"))
+            return
+        found = benchmarks.regressions(results, baselines, options['tolerance'])
+        found += [f"{optimise}: {gain}× (objectif {facteur}×)"
+                  for reference, optimise, gain, facteur in benchmarks.gains(results) if gain < facteur]
+        if found:
+            raise CommandError("Régressions détectées :\n" + "\n".join(found))
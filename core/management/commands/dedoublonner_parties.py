@@ -0,0 +1,30 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from core.doublons import dedoublonner
+
+
+class Command(BaseCommand):
+    help = "Détecte et fusionne les parties en double"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seuil', type=float, default=0.92, help="Score à partir duquel on fusionne")
+        parser.add_argument('--seuil-revue', type=float, default=0.8,
+                            help="Score à partir duquel une paire est signalée pour revue")
+        parser.add_argument('--lot', type=int, default=500, help="Doublons fusionnés par transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Détecte sans fusionner")
+        parser.add_argument('--rapport', help="Fichier CSV des paires à revoir")
+
+    def handle(self, *args, **options):
+        resultat = dedoublonner(seuil=options['seuil'], seuil_revue=options['seuil_revue'],
+                                lot=options['lot'], dry_run=options['dry_run'])
+        self.stdout.write(f"{len(resultat['groupes'])} groupes, {resultat['doublons']} doublons, "
+                          f"{resultat['liens_repointes']} liens repointés, "
+                          f"{len(resultat['a_revoir'])} paires à revoir")
+        if options['rapport']:
+            with open(options['rapport'], 'w', newline='') as fichier:
+                writer = csv.writer(fichier)
+                writer.writerow(['partie_a', 'nom_a', 'partie_b', 'nom_b', 'score'])
+                for a, b, valeur in resultat['a_revoir']:
+                    writer.writerow([a.pk, a.nom, b.pk, b.nom, f'{valeur:.3f}'])
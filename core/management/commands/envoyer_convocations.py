@@ -0,0 +1,43 @@
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import convocations
+from core.jobs import init_worker
+
+
+class Command(BaseCommand):
+    help = "Met en file les convocations des audiences à venir et envoie celles qui sont dues"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=200, help="Convocations prises par un worker à la fois")
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Processus d'envoi (0 : dans le processus courant)")
+        parser.add_argument('--sans-planification', action='store_true',
+                            help="Envoie la file sans y ajouter les nouvelles audiences")
+        parser.add_argument('--continu', action='store_true',
+                            help="Reprend toutes les CONVOCATION_POLL_SECONDS au lieu de s'arrêter")
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            if not options['sans_planification']:
+                self.stdout.write(f"{convocations.planifier()} convocations mises en file")
+            resultat = self.envoyer(options['lot'], options['workers'])
+            elapsed = time.perf_counter() - start
+            details = ', '.join(f"{nombre} {etat.lower()}" for etat, nombre in sorted(resultat.items())) or 'file vide'
+            self.stdout.write(f"{resultat.total()} convocations traitées en {elapsed:.1f} s ({details})")
+            if not options['continu']:
+                return
+            time.sleep(settings.CONVOCATION_POLL_SECONDS)
+
+    def envoyer(self, lot, workers):
+        if workers < 1:
+            return convocations.vider(lot)
+        # Les workers se partagent la file : chacun ne prend que les lignes qu'il a marquées
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            futures = [pool.submit(convocations.vider, lot) for _ in range(workers)]
+            return sum((future.result() for future in futures), Counter())
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.utils import timezone
+
+from core import calendrier
+from core.jobs import BaseJobCommand
+
+
+class Command(BaseJobCommand):
+    help = "Déplie les règles de disponibilité des magistrats en créneaux pour une année"
+    chunk_size = 200
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--annee', type=int, default=None, help="Année à générer (défaut : année en cours)")
+        parser.add_argument('--tribunal', default=None)
+
+    def periode(self, options):
+        annee = options['annee'] or timezone.localdate().year
+        return date(annee, 1, 1), date(annee, 12, 31)
+
+    def get_queryset(self, options):
+        queryset = calendrier.regles_actives(*self.periode(options))
+        if options['tribunal']:
+            queryset = queryset.filter(tribunal_id=options['tribunal'])
+        return queryset
+
+    def process_chunk(self, pks, options):
+        return calendrier.generer(self.get_queryset(options).filter(pk__in=pks), *self.periode(options))
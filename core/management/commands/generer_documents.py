@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import documents
+from core.jobs import keyset_chunks
+
+
+class Command(BaseCommand):
+    help = "Génère ou met à jour les documents d'un modèle (décisions, convocations, procès-verbaux)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('modele', choices=sorted(documents.MODELES))
+        parser.add_argument('--format', choices=sorted(documents.FORMATS), default='pdf')
+        parser.add_argument('--tribunal', default=None)
+        parser.add_argument('--lot', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Processus de rendu (0 : dans le processus courant)")
+
+    def handle(self, *args, **options):
+        modele = documents.MODELES[options['modele']]
+        queryset = modele.source.objects.filter(est_actif=True)
+        if options['tribunal']:
+            queryset = queryset.filter(dossier__tribunal_id=options['tribunal'])
+        pool = documents.pool_rendu(options['workers']) if options['workers'] > 0 else None
+        start, vus, rendus = time.perf_counter(), 0, 0
+        try:
+            for pks in keyset_chunks(queryset, options['lot']):
+                try:
+                    resultat = documents.generer(modele.nom, pks, options['format'], pool=pool)
+                except documents.DocumentIrrepresentable as exc:
+                    raise CommandError(f"{exc} ({vus} objets déjà traités)") from exc
+                vus += len(pks)
+                rendus += sum(regenere for piece, regenere in resultat.values())
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(f"{vus} objets, {rendus} documents rendus en {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import reprise
+from core.models import ImportRegistre
+
+
+class Command(BaseCommand):
+    help = "Reprend un registre historique (CSV ou Excel) : mise en attente, contrôle puis chargement"
+
+    def add_arguments(self, parser):
+        parser.add_argument('type', choices=sorted(reprise.CHARGEURS))
+        parser.add_argument('fichier', nargs='?', help="Fichier .csv ou .xlsx, ligne d'en-tête comprise")
+        parser.add_argument('--reprendre', metavar='IMPORT', default=None,
+                            help="Reprend un import interrompu au lieu de lire un fichier")
+        parser.add_argument('--lot', type=int, default=2000)
+        parser.add_argument('--controle-seul', action='store_true',
+                            help="S'arrête après le contrôle, sans rien charger")
+        parser.add_argument('--rapport', default=None,
+                            help="Écrit les lignes rejetées et leurs erreurs dans ce fichier CSV ('-' : sortie)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['reprendre']:
+            import_registre = ImportRegistre.objects.filter(
+                pk=options['reprendre'], type_donnees=options['type']).first()
+            if import_registre is None:
+                raise CommandError(f"Import {options['reprendre']} introuvable pour ce type de données")
+        elif options['fichier']:
+            try:
+                lignes = reprise.lire(options['fichier'])
+            except (OSError, ValueError) as exc:
+                raise CommandError(exc)
+            import_registre = ImportRegistre.objects.create(type_donnees=options['type'],
+                                                            fichier=options['fichier'][-255:])
+            lus = reprise.mettre_en_attente(import_registre, lignes, options['lot'])
+            self.stdout.write(f"Import {import_registre.pk} : {lus} lignes en attente")
+        else:
+            raise CommandError("Indiquer un fichier ou --reprendre")
+
+        rejetees = reprise.valider(import_registre, options['lot'])
+        self.stdout.write(f"{rejetees} lignes rejetées au contrôle")
+        if not options['controle_seul']:
+            crees = reprise.charger(import_registre, options['lot'])
+            self.stdout.write(f"{crees} objets créés")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{import_registre.lignes} lignes, {import_registre.importees} importées, "
+                          f"{import_registre.rejetees} rejetées en {elapsed:.1f} s")
+        if options['rapport']:
+            self.ecrire_rapport(import_registre, options['rapport'])
+
+    def ecrire_rapport(self, import_registre, chemin):
+        if chemin == '-':
+            reprise.rapport(import_registre, self.stdout)
+            return
+        with open(chemin, 'w', newline='', encoding='utf-8') as sortie:
+            reprise.rapport(import_registre, sortie)
@@ -0,0 +1,14 @@
+from core import parties
+from core.jobs import BaseJobCommand
+from core.models import PartieAuDossier
+
+
+class Command(BaseJobCommand):
+    help = "Reconstruit l'index des participations (parties et avocats → dossiers)"
+    chunk_size = 2000
+
+    def get_queryset(self, options):
+        return PartieAuDossier.objects.all()
+
+    def process_chunk(self, pks, options):
+        return parties.indexer(pks)
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from core.jobs import BaseJobCommand
+from core.models import Audience
+
+
+class Command(BaseJobCommand):
+    help = ("Clôt les audiences restées ouvertes : en cours → terminée, "
+            "programmée et dépassée → reportée")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--jours', type=int, default=2,
+                            help="Délai de grâce après la date prévue avant nettoyage")
+
+    def stale(self, options):
+        return Q(etat__in=['PROGRAMMEE', 'EN_COURS'],
+                 date_prevue__lt=timezone.now() - timedelta(days=options['jours']))
+
+    def get_queryset(self, options):
+        return Audience.objects.filter(self.stale(options))
+
+    def process_chunk(self, pks, options):
+        return Audience.objects.filter(self.stale(options), pk__in=pks).update(
+            etat=Case(When(etat='EN_COURS', then=Value('TERMINEE')), default=Value('REPORTEE')),
+            date_modification=timezone.now(),
+        )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core import numeros
+from core.models import SequenceJudiciaire
+
+
+class Command(BaseCommand):
+    help = "Liste les numéros de registre réservés qu'aucun dossier ni aucune décision ne porte"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', type=int, default=None)
+        parser.add_argument('--tribunal', default=None)
+        parser.add_argument('--type', choices=sorted(numeros.CHAMPS), default=None)
+
+    def handle(self, *args, **options):
+        sequences = SequenceJudiciaire.objects.order_by('tribunal__nom', 'annee', 'type_numero')
+        if options['annee']:
+            sequences = sequences.filter(annee=options['annee'])
+        if options['tribunal']:
+            sequences = sequences.filter(tribunal_id=options['tribunal'])
+        if options['type']:
+            sequences = sequences.filter(type_numero=options['type'])
+        for tribunal_id, nom, annee, type_numero, prochain in sequences.values_list(
+            'tribunal_id', 'tribunal__nom', 'annee', 'type_numero', 'prochain',
+        ):
+            plages = numeros.trous(tribunal_id, annee, type_numero)
+            manquants = sum(dernier - premier + 1 for premier, dernier in plages)
+            detail = ', '.join(str(premier) if premier == dernier else f"{premier}-{dernier}"
+                               for premier, dernier in plages)
+            self.stdout.write(f"{type_numero} {nom} {annee} : {manquants} manquants sur {prochain - 1}"
+                              + (f" ({detail})" if detail else ''))
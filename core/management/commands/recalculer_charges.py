@@ -0,0 +1,16 @@
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+from core import charges
+from core.jobs import BaseJobCommand
+
+
+class Command(BaseJobCommand):
+    help = "Recalcule l'index de charge de travail de tous les magistrats et greffiers"
+    chunk_size = 200
+
+    def get_queryset(self, options):
+        return User.objects.filter(Q(magistrat__isnull=False) | Q(attribution__isnull=False)).distinct()
+
+    def process_chunk(self, pks, options):
+        return charges.recalculer(pks)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import recours
+from core.models import RecoursClosure
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement la table de fermeture des voies de recours"
+
+    def handle(self, *args, **options):
+        recours.reconstruire()
+        self.stdout.write(f"{RecoursClosure.objects.count()} liens ancêtre-descendant")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = "Peuple la base avec des données judiciaires synthétiques réalistes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help="Multiplicateur des volumes (1.0 = 4 tribunaux de 250 dossiers)")
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Graine ; changer de graine pour compléter une base déjà peuplée")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts = generate(options['scale'], seed=options['seed'], batch_size=options['batch_size'])
+        for model, count in counts.items():
+            self.stdout.write(f"{model:<20} {count:>10}")
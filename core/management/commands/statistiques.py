@@ -0,0 +1,51 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from core.jobs import BaseJobCommand
+from core.models import Audience, Decision, Dossier, PaiementFrais, StatistiqueTribunal, Tribunal
+
+
+# (champ de StatistiqueTribunal, queryset, chemin du tribunal, date de rattachement, agrégat)
+INDICATEURS = [
+    ('dossiers_enregistres', Dossier.objects.all(), 'tribunal', 'date_enregistrement', Count('id')),
+    ('dossiers_clotures', Dossier.objects.filter(date_cloture__isnull=False), 'tribunal', 'date_cloture',
+     Count('id')),
+    ('audiences_tenues', Audience.objects.filter(etat='TERMINEE'), 'dossier__tribunal', 'date_prevue',
+     Count('id')),
+    ('decisions_rendues', Decision.objects.all(), 'dossier__tribunal', 'date_decision', Count('id')),
+    ('frais_encaisses', PaiementFrais.objects.all(), 'frais__dossier__tribunal', 'date_paiement',
+     Sum('montant')),
+]
+
+
+class Command(BaseJobCommand):
+    help = "Recalcule les statistiques mensuelles de chaque tribunal"
+    chunk_size = 20
+
+    def get_queryset(self, options):
+        return Tribunal.objects.all()
+
+    def process_chunk(self, pks, options):
+        rows = defaultdict(dict)
+        for field, queryset, tribunal, moment, aggregate in INDICATEURS:
+            values = (
+                queryset.filter(**{f'{tribunal}__in': pks})
+                .annotate(mois=TruncMonth(moment)).values_list(tribunal, 'mois')
+                .annotate(valeur=aggregate).order_by()
+            )
+            for tribunal_id, mois, valeur in values:
+                if hasattr(mois, 'date'):
+                    mois = mois.date()
+                rows[tribunal_id, mois][field] = valeur or 0
+        stats = [StatistiqueTribunal(tribunal_id=tribunal_id, mois=mois, **{
+                    field: values.get(field, Decimal('0') if field == 'frais_encaisses' else 0)
+                    for field, *_ in INDICATEURS})
+                 for (tribunal_id, mois), values in rows.items()]
+        StatistiqueTribunal.objects.bulk_create(
+            stats, update_conflicts=True, unique_fields=['tribunal', 'mois'],
+            update_fields=[field for field, *_ in INDICATEURS] + ['date_modification'],
+        )
+        return len(stats)
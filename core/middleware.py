@@ -0,0 +1,330 @@
+import math
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import admission, compression, instrumentation, jetons
+from .budgets import QueryCounter, StatementTimeout, budget_for, check_budget
+from .db_routers import read_from_replica, replica_eligible
+from .utils import view_declaration
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class JetonMiddleware(MiddlewareMixin):
+    """Authentifie les requêtes porteuses d'un jeton (``Authorization: Bearer …``).
+
+    ``request.user`` devient le :class:`~core.jetons.Principal` du jeton, y
+    compris pour les vues fonctions hors DRF ; un jeton invalide, expiré ou
+    révoqué est refusé d'emblée plutôt que traité comme anonyme.
+    """
+
+    def process_request(self, request):
+        jeton = jetons.jeton_requete(request)
+        if jeton is None:
+            return None
+        try:
+            principal = jetons.lire(jeton)
+        except jetons.JetonInvalide as exc:
+            response = JsonResponse({'detail': str(exc)}, status=401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+        request.principal = request.user = principal
+
+        async def auser():
+            return principal
+
+        request.auser = auser
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Envoie les lectures des vues éligibles vers les réplicas.
+
+    Après une écriture réussie, le client reçoit un cookie qui le maintient sur
+    le primaire pendant ``REPLICA_PIN_SECONDS`` afin qu'il relise ses propres
+    modifications malgré le retard de réplication.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with read_from_replica(self.replica_allowed(request)):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        with read_from_replica(self.replica_allowed(request)):
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def replica_allowed(self, request):
+        request.pinned_to_primary = self.is_pinned(request)
+        if (request.method not in SAFE_METHODS
+                or not settings.REPLICA_DATABASES
+                or request.pinned_to_primary):
+            return False
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        return replica_eligible(match.func, request.method)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            self.pin(response)
+        return response
+
+    def is_pinned(self, request):
+        try:
+            expires = float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0))
+        except ValueError:
+            return False
+        return expires > time.time()
+
+    def pin(self, response):
+        seconds = settings.REPLICA_PIN_SECONDS
+        if seconds > 0:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                str(time.time() + seconds),
+                max_age=seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+
+
+class AdmissionMiddleware:
+    """Limite de débit (429) et délestage (503) selon les classes déclarées par la vue.
+
+    Voir :mod:`core.admission`. Aucun accès à la base : le client est
+    identifié par son jeton d'accès ou son adresse IP.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.release(request)
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATE_LIMIT_ENABLED:
+            return None
+        rate_class = view_declaration(view_func, request.method, 'rate_class')
+        if rate_class is not None:
+            attente = admission.admettre(request, rate_class)
+            if attente:
+                return self.refus(429, "Trop de requêtes, réessayez plus tard", attente)
+        concurrency_class = view_declaration(view_func, request.method, 'concurrency_class')
+        if concurrency_class is not None:
+            if not admission.entrer(concurrency_class):
+                return self.refus(503, "Service surchargé, réessayez plus tard",
+                                  settings.CONCURRENCY_RETRY_AFTER_SECONDS)
+            request.concurrency_class = concurrency_class
+        return None
+
+    def release(self, request):
+        concurrency_class = getattr(request, 'concurrency_class', None)
+        if concurrency_class is not None:
+            admission.sortir(concurrency_class)
+            request.concurrency_class = None
+
+    def refus(self, status, detail, attente):
+        response = JsonResponse({'detail': detail}, status=status)
+        response['Retry-After'] = str(max(1, math.ceil(attente)))
+        return response
+
+
+class QueryBudgetMiddleware:
+    """Mesure les requêtes SQL de chaque requête HTTP et applique le budget de la vue.
+
+    Les vues déclarent ``query_budget`` (un :class:`~core.budgets.QueryBudget`
+    ou un dictionnaire par action) ; son ``statement_timeout_ms`` borne chaque
+    requête côté PostgreSQL.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stack = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(request, stack)
+        return self.check(request, response)
+
+    async def __acall__(self, request):
+        # L'ORM asynchrone exécute ses requêtes dans le thread dédié à la requête
+        # HTTP : les wrappers doivent être posés sur les connexions de ce thread.
+        stack = await sync_to_async(self.start)(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(self.stop)(request, stack)
+        return self.check(request, response)
+
+    def start(self, request):
+        request.db_counter = counter = QueryCounter()
+        request.statement_timeout = timeout = StatementTimeout()
+        request.query_budget = None
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timeout))
+            stack.enter_context(connection.execute_wrapper(counter))
+        return stack
+
+    def stop(self, request, stack):
+        try:
+            request.statement_timeout.reset()
+        finally:
+            stack.close()
+
+    def check(self, request, response):
+        if request.query_budget is not None:
+            check_budget(request.query_budget, request.db_counter, f"{request.method} {request.path}")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = budget = budget_for(view_func, request.method)
+        if budget is not None:
+            request.statement_timeout.milliseconds = budget.statement_timeout_ms
+
+
+class InstrumentationMiddleware:
+    """Ventile le temps de chaque vue en phases DB, sérialisation et rendu.
+
+    La sérialisation est mesurée au renderer, par où passent toutes les
+    réponses d'API, sérialiseurs DRF comme plans compilés. Les mesures
+    alimentent le registre exposé par ``/metrics/`` et l'en-tête
+    ``Server-Timing``. Un client autorisé peut envoyer ``X-Profile: 1`` pour
+    échantillonner la requête dans un fichier flamegraph sous ``PROFILE_DIR``.
+    Doit être placé en tête de ``MIDDLEWARE`` pour englober le rendu.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profiler = self.profiler(request)
+        with instrumentation.track_request() as timings:
+            stack = self.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                stack.close()
+                if profiler is not None:
+                    profiler.stop()
+            durations = timings.breakdown()
+        return self.record(request, response, timings, durations, profiler)
+
+    async def __acall__(self, request):
+        profiler = self.profiler(request)
+        with instrumentation.track_request() as timings:
+            # Comme pour les budgets : les wrappers vont sur les connexions du thread qui exécute l'ORM
+            stack = await sync_to_async(self.start)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+                if profiler is not None:
+                    profiler.stop()
+            durations = timings.breakdown()
+        return self.record(request, response, timings, durations, profiler)
+
+    def profiler(self, request):
+        if request.META.get('HTTP_X_PROFILE') and instrumentation.client_allowed(request):
+            return instrumentation.SamplingProfiler().start()
+        return None
+
+    def start(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(instrumentation.db_wrapper))
+        return stack
+
+    def record(self, request, response, timings, durations, profiler):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        instrumentation.registry.observe(view, request.method, response.status_code,
+                                         durations, timings.queries)
+        response['Server-Timing'] = ', '.join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()
+        )
+        if profiler is not None:
+            filename = f"{time.time_ns()}-{view.replace(':', '_').replace('.', '_')}.folded"
+            response['X-Profile-File'] = profiler.write(settings.PROFILE_DIR / filename).name
+        return response
+
+    def process_template_response(self, request, response):
+        with instrumentation.phase('render'):
+            response.render()
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compresse les réponses d'API avec le meilleur codage accepté (zstd, br, gzip).
+
+    Seuls les types de ``COMPRESSION_CONTENT_TYPES`` sont concernés : les pages
+    HTML, qui portent le jeton CSRF, restent non compressées (BREACH).
+    """
+
+    def process_response(self, request, response):
+        if not compression.compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+        compressed = compression.compress(encoding, response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
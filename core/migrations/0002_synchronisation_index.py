@@ -0,0 +1,133 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alternativepoursuites',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='attribution',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='audience',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='avocat',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='classement',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='decision',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='dossier',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='frais',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='magistrat',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='magistrat',
+            name='grade_parquet',
+            field=models.CharField(blank=True, choices=[('PROCUREUR_GENERAL', 'Procureur Général'), ('AVOCAT_GENERAL', 'Avocat Général'), ('PROCUREUR_REPUBLIQUE', 'Procureur de la République'), ('SUBSTITUT', 'Substitut du Procureur'), ('CP', 'Chef de Parquet')], max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='magistrat',
+            name='grade_siege',
+            field=models.CharField(blank=True, choices=[('PP', 'Premier Président'), ('PI', 'Président'), ('PRESIDENT_CHAMBRE', 'Président de Chambre'), ('JUGE', 'Juge'), ('JUGE_INSTRUCTION', "Juge d'Instruction"), ('JUGE_ENFANTS', 'Juge des Enfants')], max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='natureaffaire',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='parquet',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='parquet',
+            name='type_parquet',
+            field=models.CharField(choices=[('PARQUET_GENERAL', 'Parquet Général'), ('PGI', 'Parquet de Grande Instance'), ('PPTP', 'Parquet Près le Tribunal de Paix')], max_length=25),
+        ),
+        migrations.AlterField(
+            model_name='partie',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='partieaudossier',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='piecejointe',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='procedureenquete',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='requisitionparquet',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='scelle',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='tribunal',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='tribunal',
+            name='type_tribunal',
+            field=models.CharField(choices=[('COUR_CASSATION', 'Cour de Cassation'), ('COUR_APPEL', "Cour d'Appel"), ('TGI', 'Tribunal de Grande Instance'), ('TRIBUNAL_DU_TRAVAIL', 'Tribunal du Travail'), ('TRIBUNAL_COMMERCE', 'Tribunal de Commerce'), ('TRIPAIX', 'Tribunal de Paix'), ('TPE', 'Tribunal pour Enfants')], max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='voierecours',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:18
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_synchronisation_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaiementFrais',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date_paiement', models.DateField()),
+                ('mode_paiement', models.CharField(blank=True, max_length=50)),
+                ('numero_recu', models.CharField(blank=True, max_length=100)),
+                ('enregistre_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('frais', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='paiements', to='core.frais')),
+            ],
+            options={
+                'verbose_name': 'Paiement de Frais',
+                'verbose_name_plural': 'Paiements de Frais',
+                'indexes': [models.Index(fields=['frais', 'date_paiement'], name='core_paieme_frais_i_c7c260_idx')],
+            },
+        ),
+    ]
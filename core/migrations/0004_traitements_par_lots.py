@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:20
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_paiement_frais'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('nom', models.CharField(max_length=100, unique=True)),
+                ('etat', models.CharField(choices=[('EN_COURS', 'En Cours'), ('TERMINE', 'Terminé'), ('ECHEC', 'Échec')], default='EN_COURS', max_length=10)),
+                ('dernier_pk', models.CharField(blank=True, help_text='Dernière clé traitée', max_length=64)),
+                ('traites', models.PositiveBigIntegerField(default=0)),
+                ('modifies', models.PositiveBigIntegerField(default=0)),
+                ('date_debut', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Point de Reprise',
+                'verbose_name_plural': 'Points de Reprise',
+            },
+        ),
+        migrations.AddField(
+            model_name='dossier',
+            name='date_archivage',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='StatistiqueTribunal',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('mois', models.DateField(help_text='Premier jour du mois')),
+                ('dossiers_enregistres', models.PositiveIntegerField(default=0)),
+                ('dossiers_clotures', models.PositiveIntegerField(default=0)),
+                ('audiences_tenues', models.PositiveIntegerField(default=0)),
+                ('decisions_rendues', models.PositiveIntegerField(default=0)),
+                ('frais_encaisses', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tribunal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statistiques', to='core.tribunal')),
+            ],
+            options={
+                'verbose_name': 'Statistique de Tribunal',
+                'verbose_name_plural': 'Statistiques de Tribunaux',
+                'unique_together': {('tribunal', 'mois')},
+            },
+        ),
+    ]
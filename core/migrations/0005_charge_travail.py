@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:22
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_traitements_par_lots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChargeTravail',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('dossiers_ouverts', models.PositiveIntegerField(default=0)),
+                ('poids_dossiers', models.PositiveIntegerField(default=0, help_text="Dossiers ouverts pondérés par l'urgence")),
+                ('audiences_a_venir', models.PositiveIntegerField(default=0)),
+                ('score', models.PositiveIntegerField(default=0)),
+                ('utilisateur', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='charge_travail', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Charge de Travail',
+                'verbose_name_plural': 'Charges de Travail',
+            },
+        ),
+    ]
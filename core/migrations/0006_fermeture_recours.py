@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:23
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_charge_travail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecoursClosure',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('profondeur', models.PositiveSmallIntegerField()),
+                ('ancetre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendants_recours', to='core.dossier')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancetres_recours', to='core.dossier')),
+            ],
+            options={
+                'verbose_name': 'Fermeture des Recours',
+                'verbose_name_plural': 'Fermetures des Recours',
+                'indexes': [models.Index(fields=['descendant', 'profondeur'], name='core_recour_descend_79f18c_idx')],
+                'unique_together': {('ancetre', 'descendant')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:25
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_fermeture_recours'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexPartie',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('qualite', models.CharField(choices=[('DEMANDEUR', 'Demandeur'), ('DEFENDEUR', 'Défendeur'), ('REQUERANT', 'Requérant'), ('INTIME', 'Intimé'), ('APPELANT', 'Appelant'), ('APPELE', 'Appelé'), ('TEMOIN', 'Témoin'), ('PARTIE_CIVILE', 'Partie Civile'), ('PREVENU', 'Prévenu'), ('ACCUSE', 'Accusé'), ('TIERS', 'Tiers'), ('MINISTERE_PUBLIC', 'Ministère Public'), ('PROCUREUR', 'Procureur'), ('PARTIE_POURSUIVANTE', 'Partie Poursuivante')], max_length=20)),
+                ('date_constitution', models.DateField()),
+                ('numero_rg', models.CharField(max_length=50)),
+                ('intitule', models.CharField(max_length=300)),
+                ('etat', models.CharField(choices=[('ENREGISTRE', 'Enregistré'), ('INSTRUCTION', 'En Instruction'), ('MISE_EN_ETAT', 'Mise en État'), ('PRET_PLAIDOIRIE', 'Prêt pour Plaidoirie'), ('EN_DELIBERE', 'En Délibéré'), ('JUGE', 'Jugé'), ('CLOS', 'Clos'), ('RADIE', 'Radié'), ('DESISTEMENT', 'Désistement'), ('APPEL', 'Appelé'), ('POURVOI', 'Pourvoi en Cassation'), ('CLASSE_SANS_SUITE', 'Classé sans Suite'), ('RENVOI_CORRECTIONNEL', 'Renvoi Correctionnel'), ('RENVOI_ASSISES', 'Renvoi aux Assises')], max_length=25)),
+                ('date_enregistrement', models.DateField()),
+                ('est_confidentiel', models.BooleanField(default=False)),
+                ('dossier_ouvert', models.BooleanField(default=True)),
+                ('avocat', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.avocat')),
+                ('dossier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.dossier')),
+                ('lien', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='index', to='core.partieaudossier')),
+                ('partie', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.partie')),
+                ('tribunal', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.tribunal')),
+            ],
+            options={
+                'verbose_name': 'Index des Parties',
+                'verbose_name_plural': 'Index des Parties',
+                'indexes': [models.Index(fields=['partie', '-date_enregistrement'], name='index_partie_historique'), models.Index(fields=['avocat', 'dossier_ouvert', '-date_enregistrement'], name='index_partie_avocat')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:26
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_index_parties'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FusionPartie',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('score', models.FloatField(blank=True, help_text='Vide si rapproché par transitivité', null=True)),
+                ('doublon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fusions_doublon', to='core.partie')),
+                ('survivant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fusions', to='core.partie')),
+            ],
+            options={
+                'verbose_name': 'Fusion de Parties',
+                'verbose_name_plural': 'Fusions de Parties',
+            },
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:42
+
+import django.db.models.deletion
+import uuid
+from datetime import time
+from django.db import migrations, models
+
+
+def reprendre_calendrier(apps, schema_editor):
+    """Les colonnes de calendrier des alternatives deviennent des créneaux d'une journée entière.
+
+    Le modèle Calendrier était déclaré par erreur dans AlternativePoursuites :
+    ses dates, disponibilités et observations y ont été saisies. Un magistrat
+    n'ayant qu'un créneau par date et heure de début, la première ligne d'un
+    même jour l'emporte.
+    """
+    AlternativePoursuites = apps.get_model('core', 'AlternativePoursuites')
+    Calendrier = apps.get_model('core', 'Calendrier')
+    creneaux = [
+        Calendrier(magistrat_id=row['magistrat_id'], tribunal_id=row['tribunal_id'], date=row['date'],
+                   heure_debut=time(0, 0), heure_fin=time(23, 59, 59), est_disponible=row['est_disponible'],
+                   observations=row['observations'], est_actif=row['est_actif'])
+        for row in AlternativePoursuites.objects.order_by('date_creation', 'id').values(
+            'magistrat_id', 'tribunal_id', 'date', 'est_disponible', 'observations', 'est_actif').iterator()
+    ]
+    Calendrier.objects.bulk_create(creneaux, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_fusion_parties'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='alternativepoursuites',
+            options={'verbose_name': 'Alternative aux Poursuites', 'verbose_name_plural': 'Alternatives aux Poursuites'},
+        ),
+        migrations.AlterUniqueTogether(
+            name='alternativepoursuites',
+            unique_together=set(),
+        ),
+        migrations.CreateModel(
+            name='RegleCalendrier',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('jours', models.PositiveSmallIntegerField(help_text='Jours de la semaine (bit 0 : lundi … bit 6 : dimanche)')),
+                ('heure_debut', models.TimeField()),
+                ('heure_fin', models.TimeField()),
+                ('toutes_les_semaines', models.PositiveSmallIntegerField(default=1, help_text='1 : chaque semaine, 2 : une sur deux…')),
+                ('date_debut', models.DateField()),
+                ('date_fin', models.DateField(blank=True, null=True)),
+                ('magistrat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regles_calendrier', to='core.magistrat')),
+                ('tribunal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regles_calendrier', to='core.tribunal')),
+            ],
+            options={
+                'verbose_name': 'Règle de Calendrier',
+                'verbose_name_plural': 'Règles de Calendrier',
+            },
+        ),
+        migrations.CreateModel(
+            name='Calendrier',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('date', models.DateField()),
+                ('heure_debut', models.TimeField()),
+                ('heure_fin', models.TimeField()),
+                ('est_disponible', models.BooleanField(default=True)),
+                ('observations', models.TextField(blank=True)),
+                ('magistrat', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='calendrier', to='core.magistrat')),
+                ('tribunal', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='calendrier', to='core.tribunal')),
+                ('regle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='creneaux', to='core.reglecalendrier')),
+            ],
+            options={
+                'verbose_name': 'Calendrier',
+                'verbose_name_plural': 'Calendriers',
+                'indexes': [models.Index(fields=['tribunal', 'date'], name='calendrier_tribunal_date')],
+                'unique_together': {('magistrat', 'date', 'heure_debut')},
+            },
+        ),
+        migrations.RunPython(reprendre_calendrier, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='alternativepoursuites',
+            name='date',
+        ),
+        migrations.RemoveField(
+            model_name='alternativepoursuites',
+            name='est_disponible',
+        ),
+        migrations.RemoveField(
+            model_name='alternativepoursuites',
+            name='magistrat',
+        ),
+        migrations.RemoveField(
+            model_name='alternativepoursuites',
+            name='observations',
+        ),
+        migrations.RemoveField(
+            model_name='alternativepoursuites',
+            name='tribunal',
+        ),
+    ]
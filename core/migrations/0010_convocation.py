@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:46
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_calendrier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Convocation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('date_audience', models.DateTimeField(help_text="Date de l'audience à l'émission : un renvoi appelle une nouvelle convocation")),
+                ('canal', models.CharField(choices=[('EMAIL', 'Courriel'), ('COURRIER', 'Courrier')], max_length=10)),
+                ('destinataire', models.CharField(help_text='Adresse électronique ou postale', max_length=300)),
+                ('objet', models.CharField(max_length=200)),
+                ('corps', models.TextField()),
+                ('etat', models.CharField(choices=[('EN_ATTENTE', 'En Attente'), ('EN_COURS', 'En Cours'), ('ENVOYEE', 'Envoyée'), ('ECHEC', 'Échec'), ('ANNULEE', 'Annulée')], default='EN_ATTENTE', max_length=10)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('prochain_essai', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lot', models.UUIDField(blank=True, help_text='Lot du worker qui a pris la convocation', null=True)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+                ('audience', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='convocations', to='core.audience')),
+                ('avocat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.avocat')),
+                ('partie', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.partie')),
+            ],
+            options={
+                'verbose_name': 'Convocation',
+                'verbose_name_plural': 'Convocations',
+                'indexes': [models.Index(fields=['etat', 'prochain_essai'], name='convocation_file'), models.Index(fields=['lot'], name='convocation_lot')],
+                'unique_together': {('audience', 'date_audience', 'canal', 'destinataire')},
+            },
+        ),
+    ]
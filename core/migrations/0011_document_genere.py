@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:50
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_convocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentGenere',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('modele', models.CharField(max_length=30)),
+                ('objet_id', models.UUIDField()),
+                ('format', models.CharField(max_length=4)),
+                ('version', models.DateTimeField(help_text='Dernière modification des données sources au rendu')),
+                ('empreinte', models.CharField(help_text='SHA-256 du fichier', max_length=64)),
+                ('piece', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='generation', to='core.piecejointe')),
+            ],
+            options={
+                'verbose_name': 'Document Généré',
+                'verbose_name_plural': 'Documents Générés',
+                'unique_together': {('modele', 'objet_id', 'format')},
+            },
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:54
+
+import django.db.models.deletion
+import django.utils.timezone
+import hashlib
+import json
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Copies figées de core.scelles : la migration ne doit pas suivre les évolutions du module
+GENESE = '0' * 64
+
+
+def empreinte(scelle_id, rang, lieu_depart, lieu_arrivee, motif, observations, effectue_par_id, date_mouvement,
+              precedente):
+    contenu = json.dumps([
+        str(scelle_id), rang, lieu_depart, lieu_arrivee, motif, observations, effectue_par_id,
+        date_mouvement.isoformat(), precedente,
+    ], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(contenu.encode()).hexdigest()
+
+
+def reprendre_chaines(apps, schema_editor):
+    """Premier mouvement de chaque scellé : lieu actuel, ancienne chaîne de possession en observations"""
+    Scelle = apps.get_model('core', 'Scelle')
+    MouvementScelle = apps.get_model('core', 'MouvementScelle')
+    now = timezone.now()
+    mouvements, scelles = [], []
+    for scelle in Scelle.objects.exclude(lieu_conservation='', chaine_possession='').iterator():
+        mouvement = MouvementScelle(
+            scelle_id=scelle.pk, rang=1, lieu_depart='', lieu_arrivee=scelle.lieu_conservation or 'Inconnu',
+            motif="Reprise de la chaîne de possession", observations=scelle.chaine_possession,
+            date_mouvement=now, empreinte_precedente=GENESE,
+        )
+        mouvement.empreinte = empreinte(
+            mouvement.scelle_id, 1, '', mouvement.lieu_arrivee, mouvement.motif, mouvement.observations, None, now,
+            GENESE,
+        )
+        scelle.lieu_conservation, scelle.rang_chaine, scelle.empreinte_chaine = (
+            mouvement.lieu_arrivee, 1, mouvement.empreinte)
+        mouvements.append(mouvement)
+        scelles.append(scelle)
+    MouvementScelle.objects.bulk_create(mouvements, batch_size=1000)
+    Scelle.objects.bulk_update(scelles, ['lieu_conservation', 'rang_chaine', 'empreinte_chaine'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_document_genere'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MouvementScelle',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('rang', models.PositiveIntegerField()),
+                ('lieu_depart', models.CharField(blank=True, max_length=200)),
+                ('lieu_arrivee', models.CharField(max_length=200)),
+                ('motif', models.CharField(max_length=200)),
+                ('observations', models.TextField(blank=True)),
+                ('date_mouvement', models.DateTimeField(default=django.utils.timezone.now)),
+                ('empreinte_precedente', models.CharField(max_length=64)),
+                ('empreinte', models.CharField(max_length=64)),
+            ],
+            options={
+                'verbose_name': 'Mouvement de Scellé',
+                'verbose_name_plural': 'Mouvements de Scellés',
+            },
+        ),
+        migrations.AddField(
+            model_name='scelle',
+            name='empreinte_chaine',
+            field=models.CharField(blank=True, help_text='Empreinte du dernier mouvement', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='scelle',
+            name='rang_chaine',
+            field=models.PositiveIntegerField(default=0, help_text='Rang du dernier mouvement'),
+        ),
+        migrations.AlterField(
+            model_name='scelle',
+            name='lieu_conservation',
+            field=models.CharField(blank=True, help_text='Lieu actuel, tenu par les mouvements du scellé', max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='scelle',
+            index=models.Index(fields=['lieu_conservation'], name='scelle_lieu'),
+        ),
+        migrations.AddField(
+            model_name='mouvementscelle',
+            name='effectue_par',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='mouvementscelle',
+            name='scelle',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mouvements', to='core.scelle'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mouvementscelle',
+            unique_together={('scelle', 'rang')},
+        ),
+        migrations.RunPython(reprendre_chaines, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='scelle',
+            name='chaine_possession',
+        ),
+    ]
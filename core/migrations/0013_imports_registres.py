@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_mouvements_scelles'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRegistre',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('type_donnees', models.CharField(choices=[('DOSSIER', 'Dossiers'), ('PARTIE', 'Parties'), ('AUDIENCE', 'Audiences'), ('DECISION', 'Décisions')], max_length=10)),
+                ('fichier', models.CharField(max_length=255)),
+                ('etat', models.CharField(choices=[('EN_ATTENTE', 'En Attente'), ('VALIDE', 'Validé'), ('TERMINE', 'Terminé')], default='EN_ATTENTE', max_length=10)),
+                ('lignes', models.PositiveIntegerField(default=0)),
+                ('rejetees', models.PositiveIntegerField(default=0)),
+                ('importees', models.PositiveIntegerField(default=0)),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Import de Registre',
+                'verbose_name_plural': 'Imports de Registres',
+            },
+        ),
+        migrations.CreateModel(
+            name='LigneImport',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('numero', models.PositiveIntegerField(help_text="Ligne du fichier (l'en-tête est la ligne 1)")),
+                ('donnees', models.JSONField(help_text='Colonnes lues, en texte')),
+                ('etat', models.CharField(choices=[('A_VALIDER', 'À Valider'), ('VALIDE', 'Valide'), ('REJETEE', 'Rejetée'), ('IMPORTEE', 'Importée')], default='A_VALIDER', max_length=10)),
+                ('erreurs', models.JSONField(blank=True, default=list)),
+                ('objet_id', models.UUIDField(blank=True, help_text='Objet créé par la ligne', null=True)),
+                ('import_registre', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='lignes_import', to='core.importregistre')),
+            ],
+            options={
+                'verbose_name': "Ligne d'Import",
+                'verbose_name_plural': "Lignes d'Import",
+                'indexes': [models.Index(fields=['import_registre', 'etat', 'numero'], name='ligne_import_etat')],
+                'unique_together': {('import_registre', 'numero')},
+            },
+        ),
+    ]
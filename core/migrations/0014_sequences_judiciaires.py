@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:07
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_imports_registres'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceJudiciaire',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True, db_index=True)),
+                ('est_actif', models.BooleanField(default=True)),
+                ('annee', models.PositiveSmallIntegerField()),
+                ('type_numero', models.CharField(choices=[('RG', 'Répertoire Général'), ('DECISION', 'Décision')], max_length=10)),
+                ('prochain', models.PositiveIntegerField(default=1, help_text='Premier numéro non encore réservé')),
+            ],
+            options={
+                'verbose_name': 'Séquence Judiciaire',
+                'verbose_name_plural': 'Séquences Judiciaires',
+            },
+        ),
+        migrations.AddField(
+            model_name='tribunal',
+            name='code',
+            field=models.CharField(blank=True, help_text='Code du tribunal dans les numéros de registre', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='tribunal',
+            constraint=models.UniqueConstraint(condition=models.Q(('code', ''), _negated=True), fields=('code',), name='tribunal_code_unique'),
+        ),
+        migrations.AddField(
+            model_name='sequencejudiciaire',
+            name='tribunal',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sequences', to='core.tribunal'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sequencejudiciaire',
+            unique_together={('tribunal', 'annee', 'type_numero')},
+        ),
+    ]
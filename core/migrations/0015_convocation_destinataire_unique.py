@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_sequences_judiciaires'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='convocation',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='convocation',
+            constraint=models.UniqueConstraint(condition=models.Q(('partie__isnull', False)), fields=('audience', 'date_audience', 'canal', 'destinataire', 'partie'), name='convocation_partie_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='convocation',
+            constraint=models.UniqueConstraint(condition=models.Q(('avocat__isnull', False)), fields=('audience', 'date_audience', 'canal', 'destinataire', 'avocat'), name='convocation_avocat_unique'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_convocation_destinataire_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='partieaudossier',
+            name='partie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dossiers', to='core.partie'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_partie_dossiers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentgenere',
+            name='version',
+            field=models.CharField(help_text='Empreinte des données sources au rendu', max_length=64),
+        ),
+    ]
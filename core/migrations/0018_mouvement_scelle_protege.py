@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_document_version_empreinte'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mouvementscelle',
+            name='effectue_par',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='mouvementscelle',
+            name='scelle',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='mouvements', to='core.scelle'),
+        ),
+    ]
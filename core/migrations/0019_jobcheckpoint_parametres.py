@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_mouvement_scelle_protege'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobcheckpoint',
+            name='parametres',
+            field=models.CharField(blank=True, help_text="Empreinte des options de l'exécution", max_length=64),
+        ),
+    ]
@@ -5,12 +5,21 @@ from django.utils import timezone
 import uuid
 
 
+class BaseQuerySet(models.QuerySet):
+
+    def visibles(self, acces):
+        """Lignes accessibles avec ``acces`` (voir :mod:`core.acces`)"""
+        return self.filter(acces.filtre(self.model))
+
+
 class BaseModel(models.Model):
     """Modèle de base avec champs communs"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     date_creation = models.DateTimeField(auto_now_add=True)
-    date_modification = models.DateTimeField(auto_now=True)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
     est_actif = models.BooleanField(default=True)
+
+    objects = BaseQuerySet.as_manager()
     
     class Meta:
         abstract = True
@@ -34,11 +43,15 @@ class Tribunal(BaseModel):
     adresse = models.TextField()
     telephone = models.CharField(max_length=20, blank=True)
     email = models.EmailField(blank=True)
+    code = models.CharField(max_length=20, blank=True, help_text="Code du tribunal dans les numéros de registre")
     
     def __str__(self):
         return f"{self.nom} - {self.juridiction}"
     
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['code'], condition=~models.Q(code=''), name='tribunal_code_unique'),
+        ]
         verbose_name = "Tribunal"
         verbose_name_plural = "Tribunaux"
 
@@ -246,6 +259,7 @@ class Dossier(BaseModel):
     duree_estimee = models.IntegerField(help_text="Durée estimée en jours", null=True, blank=True)
     chambre = models.CharField(max_length=50, blank=True, help_text="Chambre ou section")
     est_confidentiel = models.BooleanField(default=False, help_text="Dossier sous secret")
+    date_archivage = models.DateField(null=True, blank=True)
     
     def __str__(self):
         return f"{self.numero_rg} - {self.intitule}"
@@ -258,7 +272,7 @@ class Dossier(BaseModel):
 class PartieAuDossier(BaseModel):
     """Relation entre dossiers et parties"""
     dossier = models.ForeignKey(Dossier, on_delete=models.CASCADE, related_name='parties_dossier')
-    partie = models.ForeignKey(Partie, on_delete=models.CASCADE)
+    partie = models.ForeignKey(Partie, on_delete=models.CASCADE, related_name='dossiers')
     qualite = models.CharField(max_length=20, choices=Partie.TYPES_PARTIE)
     avocat = models.ForeignKey(Avocat, on_delete=models.SET_NULL, null=True, blank=True)
     date_constitution = models.DateField(default=timezone.now)
@@ -409,6 +423,24 @@ class Frais(BaseModel):
         verbose_name_plural = "Frais"
 
 
+class PaiementFrais(BaseModel):
+    """Écriture de paiement d'un frais ; ``Frais.montant_paye`` en est le cumul"""
+    frais = models.ForeignKey(Frais, on_delete=models.CASCADE, related_name='paiements')
+    montant = models.DecimalField(max_digits=10, decimal_places=2)
+    date_paiement = models.DateField()
+    mode_paiement = models.CharField(max_length=50, blank=True)
+    numero_recu = models.CharField(max_length=100, blank=True)
+    enregistre_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.frais} - paiement {self.montant}€ du {self.date_paiement}"
+
+    class Meta:
+        verbose_name = "Paiement de Frais"
+        verbose_name_plural = "Paiements de Frais"
+        indexes = [models.Index(fields=['frais', 'date_paiement'])]
+
+
 class RequisitionParquet(BaseModel):
     """Réquisitions du parquet"""
     TYPES_REQUISITION = [
@@ -547,19 +579,45 @@ class AlternativePoursuites(BaseModel):
     class Meta:
         verbose_name = "Alternative aux Poursuites"
         verbose_name_plural = "Alternatives aux Poursuites"
-    """Calendrier des audiences"""
+
+
+class RegleCalendrier(BaseModel):
+    """Disponibilité récurrente d'un magistrat (jours de la semaine, plage horaire)"""
+    magistrat = models.ForeignKey(Magistrat, on_delete=models.CASCADE, related_name='regles_calendrier')
+    tribunal = models.ForeignKey(Tribunal, on_delete=models.CASCADE, related_name='regles_calendrier')
+    jours = models.PositiveSmallIntegerField(help_text="Jours de la semaine (bit 0 : lundi … bit 6 : dimanche)")
+    heure_debut = models.TimeField()
+    heure_fin = models.TimeField()
+    toutes_les_semaines = models.PositiveSmallIntegerField(default=1, help_text="1 : chaque semaine, 2 : une sur deux…")
+    date_debut = models.DateField()
+    date_fin = models.DateField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Règle de Calendrier"
+        verbose_name_plural = "Règles de Calendrier"
+
+    def __str__(self):
+        return f"{self.magistrat} - {self.heure_debut:%H:%M}-{self.heure_fin:%H:%M}"
+
+
+class Calendrier(BaseModel):
+    """Calendrier des audiences : créneaux de disponibilité (ou d'indisponibilité) des magistrats"""
+    magistrat = models.ForeignKey(Magistrat, on_delete=models.CASCADE, related_name='calendrier', db_index=False)
+    tribunal = models.ForeignKey(Tribunal, on_delete=models.CASCADE, related_name='calendrier', db_index=False)
     date = models.DateField()
-    tribunal = models.ForeignKey(Tribunal, on_delete=models.CASCADE)
-    magistrat = models.ForeignKey(Magistrat, on_delete=models.CASCADE,
-        related_name='alternatives_as_magistrat')
+    heure_debut = models.TimeField()
+    heure_fin = models.TimeField()
     est_disponible = models.BooleanField(default=True)
+    regle = models.ForeignKey(RegleCalendrier, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='creneaux')
     observations = models.TextField(blank=True)
-    
+
     class Meta:
-        unique_together = ['date', 'tribunal', 'magistrat']
+        unique_together = ['magistrat', 'date', 'heure_debut']
+        indexes = [models.Index(fields=['tribunal', 'date'], name='calendrier_tribunal_date')]
         verbose_name = "Calendrier"
         verbose_name_plural = "Calendriers"
-    
+
     def __str__(self):
         return f"{self.tribunal.nom} - {self.magistrat.utilisateur.get_full_name()} - {self.date}"
 
@@ -675,14 +733,315 @@ class Scelle(BaseModel):
     description = models.TextField()
     date_saisie = models.DateField()
     saisi_par = models.CharField(max_length=100)
-    lieu_conservation = models.CharField(max_length=200, blank=True)
-    chaine_possession = models.TextField(blank=True, help_text="Chaîne de possession/custody")
+    lieu_conservation = models.CharField(max_length=200, blank=True,
+                                         help_text="Lieu actuel, tenu par les mouvements du scellé")
+    rang_chaine = models.PositiveIntegerField(default=0, help_text="Rang du dernier mouvement")
+    empreinte_chaine = models.CharField(max_length=64, blank=True, help_text="Empreinte du dernier mouvement")
     est_verse_debats = models.BooleanField(default=False)
     
     class Meta:
         unique_together = ['dossier', 'numero_scelle']
+        indexes = [models.Index(fields=['lieu_conservation'], name='scelle_lieu')]
         verbose_name = "Scellé"
         verbose_name_plural = "Scellés"
     
     def __str__(self):
-        return f"{self.dossier.numero_rg} - Scellé n°{self.numero_scelle}"
\ No newline at end of file
+        return f"{self.dossier.numero_rg} - Scellé n°{self.numero_scelle}"
+
+
+class MouvementScelle(BaseModel):
+    """Mouvement d'un scellé (chaîne de possession), chaîné au précédent par son empreinte ; jamais modifié"""
+    # PROTECT : la suppression d'un scellé ou de son auteur ne doit ni effacer ni réécrire un mouvement
+    scelle = models.ForeignKey(Scelle, on_delete=models.PROTECT, related_name='mouvements')
+    rang = models.PositiveIntegerField()
+    lieu_depart = models.CharField(max_length=200, blank=True)
+    lieu_arrivee = models.CharField(max_length=200)
+    motif = models.CharField(max_length=200)
+    observations = models.TextField(blank=True)
+    effectue_par = models.ForeignKey(User, on_delete=models.PROTECT, null=True, blank=True)
+    date_mouvement = models.DateTimeField(default=timezone.now)
+    empreinte_precedente = models.CharField(max_length=64)
+    empreinte = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = ['scelle', 'rang']
+        verbose_name = "Mouvement de Scellé"
+        verbose_name_plural = "Mouvements de Scellés"
+
+    def __str__(self):
+        return f"{self.scelle_id} n°{self.rang} : {self.lieu_depart or '-'} → {self.lieu_arrivee}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Un mouvement de scellé ne se modifie pas")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Un mouvement de scellé ne se supprime pas")
+
+
+class StatistiqueTribunal(BaseModel):
+    """Statistiques mensuelles d'activité d'un tribunal, recalculées par lots"""
+    tribunal = models.ForeignKey(Tribunal, on_delete=models.CASCADE, related_name='statistiques')
+    mois = models.DateField(help_text="Premier jour du mois")
+    dossiers_enregistres = models.PositiveIntegerField(default=0)
+    dossiers_clotures = models.PositiveIntegerField(default=0)
+    audiences_tenues = models.PositiveIntegerField(default=0)
+    decisions_rendues = models.PositiveIntegerField(default=0)
+    frais_encaisses = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['tribunal', 'mois']
+        verbose_name = "Statistique de Tribunal"
+        verbose_name_plural = "Statistiques de Tribunaux"
+
+    def __str__(self):
+        return f"{self.tribunal} - {self.mois:%m/%Y}"
+
+
+class JobCheckpoint(BaseModel):
+    """Point de reprise d'une tâche de maintenance par lots"""
+    ETATS_JOB = [
+        ('EN_COURS', 'En Cours'),
+        ('TERMINE', 'Terminé'),
+        ('ECHEC', 'Échec'),
+    ]
+
+    nom = models.CharField(max_length=100, unique=True)
+    etat = models.CharField(max_length=10, choices=ETATS_JOB, default='EN_COURS')
+    dernier_pk = models.CharField(max_length=64, blank=True, help_text="Dernière clé traitée")
+    parametres = models.CharField(max_length=64, blank=True, help_text="Empreinte des options de l'exécution")
+    traites = models.PositiveBigIntegerField(default=0)
+    modifies = models.PositiveBigIntegerField(default=0)
+    date_debut = models.DateTimeField(default=timezone.now)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Point de Reprise"
+        verbose_name_plural = "Points de Reprise"
+
+    def __str__(self):
+        return f"{self.nom} ({self.etat})"
+
+
+class ChargeTravail(BaseModel):
+    """Charge de travail courante d'un magistrat ou d'un greffier (index maintenu)"""
+    utilisateur = models.OneToOneField(User, on_delete=models.CASCADE, related_name='charge_travail')
+    dossiers_ouverts = models.PositiveIntegerField(default=0)
+    poids_dossiers = models.PositiveIntegerField(default=0, help_text="Dossiers ouverts pondérés par l'urgence")
+    audiences_a_venir = models.PositiveIntegerField(default=0)
+    score = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Charge de Travail"
+        verbose_name_plural = "Charges de Travail"
+
+    def __str__(self):
+        return f"{self.utilisateur.get_full_name()} - {self.score}"
+
+
+class RecoursClosure(BaseModel):
+    """Table de fermeture des voies de recours (ancêtre → descendant), reconstruite par signaux"""
+    ancetre = models.ForeignKey(Dossier, on_delete=models.CASCADE, related_name='descendants_recours')
+    descendant = models.ForeignKey(Dossier, on_delete=models.CASCADE, related_name='ancetres_recours')
+    profondeur = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ['ancetre', 'descendant']
+        indexes = [models.Index(fields=['descendant', 'profondeur'])]
+        verbose_name = "Fermeture des Recours"
+        verbose_name_plural = "Fermetures des Recours"
+
+    def __str__(self):
+        return f"{self.ancetre} → {self.descendant} ({self.profondeur})"
+
+
+class IndexPartie(BaseModel):
+    """Index dénormalisé des participations (partie ou avocat → dossiers), maintenu par signaux"""
+    lien = models.OneToOneField(PartieAuDossier, on_delete=models.CASCADE, related_name='index')
+    partie = models.ForeignKey(Partie, on_delete=models.CASCADE, related_name='+', db_index=False)
+    avocat = models.ForeignKey(Avocat, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    dossier = models.ForeignKey(Dossier, on_delete=models.CASCADE, related_name='+')
+    tribunal = models.ForeignKey(Tribunal, on_delete=models.CASCADE, related_name='+', db_index=False)
+    qualite = models.CharField(max_length=20, choices=Partie.TYPES_PARTIE)
+    date_constitution = models.DateField()
+    numero_rg = models.CharField(max_length=50)
+    intitule = models.CharField(max_length=300)
+    etat = models.CharField(max_length=25, choices=Dossier.ETATS_DOSSIER)
+    date_enregistrement = models.DateField()
+    est_confidentiel = models.BooleanField(default=False)
+    dossier_ouvert = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['partie', '-date_enregistrement'], name='index_partie_historique'),
+            models.Index(fields=['avocat', 'dossier_ouvert', '-date_enregistrement'], name='index_partie_avocat'),
+        ]
+        verbose_name = "Index des Parties"
+        verbose_name_plural = "Index des Parties"
+
+    def __str__(self):
+        return f"{self.partie_id} - {self.numero_rg} ({self.qualite})"
+
+
+class FusionPartie(BaseModel):
+    """Trace d'une fusion de parties en double (le doublon est désactivé)"""
+    doublon = models.ForeignKey(Partie, on_delete=models.CASCADE, related_name='fusions_doublon')
+    survivant = models.ForeignKey(Partie, on_delete=models.CASCADE, related_name='fusions')
+    score = models.FloatField(null=True, blank=True, help_text="Vide si rapproché par transitivité")
+
+    class Meta:
+        verbose_name = "Fusion de Parties"
+        verbose_name_plural = "Fusions de Parties"
+
+    def __str__(self):
+        return f"{self.doublon_id} → {self.survivant_id}"
+
+
+class Convocation(BaseModel):
+    """Convocation d'une partie ou d'un avocat à une audience, en file d'envoi"""
+    CANAUX = [
+        ('EMAIL', 'Courriel'),
+        ('COURRIER', 'Courrier'),
+    ]
+
+    ETATS_CONVOCATION = [
+        ('EN_ATTENTE', 'En Attente'),
+        ('EN_COURS', 'En Cours'),
+        ('ENVOYEE', 'Envoyée'),
+        ('ECHEC', 'Échec'),
+        ('ANNULEE', 'Annulée'),
+    ]
+
+    audience = models.ForeignKey(Audience, on_delete=models.CASCADE, related_name='convocations')
+    date_audience = models.DateTimeField(
+        help_text="Date de l'audience à l'émission : un renvoi appelle une nouvelle convocation")
+    partie = models.ForeignKey(Partie, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    avocat = models.ForeignKey(Avocat, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    canal = models.CharField(max_length=10, choices=CANAUX)
+    destinataire = models.CharField(max_length=300, help_text="Adresse électronique ou postale")
+    objet = models.CharField(max_length=200)
+    corps = models.TextField()
+    etat = models.CharField(max_length=10, choices=ETATS_CONVOCATION, default='EN_ATTENTE')
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    prochain_essai = models.DateTimeField(default=timezone.now)
+    lot = models.UUIDField(null=True, blank=True, help_text="Lot du worker qui a pris la convocation")
+    derniere_erreur = models.TextField(blank=True)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Une contrainte par sorte de destinataire : NULL ne départagerait pas les lignes
+            models.UniqueConstraint(fields=['audience', 'date_audience', 'canal', 'destinataire', 'partie'],
+                                    condition=models.Q(partie__isnull=False), name='convocation_partie_unique'),
+            models.UniqueConstraint(fields=['audience', 'date_audience', 'canal', 'destinataire', 'avocat'],
+                                    condition=models.Q(avocat__isnull=False), name='convocation_avocat_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['etat', 'prochain_essai'], name='convocation_file'),
+            models.Index(fields=['lot'], name='convocation_lot'),
+        ]
+        verbose_name = "Convocation"
+        verbose_name_plural = "Convocations"
+
+    def __str__(self):
+        return f"{self.audience_id} → {self.destinataire} ({self.etat})"
+
+
+class DocumentGenere(BaseModel):
+    """Dernier document généré pour un objet (décision, audience), rattaché au dossier comme pièce"""
+    modele = models.CharField(max_length=30)
+    objet_id = models.UUIDField()
+    format = models.CharField(max_length=4)
+    version = models.CharField(max_length=64, help_text="Empreinte des données sources au rendu")
+    empreinte = models.CharField(max_length=64, help_text="SHA-256 du fichier")
+    piece = models.OneToOneField(PieceJointe, on_delete=models.CASCADE, related_name='generation')
+
+    class Meta:
+        unique_together = ['modele', 'objet_id', 'format']
+        verbose_name = "Document Généré"
+        verbose_name_plural = "Documents Générés"
+
+    def __str__(self):
+        return f"{self.modele} {self.objet_id} ({self.format})"
+
+
+class ImportRegistre(BaseModel):
+    """Reprise d'un fichier de registre historique : lignes mises en attente, contrôlées puis chargées"""
+    TYPES_DONNEES = [
+        ('DOSSIER', 'Dossiers'),
+        ('PARTIE', 'Parties'),
+        ('AUDIENCE', 'Audiences'),
+        ('DECISION', 'Décisions'),
+    ]
+
+    ETATS_IMPORT = [
+        ('EN_ATTENTE', 'En Attente'),
+        ('VALIDE', 'Validé'),
+        ('TERMINE', 'Terminé'),
+    ]
+
+    type_donnees = models.CharField(max_length=10, choices=TYPES_DONNEES)
+    fichier = models.CharField(max_length=255)
+    etat = models.CharField(max_length=10, choices=ETATS_IMPORT, default='EN_ATTENTE')
+    lignes = models.PositiveIntegerField(default=0)
+    rejetees = models.PositiveIntegerField(default=0)
+    importees = models.PositiveIntegerField(default=0)
+    cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Import de Registre"
+        verbose_name_plural = "Imports de Registres"
+
+    def __str__(self):
+        return f"{self.fichier} ({self.type_donnees}, {self.etat})"
+
+
+class LigneImport(BaseModel):
+    """Ligne d'un fichier importé, en table d'attente jusqu'à son chargement"""
+    ETATS_LIGNE = [
+        ('A_VALIDER', 'À Valider'),
+        ('VALIDE', 'Valide'),
+        ('REJETEE', 'Rejetée'),
+        ('IMPORTEE', 'Importée'),
+    ]
+
+    import_registre = models.ForeignKey(ImportRegistre, on_delete=models.CASCADE, related_name='lignes_import',
+                                        db_index=False)
+    numero = models.PositiveIntegerField(help_text="Ligne du fichier (l'en-tête est la ligne 1)")
+    donnees = models.JSONField(help_text="Colonnes lues, en texte")
+    etat = models.CharField(max_length=10, choices=ETATS_LIGNE, default='A_VALIDER')
+    erreurs = models.JSONField(default=list, blank=True)
+    objet_id = models.UUIDField(null=True, blank=True, help_text="Objet créé par la ligne")
+
+    class Meta:
+        unique_together = ['import_registre', 'numero']
+        indexes = [
+            models.Index(fields=['import_registre', 'etat', 'numero'], name='ligne_import_etat'),
+        ]
+        verbose_name = "Ligne d'Import"
+        verbose_name_plural = "Lignes d'Import"
+
+    def __str__(self):
+        return f"{self.import_registre_id} ligne {self.numero} ({self.etat})"
+
+
+class SequenceJudiciaire(BaseModel):
+    """Compteur des numéros de registre d'un tribunal pour une année, réservé par blocs (:mod:`core.numeros`)"""
+    TYPES_NUMERO = [
+        ('RG', 'Répertoire Général'),
+        ('DECISION', 'Décision'),
+    ]
+
+    tribunal = models.ForeignKey(Tribunal, on_delete=models.CASCADE, related_name='sequences', db_index=False)
+    annee = models.PositiveSmallIntegerField()
+    type_numero = models.CharField(max_length=10, choices=TYPES_NUMERO)
+    prochain = models.PositiveIntegerField(default=1, help_text="Premier numéro non encore réservé")
+
+    class Meta:
+        unique_together = ['tribunal', 'annee', 'type_numero']
+        verbose_name = "Séquence Judiciaire"
+        verbose_name_plural = "Séquences Judiciaires"
+
+    def __str__(self):
+        return f"{self.type_numero} {self.tribunal_id} {self.annee} ({self.prochain})"
@@ -0,0 +1,155 @@
+"""Attribution des numéros de registre : numéro RG des dossiers, numéro des décisions.
+
+Les numéros se suivent par tribunal, année et type. Chercher le plus grand
+numéro puis l'incrémenter sérialiserait tous les enregistrements : chaque
+processus réserve plutôt un bloc de ``NUMERO_BLOC`` numéros dans
+:class:`~core.models.SequenceJudiciaire` — un UPDATE qui ne verrouille que
+la ligne du compteur, le temps d'une courte transaction — puis distribue le
+bloc depuis la mémoire, sous un verrou local. Deux réservations ne se
+recouvrent jamais : un numéro n'est remis qu'une fois.
+
+Appelé dans une transaction, l'allocateur réserve un seul numéro, avec elle :
+si elle est annulée, la réservation l'est aussi et aucun numéro déjà remis
+ne peut être redistribué.
+
+Un numéro réservé mais jamais porté (bloc d'un processus arrêté,
+enregistrement abandonné) laisse un trou, que :func:`trous` recense à partir
+des numéros effectivement enregistrés.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Decision, Dossier, SequenceJudiciaire, Tribunal
+
+
+# Réservations d'un bloc tentées quand la base est verrouillée (SQLite) avant d'abandonner
+TENTATIVES = 5
+
+# Type de numéro → (modèle, champ qui le porte)
+CHAMPS = {
+    'RG': (Dossier, 'numero_rg'),
+    'DECISION': (Decision, 'numero_decision'),
+}
+
+
+def code_tribunal(tribunal_id, code):
+    """Code du tribunal dans ses numéros ; à défaut, le début de son identifiant"""
+    return code or str(tribunal_id).replace('-', '')[:8].upper()
+
+
+def gabarit(type_numero, code, annee):
+    """``(préfixe, suffixe)`` qui encadrent le rang dans les numéros d'un tribunal pour une année"""
+    avant, _, apres = settings.NUMERO_FORMATS[type_numero].partition('{numero')
+    return avant.format(tribunal=code, annee=annee), apres.partition('}')[2].format(tribunal=code, annee=annee)
+
+
+def rangs(type_numero, code, annee):
+    """Rangs des numéros enregistrés pour le tribunal et l'année"""
+    modele, champ = CHAMPS[type_numero]
+    prefixe, suffixe = gabarit(type_numero, code, annee)
+    for valeur in modele.objects.filter(**{f'{champ}__startswith': prefixe}).values_list(champ, flat=True):
+        rang = valeur[len(prefixe):len(valeur) - len(suffixe)]
+        if valeur.endswith(suffixe) and rang.isdigit():
+            yield int(rang)
+
+
+def amorcer(tribunal_id, annee, type_numero):
+    """Crée le compteur après le plus grand numéro déjà enregistré (saisi à la main, repris d'un registre)"""
+    tribunal = Tribunal.objects.values_list('pk', 'code').get(pk=tribunal_id)
+    prochain = max(rangs(type_numero, code_tribunal(*tribunal), annee), default=0) + 1
+    try:
+        with transaction.atomic():
+            SequenceJudiciaire.objects.create(tribunal_id=tribunal_id, annee=annee, type_numero=type_numero,
+                                              prochain=prochain)
+    except IntegrityError:
+        pass  # Créé entre-temps par un autre processus
+
+
+def reserver(tribunal_id, annee, type_numero, taille):
+    """Réserve ``taille`` numéros consécutifs ; renvoie ``(code du tribunal, premier rang, fin)``"""
+    sequence = SequenceJudiciaire.objects.filter(tribunal_id=tribunal_id, annee=annee, type_numero=type_numero)
+    while True:
+        with transaction.atomic():
+            # L'UPDATE d'abord : il prend le verrou de la ligne avant toute lecture
+            if sequence.update(prochain=F('prochain') + taille, date_modification=timezone.now()):
+                fin, code = sequence.values_list('prochain', 'tribunal__code').get()
+                return code_tribunal(tribunal_id, code), fin - taille, fin
+        amorcer(tribunal_id, annee, type_numero)
+
+
+class Allocateur:
+    """Blocs de numéros réservés par ce processus, distribués sans accès à la base"""
+
+    def __init__(self, taille=None):
+        self.taille = taille
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        # Aussi appelé dans un processus fils : il ne doit pas distribuer les blocs de son parent
+        self.blocs = {}
+        self.lock = threading.Lock()
+
+    def reserver(self, cle):
+        for tentative in range(TENTATIVES):
+            try:
+                return list(reserver(*cle, self.taille or settings.NUMERO_BLOC))
+            except OperationalError:
+                # Une réservation annulée n'a rien réservé : elle peut être rejouée
+                if tentative == TENTATIVES - 1:
+                    raise
+                time.sleep(0.01 * 2 ** tentative)
+
+    def attribuer(self, type_numero, tribunal_id, annee):
+        """Numéro suivant du tribunal pour l'année"""
+        cle = (str(tribunal_id), annee, type_numero)
+        if transaction.get_connection().in_atomic_block:
+            code, rang, fin = reserver(*cle, 1)
+        else:
+            with self.lock:
+                bloc = self.blocs.get(cle)
+                if bloc is None or bloc[1] == bloc[2]:
+                    bloc = self.blocs[cle] = self.reserver(cle)
+                code, rang = bloc[0], bloc[1]
+                bloc[1] += 1
+        return settings.NUMERO_FORMATS[type_numero].format(tribunal=code, annee=annee, numero=rang)
+
+
+allocateur = Allocateur()
+os.register_at_fork(after_in_child=allocateur.reinitialiser)
+
+
+def numero_rg(tribunal_id, annee=None):
+    return allocateur.attribuer('RG', tribunal_id, annee or timezone.localdate().year)
+
+
+def numero_decision(tribunal_id, annee=None):
+    return allocateur.attribuer('DECISION', tribunal_id, annee or timezone.localdate().year)
+
+
+def trous(tribunal_id, annee, type_numero):
+    """Plages ``(premier, dernier)`` de numéros réservés qu'aucun enregistrement ne porte.
+
+    Les blocs encore en cours de distribution dans les processus en font partie.
+    """
+    sequence = SequenceJudiciaire.objects.filter(
+        tribunal_id=tribunal_id, annee=annee, type_numero=type_numero,
+    ).values_list('prochain', 'tribunal__code').first()
+    if sequence is None:
+        return []
+    prochain, code = sequence
+    utilises = set(rangs(type_numero, code_tribunal(tribunal_id, code), annee))
+    plages = []
+    for rang in range(1, prochain):
+        if rang in utilises:
+            continue
+        if plages and plages[-1][1] == rang - 1:
+            plages[-1][1] = rang
+        else:
+            plages.append([rang, rang])
+    return [tuple(plage) for plage in plages]
@@ -0,0 +1,86 @@
+"""Index des participations : historique judiciaire d'une partie, dossiers actifs d'un avocat.
+
+:class:`~core.models.IndexPartie` recopie, pour chaque lien actif
+:class:`PartieAuDossier`, les champs du dossier utiles aux listes (numéro RG,
+intitulé, état, tribunal…) : une liste se lit alors en une requête sur un
+index composite, sans jointure ni chargement des dossiers. Les signaux
+tiennent l'index à jour ; la commande ``indexer_parties`` le reconstruit
+après un import en masse.
+"""
+from .acces import TOUT
+from .charges import ETATS_TERMINES
+from .models import IndexPartie, PartieAuDossier
+
+
+# Champ de l'index → champ du dossier
+CHAMPS_DOSSIER = {
+    'tribunal_id': 'tribunal_id',
+    'numero_rg': 'numero_rg',
+    'intitule': 'intitule',
+    'etat': 'etat',
+    'date_enregistrement': 'date_enregistrement',
+    'est_confidentiel': 'est_confidentiel',
+}
+
+CHAMPS_LISTE = ('dossier_id', 'numero_rg', 'intitule', 'etat', 'tribunal_id', 'qualite',
+                'date_enregistrement', 'date_constitution', 'est_confidentiel')
+
+
+def indexer(lien_ids):
+    """(Ré)indexe les liens donnés ; les liens inactifs ou disparus sont retirés de l'index"""
+    liens = PartieAuDossier.objects.filter(
+        pk__in=lien_ids, est_actif=True, dossier__est_actif=True
+    ).values('id', 'partie_id', 'avocat_id', 'dossier_id', 'qualite', 'date_constitution',
+             *[f'dossier__{field}' for field in CHAMPS_DOSSIER.values()])
+    lignes = [
+        IndexPartie(
+            lien_id=lien['id'], partie_id=lien['partie_id'], avocat_id=lien['avocat_id'],
+            dossier_id=lien['dossier_id'], qualite=lien['qualite'], date_constitution=lien['date_constitution'],
+            dossier_ouvert=lien['dossier__etat'] not in ETATS_TERMINES,
+            **{field: lien[f'dossier__{source}'] for field, source in CHAMPS_DOSSIER.items()},
+        )
+        for lien in liens
+    ]
+    IndexPartie.objects.bulk_create(
+        lignes, batch_size=1000, update_conflicts=True, unique_fields=['lien'],
+        update_fields=['partie', 'avocat', 'dossier', 'qualite', 'date_constitution', 'dossier_ouvert',
+                       *CHAMPS_DOSSIER, 'date_modification'],
+    )
+    retires = IndexPartie.objects.filter(lien_id__in=lien_ids).exclude(
+        lien_id__in=[ligne.lien_id for ligne in lignes]
+    )
+    retires.delete()
+    return len(lignes)
+
+
+def actualiser_dossier(dossier):
+    """Reporte les champs d'un dossier sur ses lignes d'index, en un seul UPDATE"""
+    lignes = IndexPartie.objects.filter(dossier_id=dossier.pk)
+    if not dossier.est_actif:
+        return lignes.delete()[0]
+    count = lignes.update(
+        dossier_ouvert=dossier.etat not in ETATS_TERMINES,
+        **{field: getattr(dossier, source) for field, source in CHAMPS_DOSSIER.items()},
+    )
+    if not count:
+        # Dossier réactivé : ses liens avaient été retirés de l'index
+        count = indexer(PartieAuDossier.objects.filter(dossier_id=dossier.pk).values('pk'))
+    return count
+
+
+def dossiers_partie(partie_id, limit=500, acces=TOUT):
+    """Dossiers d'une partie, du plus récent au plus ancien"""
+    return (
+        IndexPartie.objects.visibles(acces).filter(partie_id=partie_id)
+        .order_by('-date_enregistrement')
+        .values(*CHAMPS_LISTE)[:limit]
+    )
+
+
+def dossiers_avocat(avocat_id, limit=500, acces=TOUT):
+    """Dossiers en cours d'un avocat, du plus récent au plus ancien"""
+    return (
+        IndexPartie.objects.visibles(acces).filter(avocat_id=avocat_id, dossier_ouvert=True)
+        .order_by('-date_enregistrement')
+        .values('partie_id', *CHAMPS_LISTE)[:limit]
+    )
@@ -0,0 +1,142 @@
+"""Plans de sérialisation compilés pour les listes en lecture seule.
+
+Un ``ModelSerializer`` DRF résout, pour chaque ligne et chaque champ,
+l'attribut source puis appelle ``to_representation`` : sur des milliers de
+dossiers aux sérialiseurs imbriqués, c'est l'essentiel du temps CPU.
+
+:func:`compiler` parcourt une fois la classe de sérialiseur et en tire un
+plan plat : la liste des colonnes à lire par ``values_list`` (relations
+imbriquées comprises, en une requête) et une fonction générée qui construit
+chaque dictionnaire directement depuis le tuple. Les conversions courantes
+(horodatages, dates et UUID au format par défaut) sont écrites en ligne ;
+les autres appellent le ``to_representation`` du champ, si bien que la
+sortie est identique à celle du sérialiseur. Les
+champs qui dépendent de l'objet ou du contexte (méthodes, fichiers,
+relations multiples) rendent la classe non compilable : on garde alors DRF.
+
+Le gain visé (5×, vérifié par ``benchmarks.OBJECTIFS``) porte sur la
+construction des dictionnaires ; de bout en bout, la lecture SQL reste la
+même et le gain retombe entre 2 et 3×.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import fields, relations, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+# Champs dont ``to_representation`` rend la valeur lue en base telle quelle
+IDENTITE = (fields.CharField, fields.IntegerField, fields.BooleanField)
+
+
+class NonCompilable(TypeError):
+    pass
+
+
+def horodatage(value):
+    """Rendu ISO 8601 de DRF : UTC noté ``Z``"""
+    texte = value.isoformat()
+    return texte[:-6] + 'Z' if texte.endswith('+00:00') else texte
+
+
+def format_iso(field, defaut):
+    return (getattr(field, 'format', defaut) or '').lower() == 'iso-8601'
+
+
+class Plan:
+    """Colonnes à lire et constructeur des dictionnaires d'un sérialiseur"""
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.colonnes, self.convertisseurs = [], {}
+        expression = self.dictionnaire(serializer_class(), '')
+        code = f'def construire(row, tz):\n    return {expression}\n'
+        namespace = {'horodatage': horodatage, **self.convertisseurs}
+        exec(compile(code, f'<plan {serializer_class.__name__}>', 'exec'), namespace)
+        self.code = code
+        self.construire = namespace['construire']
+
+    def colonne(self, chemin):
+        if chemin not in self.colonnes:
+            self.colonnes.append(chemin)
+        return self.colonnes.index(chemin)
+
+    def dictionnaire(self, serializer, prefixe):
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise NonCompilable(f"{type(serializer).__name__} redéfinit to_representation")
+        elements = []
+        for field in serializer._readable_fields:
+            if field.source in ('*', None) or '.' in field.source:
+                raise NonCompilable(f"Source non prise en charge : {field.field_name}")
+            elements.append(f'{field.field_name!r}: {self.valeur(field, prefixe + field.source)}')
+        return '{' + ', '.join(elements) + '}'
+
+    def valeur(self, field, chemin):
+        if isinstance(field, serializers.ListSerializer) or isinstance(field, relations.ManyRelatedField):
+            raise NonCompilable(f"Relation multiple : {field.field_name}")
+        if isinstance(field, serializers.BaseSerializer):
+            # Objet lié absent (clé étrangère nulle) : DRF rend None
+            cle = self.colonne(f'{chemin}__{field.Meta.model._meta.pk.name}')
+            return f'(None if row[{cle}] is None else {self.dictionnaire(field, chemin + "__")})'
+        if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+            return f'row[{self.colonne(chemin)}]'
+        if isinstance(field, (serializers.SerializerMethodField, fields.FileField, relations.RelatedField)):
+            raise NonCompilable(f"Champ non compilable : {field.field_name}")
+        index = self.colonne(chemin)
+        if isinstance(field, IDENTITE) and not isinstance(field, fields.ChoiceField):
+            return f'row[{index}]'
+        if isinstance(field, fields.ChoiceField) and all(isinstance(cle, str) for cle in field.choices):
+            # Valeur lue = clé du choix
+            return f'row[{index}]'
+        if type(field) is fields.UUIDField and field.uuid_format == 'hex_verbose':
+            return f'(None if row[{index}] is None else str(row[{index}]))'
+        if type(field) is fields.DateField and format_iso(field, api_settings.DATE_FORMAT):
+            return f'(None if row[{index}] is None else row[{index}].isoformat())'
+        if (type(field) is fields.DateTimeField and settings.USE_TZ and not hasattr(field, 'timezone')
+                and format_iso(field, api_settings.DATETIME_FORMAT)):
+            # Horodatages conscients, convertis dans le fuseau courant comme le fait DRF
+            return f'(None if row[{index}] is None else horodatage(row[{index}].astimezone(tz)))'
+        nom = f'c{len(self.convertisseurs)}'
+        self.convertisseurs[nom] = field.to_representation
+        return f'(None if row[{index}] is None else {nom}(row[{index}]))'
+
+    def serialiser(self, queryset):
+        """Liste de dictionnaires identique à ``Serializer(queryset, many=True).data``"""
+        construire, tz = self.construire, timezone.get_current_timezone()
+        return [construire(row, tz) for row in queryset.values_list(*self.colonnes)]
+
+
+plans = {}
+
+
+def compiler(serializer_class):
+    """Plan de ``serializer_class``, compilé une fois par processus ; :class:`NonCompilable` sinon"""
+    if serializer_class not in plans:
+        try:
+            plans[serializer_class] = Plan(serializer_class)
+        except NonCompilable as exc:
+            # L'échec aussi est mémorisé : la classe ne sera pas réexaminée
+            plans[serializer_class] = exc
+    plan = plans[serializer_class]
+    if isinstance(plan, NonCompilable):
+        raise NonCompilable(*plan.args)
+    return plan
+
+
+def serialiser(serializer_class, queryset):
+    """Sérialise ``queryset`` par le plan compilé, ou par DRF si la classe n'est pas compilable"""
+    try:
+        plan = compiler(serializer_class)
+    except NonCompilable:
+        return serializer_class(queryset, many=True).data
+    return plan.serialiser(queryset)
+
+
+class PlanListMixin:
+    """Action ``list`` d'un viewset servie par le plan compilé de son sérialiseur"""
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(serialiser(self.get_serializer_class(), queryset))
@@ -0,0 +1,36 @@
+"""Requêtes de lecture partagées par les vues synchrones et asynchrones"""
+from django.db.models import Q
+
+from .acces import TOUT
+from .models import Audience, Dossier, Partie
+
+
+def recherche(terme, limit=20, acces=TOUT):
+    """Dossiers (numéro RG, intitulé) et parties (nom, raison sociale) correspondant à ``terme``"""
+    dossiers = (
+        Dossier.objects.visibles(acces).filter(est_actif=True)
+        .filter(Q(numero_rg__istartswith=terme) | Q(intitule__icontains=terme))
+        .order_by('-date_enregistrement')
+        .values('id', 'numero_rg', 'intitule', 'etat', 'tribunal_id', 'tribunal__nom')[:limit]
+    )
+    parties = (
+        Partie.objects.visibles(acces).filter(est_actif=True)
+        .filter(Q(nom__istartswith=terme) | Q(raison_sociale__istartswith=terme))
+        .order_by('nom', 'prenom')
+        .values('id', 'prenom', 'nom', 'raison_sociale', 'est_personne_morale')[:limit]
+    )
+    return dossiers, parties
+
+
+def role_audience(tribunal_id, jour, acces=TOUT):
+    """Rôle d'audience : audiences d'un tribunal pour une journée, par heure et salle"""
+    return (
+        Audience.objects.visibles(acces)
+        .filter(dossier__tribunal_id=tribunal_id, date_prevue__date=jour, est_actif=True)
+        .order_by('date_prevue', 'salle')
+        .values(
+            'id', 'date_prevue', 'salle', 'type_audience', 'etat', 'est_publique',
+            'dossier_id', 'dossier__numero_rg', 'dossier__intitule',
+            'magistrat_id', 'magistrat__utilisateur__first_name', 'magistrat__utilisateur__last_name',
+        )
+    )
@@ -0,0 +1,144 @@
+"""Arbre des voies de recours d'un dossier.
+
+Chaque dossier de recours n'a qu'un dossier d'origine : les recours forment
+une forêt. L'arbre complet d'un dossier (depuis la première instance) se lit
+en une requête grâce à une CTE récursive ; la table de fermeture
+:class:`~core.models.RecoursClosure`, reconstruite à chaque changement d'une
+voie de recours, sert aux requêtes d'ascendance et de descendance indexées.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .acces import TOUT
+from .models import Dossier, RecoursClosure, VoieRecours
+
+
+# Garde-fou contre un cycle introduit par des données incohérentes
+PROFONDEUR_MAX = 20
+
+ARBRE_SQL = """
+WITH RECURSIVE ancetres(id, profondeur) AS (
+    SELECT %s, 0
+    UNION ALL
+    SELECT v.dossier_origine_id, a.profondeur + 1
+    FROM {voie} v JOIN ancetres a ON v.dossier_recours_id = a.id
+    WHERE v.est_actif AND a.profondeur < {max}
+), arbre(id, niveau) AS (
+    SELECT id, 0 FROM (SELECT id FROM ancetres ORDER BY profondeur DESC LIMIT 1) racine
+    UNION ALL
+    SELECT v.dossier_recours_id, arbre.niveau + 1
+    FROM {voie} v JOIN arbre ON v.dossier_origine_id = arbre.id
+    WHERE v.est_actif AND arbre.niveau < {max}
+)
+SELECT id FROM arbre
+"""
+
+
+def arbre_ids(dossier_id):
+    """Expression SQL des identifiants de l'arbre de recours contenant ``dossier_id``"""
+    sql = ARBRE_SQL.format(voie=connection.ops.quote_name(VoieRecours._meta.db_table), max=PROFONDEUR_MAX)
+    return RawSQL(sql, [Dossier._meta.pk.get_db_prep_value(dossier_id, connection)])
+
+
+def dossiers_arbre(dossier_id, acces=TOUT):
+    """Dossiers visibles de l'arbre, avec voie de recours, tribunal et décision, en une requête"""
+    return (
+        Dossier.objects.visibles(acces).filter(pk__in=arbre_ids(dossier_id))
+        .select_related('tribunal', 'info_recours', 'decision')
+    )
+
+
+def noeud(dossier):
+    info = {
+        'id': dossier.pk, 'numero_rg': dossier.numero_rg, 'etat': dossier.etat,
+        'tribunal': {'id': dossier.tribunal_id, 'nom': dossier.tribunal.nom},
+        'recours': None, 'decision': None, 'enfants': [],
+    }
+    voie = getattr(dossier, 'info_recours', None)
+    if voie is not None and voie.est_actif:
+        info['recours'] = {'id': voie.pk, 'type_recours': voie.type_recours, 'etat': voie.etat,
+                           'date_formation': voie.date_formation}
+    decision = getattr(dossier, 'decision', None)
+    if decision is not None:
+        info['decision'] = {'id': decision.pk, 'type_decision': decision.type_decision,
+                            'numero_decision': decision.numero_decision,
+                            'date_decision': decision.date_decision,
+                            'sens_decision': decision.sens_decision}
+    return info
+
+
+def arbre(dossier_id, acces=TOUT):
+    """Arbre imbriqué depuis la racine ; ``None`` si le dossier n'existe pas ou n'est pas visible.
+
+    Un dossier invisible masque toute sa descendance : la racine renvoyée est
+    alors le plus ancien ascendant visible de ``dossier_id``.
+    """
+    dossiers = list(dossiers_arbre(dossier_id, acces).order_by('date_enregistrement', 'numero_rg'))
+    noeuds = {dossier.pk: noeud(dossier) for dossier in dossiers}
+    if dossier_id not in noeuds:
+        return None
+    parents = {}
+    for dossier in dossiers:
+        if noeuds[dossier.pk]['recours']:
+            parents[dossier.pk] = dossier.info_recours.dossier_origine_id
+        if parents.get(dossier.pk) in noeuds:
+            noeuds[parents[dossier.pk]]['enfants'].append(noeuds[dossier.pk])
+    racine = dossier_id
+    while parents.get(racine) in noeuds:
+        racine = parents[racine]
+    return noeuds[racine]
+
+
+def fermeture(aretes):
+    """Couples ``(ancêtre, descendant, profondeur)`` d'une forêt donnée par ses arêtes"""
+    enfants = defaultdict(list)
+    for origine, recours in aretes:
+        enfants[origine].append(recours)
+    couples = []
+    for ancetre in list(enfants):
+        pile, vus = [(enfant, 1) for enfant in enfants[ancetre]], {ancetre}
+        while pile:
+            descendant, profondeur = pile.pop()
+            if descendant in vus:
+                continue
+            vus.add(descendant)
+            couples.append((ancetre, descendant, profondeur))
+            pile.extend((enfant, profondeur + 1) for enfant in enfants.get(descendant, ()))
+    return couples
+
+
+def aretes(queryset):
+    return queryset.filter(est_actif=True).values_list('dossier_origine_id', 'dossier_recours_id')
+
+
+@transaction.atomic
+def reconstruire(dossier_id=None):
+    """Reconstruit la table de fermeture de l'arbre de ``dossier_id`` (de toute la forêt par défaut)"""
+    if dossier_id is None:
+        RecoursClosure.objects.all().delete()
+        voies = VoieRecours.objects.all()
+    else:
+        ids = list(Dossier.objects.filter(pk__in=arbre_ids(dossier_id)).values_list('pk', flat=True))
+        RecoursClosure.objects.filter(descendant__in=ids).delete()
+        voies = VoieRecours.objects.filter(dossier_recours__in=ids)
+    RecoursClosure.objects.bulk_create(
+        [RecoursClosure(ancetre_id=ancetre, descendant_id=descendant, profondeur=profondeur)
+         for ancetre, descendant, profondeur in fermeture(aretes(voies))],
+        batch_size=1000,
+    )
+
+
+def ancetres(dossier_id, acces=TOUT):
+    return (
+        RecoursClosure.objects.filter(acces.dossiers('ancetre'), descendant_id=dossier_id)
+        .order_by('profondeur')
+    )
+
+
+def descendants(dossier_id, acces=TOUT):
+    return (
+        RecoursClosure.objects.filter(acces.dossiers('descendant'), ancetre_id=dossier_id)
+        .order_by('profondeur')
+    )
@@ -0,0 +1,65 @@
+from decimal import Decimal
+from uuid import UUID
+
+from rest_framework.renderers import JSONRenderer
+
+from .instrumentation import phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+
+# Types rendus à l'identique sans examen
+SCALAIRES = frozenset((str, int, bool, type(None), UUID))
+
+
+def notation_decimale(valeur):
+    """Vrai si tous les flottants de ``valeur`` s'écrivent sans exposant.
+
+    orjson et ``json`` les rendent alors à l'identique ; ils divergent sur
+    l'exposant (``1e16`` contre ``1e+16``, ``1e-7`` contre ``1e-07``) et
+    orjson rend ``null`` les flottants non finis, que DRF refuse. Les
+    décimaux comptent : l'encodeur DRF les convertit en flottants.
+    """
+    if isinstance(valeur, dict):
+        valeur = valeur.values()
+    elif not isinstance(valeur, (list, tuple)):
+        if isinstance(valeur, Decimal):
+            valeur = float(valeur)
+        return not isinstance(valeur, float) or valeur == 0 or 1e-4 <= abs(valeur) < 1e16
+    for element in valeur:
+        if type(element) not in SCALAIRES and not notation_decimale(element):
+            return False
+    return True
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Rendu JSON compact via orjson, octet pour octet identique au rendu DRF.
+
+    Les types que DRF formate lui-même (dates, décimaux, paresseux…) passent
+    par son encodeur ; sans orjson, si une indentation est demandée ou si un
+    flottant s'écrirait avec un exposant ou n'est pas fini (NaN, infini :
+    refusés par DRF, ``ValueError``), le rendu DRF standard est utilisé. Le
+    rendu est la phase ``serialization`` des mesures d'instrumentation.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase('serialization'):
+            return self.render_compact(data, accepted_media_type, renderer_context)
+
+    def render_compact(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+                or not notation_decimale(data)):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default,
+                               option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Entiers hors 64 bits, clés non sérialisables… : l'encodeur standard décide
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
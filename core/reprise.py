@@ -0,0 +1,506 @@
+"""Reprise en masse des registres historiques (CSV, Excel).
+
+Un import se fait en trois temps, chacun par lots de lignes :
+
+1. :func:`mettre_en_attente` lit le fichier en flux et recopie ses lignes,
+   telles quelles, dans la table d'attente :class:`~core.models.LigneImport` ;
+2. :func:`valider` contrôle les lignes : les références (tribunal par nom,
+   nature d'affaire par code, dossier par numéro RG, magistrat, avocat) sont
+   résolues en une requête par table et par lot, les valeurs converties et
+   contrôlées par les champs du modèle ; une ligne rejetée garde ses erreurs ;
+3. :func:`charger` crée les objets des lignes valides par ``bulk_create``,
+   une transaction par lot, et tient à jour l'index des parties et la charge
+   des magistrats, que les signaux ne voient pas passer. L'objet créé par
+   une ligne en reprend l'identifiant.
+
+Le contrôle est rejoué au chargement : une ligne devenue invalide entre-temps
+(dossier créé par ailleurs, doublon) est rejetée sans faire échouer son lot.
+Les dossiers se chargent avant leurs parties, audiences et décisions.
+"""
+import csv
+from datetime import date, datetime, time
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import charges, parties
+from .models import (
+    Audience, Avocat, Decision, Dossier, ImportRegistre, LigneImport, Magistrat, NatureAffaire, Partie,
+    PartieAuDossier, Tribunal,
+)
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    openpyxl = None
+
+
+BOOLEENS = {'1': True, 'oui': True, 'o': True, 'vrai': True, 'true': True, 'x': True,
+            '0': False, 'non': False, 'n': False, 'faux': False, 'false': False}
+
+
+def texte(valeur):
+    """Cellule en texte : dates en ISO 8601, nombres entiers sans décimale"""
+    if valeur is None:
+        return ''
+    if isinstance(valeur, (date, time)):
+        return valeur.isoformat()
+    if isinstance(valeur, float) and valeur.is_integer():
+        return str(int(valeur))
+    return str(valeur).strip()
+
+
+def entete(colonnes):
+    return [texte(colonne).lower() for colonne in colonnes]
+
+
+def lire_csv(chemin):
+    with open(chemin, newline='', encoding='utf-8-sig') as fichier:
+        try:
+            dialecte = csv.Sniffer().sniff(fichier.read(4096), delimiters=',;\t')
+        except csv.Error:
+            dialecte = csv.excel
+        fichier.seek(0)
+        lignes = csv.reader(fichier, dialecte)
+        colonnes = entete(next(lignes, []))
+        for ligne in lignes:
+            yield dict(zip(colonnes, map(texte, ligne)))
+
+
+def lire_excel(chemin):
+    # Lecture en flux : le classeur n'est jamais chargé en entier
+    classeur = openpyxl.load_workbook(chemin, read_only=True, data_only=True)
+    try:
+        lignes = classeur.worksheets[0].iter_rows(values_only=True)
+        colonnes = entete(next(lignes, ()))
+        for ligne in lignes:
+            yield dict(zip(colonnes, map(texte, ligne)))
+    finally:
+        classeur.close()
+
+
+LECTEURS = {'.csv': lire_csv, '.xlsx': lire_excel}
+
+
+def lire(chemin):
+    """``(numéro, {colonne: texte})`` des lignes non vides du fichier, numérotées comme dans le fichier"""
+    extension = Path(chemin).suffix.lower()
+    if extension not in LECTEURS:
+        raise ValueError(f"Format de fichier non pris en charge : {extension or chemin}")
+    if extension == '.xlsx' and openpyxl is None:
+        raise ValueError("La lecture des fichiers Excel demande le module openpyxl")
+    lignes = enumerate(LECTEURS[extension](chemin), start=2)
+    return ((numero, donnees) for numero, donnees in lignes if any(donnees.values()))
+
+
+@lru_cache(maxsize=None)
+def choix(field):
+    """``{valeur ou libellé en minuscules: valeur}`` d'un champ à choix"""
+    correspondances = {}
+    for valeur, libelle in field.flatchoices:
+        correspondances[str(libelle).lower()] = correspondances[str(valeur).lower()] = valeur
+    return correspondances
+
+
+def lire_date(brut):
+    try:
+        return datetime.strptime(brut, '%d/%m/%Y').date()
+    except ValueError:
+        pass
+    try:
+        moment = parse_datetime(brut)
+        return moment.date() if moment else parse_date(brut)
+    except ValueError:
+        return None
+
+
+def lire_date_heure(brut):
+    for format in ('%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y'):
+        try:
+            moment = datetime.strptime(brut, format)
+            break
+        except ValueError:
+            pass
+    else:
+        try:
+            moment = parse_datetime(brut)
+            if moment is None and (jour := parse_date(brut)):
+                moment = datetime.combine(jour, time.min)
+        except ValueError:
+            return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def convertir(field, brut):
+    """Valeur de ``field`` pour le texte ``brut`` ; ``ValidationError`` si elle ne convient pas"""
+    if field.choices:
+        valeur = choix(field).get(brut.lower())
+        if valeur is None:
+            raise ValidationError(f"valeur « {brut} » inconnue")
+    elif isinstance(field, models.BooleanField):
+        if brut.lower() not in BOOLEENS:
+            raise ValidationError(f"« {brut} » n'est ni oui ni non")
+        valeur = BOOLEENS[brut.lower()]
+    elif isinstance(field, (models.DateTimeField, models.DateField)):
+        lecture = lire_date_heure if isinstance(field, models.DateTimeField) else lire_date
+        valeur = lecture(brut)
+        if valeur is None:
+            raise ValidationError(f"« {brut} » n'est pas une date")
+    else:
+        valeur = brut
+    return field.clean(valeur, None)
+
+
+def nettoyer(modele, donnees, champs, obligatoires, erreurs):
+    """Valeurs des colonnes ``champs`` converties pour ``modele`` ; les colonnes vides prennent le défaut"""
+    valeurs = {}
+    for nom in champs:
+        brut = donnees.get(nom, '')
+        if not brut:
+            if nom in obligatoires:
+                erreurs.append(f"{nom} : valeur obligatoire")
+            continue
+        try:
+            valeurs[nom] = convertir(modele._meta.get_field(nom), brut)
+        except ValidationError as exc:
+            erreurs.append(f"{nom} : {' '.join(exc.messages)}")
+    return valeurs
+
+
+def par_cle(modele, champ, valeurs):
+    """``{valeur: pk}`` des objets de ``modele`` ; une valeur portée par plusieurs objets donne ``None``"""
+    trouves = {}
+    if valeurs:
+        for valeur, pk in modele.objects.filter(**{f'{champ}__in': valeurs}).values_list(champ, 'pk'):
+            trouves[valeur] = None if valeur in trouves else pk
+    return trouves
+
+
+# Colonne de référence → (modèle, champ de recherche, libellé)
+TRIBUNAL = (Tribunal, 'nom', "tribunal")
+NATURE = (NatureAffaire, 'code', "nature d'affaire")
+DOSSIER = (Dossier, 'numero_rg', "dossier")
+MAGISTRAT = (Magistrat, 'numero_employe', "magistrat")
+AVOCAT = (Avocat, 'numero_barreau', "avocat")
+
+
+class Chargeur:
+    """Contrôle et chargement d'un type de lignes.
+
+    Une sous-classe déclare les colonnes recopiées sur son modèle
+    (``champs``), ses références et, dans :meth:`construire`, crée l'objet
+    d'une ligne. :meth:`cles` donne les valeurs qui doivent rester uniques
+    dans le fichier.
+    """
+    modele = None
+    champs = ()
+    obligatoires = ()
+    references = {}
+    titulaires = ()
+
+    def resoudre(self, lignes):
+        """Références d'un lot de lignes, une requête par table"""
+        return {
+            colonne: par_cle(modele, champ, {ligne.donnees.get(colonne) for ligne in lignes} - {None, ''})
+            for colonne, (modele, champ, libelle) in self.references.items()
+        }
+
+    def existants(self, lignes, ids):
+        """Données déjà en base utiles au contrôle des doublons ; ``ids`` : références résolues des lignes"""
+        return None
+
+    def construire(self, donnees, valeurs, ids, existants, erreurs):
+        raise NotImplementedError
+
+    def cles(self, objet):
+        return []
+
+    def preparer(self, lignes, vus):
+        """``[(ligne, erreurs, objet)]`` d'un lot ; ``vus`` reçoit les clés des lignes acceptées"""
+        refs = self.resoudre(lignes)
+        resolues = []
+        for ligne in lignes:
+            erreurs = []
+            ids = {}
+            for colonne, (modele, champ, libelle) in self.references.items():
+                brut = ligne.donnees.get(colonne, '')
+                if not brut:
+                    if colonne in self.obligatoires:
+                        erreurs.append(f"{colonne} : valeur obligatoire")
+                elif brut not in refs[colonne]:
+                    erreurs.append(f"{colonne} : {libelle} « {brut} » introuvable")
+                elif refs[colonne][brut] is None:
+                    erreurs.append(f"{colonne} : {libelle} « {brut} » ambigu")
+                ids[colonne] = refs[colonne].get(brut)
+            resolues.append((ligne, erreurs, ids))
+
+        existants = self.existants(lignes, [ids for ligne, erreurs, ids in resolues])
+        preparees = []
+        for ligne, erreurs, ids in resolues:
+            valeurs = nettoyer(self.modele, ligne.donnees, self.champs, self.obligatoires, erreurs)
+            objet = self.construire(ligne.donnees, valeurs, ids, existants, erreurs)
+            self.identifier(objet, ligne.pk)
+            if not erreurs:
+                cles = self.cles(objet)
+                erreurs += [f"{cle[0]} : en double dans le fichier" for cle in cles if cle in vus]
+                if not erreurs:
+                    vus.update(cles)
+            preparees.append((ligne, erreurs, objet))
+        return preparees
+
+    def identifier(self, objet, pk):
+        # L'objet créé par une ligne en reprend l'identifiant
+        objet.pk = pk
+
+    def enregistrer(self, objets):
+        self.modele.objects.bulk_create(objets)
+
+    def magistrats(self, objets):
+        return {getattr(objet, champ) for objet in objets for champ in self.titulaires} - {None}
+
+
+class ChargeurDossiers(Chargeur):
+    modele = Dossier
+    champs = ('numero_rg', 'intitule', 'objet_litige', 'numero_parquet', 'etat', 'urgence', 'date_enregistrement',
+              'date_cloture', 'chambre', 'est_confidentiel')
+    obligatoires = ('numero_rg', 'intitule', 'tribunal', 'nature')
+    references = {'tribunal': TRIBUNAL, 'nature': NATURE, 'magistrat_siege': MAGISTRAT}
+    titulaires = ('magistrat_siege_id',)
+
+    def existants(self, lignes, ids):
+        numeros = {ligne.donnees.get('numero_rg') for ligne in lignes}
+        return set(Dossier.objects.filter(numero_rg__in=numeros).values_list('numero_rg', flat=True))
+
+    def construire(self, donnees, valeurs, ids, existants, erreurs):
+        if valeurs.get('numero_rg') in existants:
+            erreurs.append(f"numero_rg : le dossier {valeurs['numero_rg']} existe déjà")
+        return Dossier(tribunal_id=ids['tribunal'], nature_affaire_id=ids['nature'],
+                       magistrat_siege_id=ids['magistrat_siege'], **valeurs)
+
+    def cles(self, objet):
+        return [('numero_rg', objet.numero_rg)]
+
+
+class ChargeurParties(Chargeur):
+    """Une partie et sa constitution au dossier ; la partie est reprise si son identifiant est déjà connu"""
+    modele = Partie
+    champs = ('prenom', 'nom', 'nom_usage', 'date_naissance', 'lieu_naissance', 'telephone', 'email', 'adresse',
+              'numero_identification', 'est_personne_morale', 'raison_sociale', 'forme_juridique')
+    champs_lien = ('qualite', 'date_constitution', 'observations')
+    obligatoires = ('numero_rg', 'qualite')
+    references = {'numero_rg': DOSSIER, 'avocat': AVOCAT}
+
+    def existants(self, lignes, ids):
+        identifiants = {ligne.donnees.get('numero_identification') for ligne in lignes} - {None, ''}
+        connues = par_cle(Partie, 'numero_identification', identifiants)
+        liens = set(PartieAuDossier.objects.filter(
+            dossier_id__in={ref['numero_rg'] for ref in ids}, partie_id__in=set(connues.values()) - {None},
+        ).values_list('dossier_id', 'partie_id', 'qualite')) if connues else set()
+        return connues, liens
+
+    def construire(self, donnees, valeurs, ids, existants, erreurs):
+        connues, liens = existants
+        lien = PartieAuDossier(
+            dossier_id=ids['numero_rg'], avocat_id=ids['avocat'],
+            **nettoyer(PartieAuDossier, donnees, self.champs_lien, self.obligatoires, erreurs),
+        )
+        if valeurs.get('est_personne_morale') and not valeurs.get('raison_sociale'):
+            erreurs.append("raison_sociale : valeur obligatoire pour une personne morale")
+        elif not valeurs.get('est_personne_morale') and not valeurs.get('nom'):
+            erreurs.append("nom : valeur obligatoire")
+
+        identifiant = valeurs.get('numero_identification')
+        if identifiant not in connues:
+            return Partie(**valeurs), lien
+        lien.partie_id = connues[identifiant]
+        if lien.partie_id is None:
+            erreurs.append(f"numero_identification : plusieurs parties portent l'identifiant {identifiant}")
+        elif (lien.dossier_id, lien.partie_id, lien.qualite) in liens:
+            erreurs.append(f"numero_identification : la partie {identifiant} est déjà constituée au dossier")
+        return None, lien
+
+    def cles(self, objet):
+        partie, lien = objet
+        identifiant = partie.numero_identification if partie else lien.partie_id
+        return [('numero_identification', lien.dossier_id, identifiant, lien.qualite)] if identifiant else []
+
+    def identifier(self, objet, pk):
+        objet[1].pk = pk
+
+    def enregistrer(self, objets):
+        # Une partie nouvelle citée par plusieurs lignes du lot n'est créée qu'une fois
+        nouvelles = {}
+        for partie, lien in objets:
+            if partie is not None:
+                lien.partie_id = nouvelles.setdefault(partie.numero_identification or partie.pk, partie).pk
+        Partie.objects.bulk_create(nouvelles.values())
+        liens = [lien for partie, lien in objets]
+        PartieAuDossier.objects.bulk_create(liens)
+        parties.indexer([lien.pk for lien in liens])
+
+
+class ChargeurAudiences(Chargeur):
+    modele = Audience
+    champs = ('type_audience', 'date_prevue', 'heure_debut_reelle', 'heure_fin_reelle', 'salle', 'etat',
+              'observations', 'est_publique')
+    obligatoires = ('numero_rg', 'type_audience', 'date_prevue', 'salle', 'magistrat')
+    references = {'numero_rg': DOSSIER, 'magistrat': MAGISTRAT}
+    titulaires = ('magistrat_id',)
+
+    def existants(self, lignes, ids):
+        return set(Audience.objects.filter(dossier_id__in={ref['numero_rg'] for ref in ids}).values_list(
+            'dossier_id', 'date_prevue', 'type_audience'))
+
+    def construire(self, donnees, valeurs, ids, existants, erreurs):
+        audience = Audience(dossier_id=ids['numero_rg'], magistrat_id=ids['magistrat'], **valeurs)
+        if (audience.dossier_id, audience.date_prevue, audience.type_audience) in existants:
+            erreurs.append("date_prevue : audience déjà enregistrée au dossier")
+        return audience
+
+    def cles(self, objet):
+        return [('date_prevue', objet.dossier_id, objet.date_prevue, objet.type_audience)]
+
+
+class ChargeurDecisions(Chargeur):
+    modele = Decision
+    champs = ('numero_decision', 'type_decision', 'date_decision', 'date_lecture', 'sens_decision', 'dispositif',
+              'motifs', 'est_contradictoire', 'est_executoire')
+    obligatoires = ('numero_rg', 'numero_decision', 'type_decision', 'date_decision', 'sens_decision', 'dispositif')
+    references = {'numero_rg': DOSSIER}
+
+    def existants(self, lignes, ids):
+        numeros = {ligne.donnees.get('numero_decision') for ligne in lignes}
+        dossiers = {ref['numero_rg'] for ref in ids}
+        decisions = Decision.objects.filter(Q(numero_decision__in=numeros) | Q(dossier_id__in=dossiers))
+        deja = decisions.values_list('numero_decision', 'dossier_id')
+        return {numero for numero, dossier in deja}, {dossier for numero, dossier in deja}
+
+    def construire(self, donnees, valeurs, ids, existants, erreurs):
+        numeros, dossiers = existants
+        if valeurs.get('numero_decision') in numeros:
+            erreurs.append(f"numero_decision : la décision {valeurs['numero_decision']} existe déjà")
+        if ids['numero_rg'] in dossiers:
+            erreurs.append("numero_rg : le dossier a déjà une décision")
+        return Decision(dossier_id=ids['numero_rg'], **valeurs)
+
+    def cles(self, objet):
+        return [('numero_decision', objet.numero_decision), ('numero_rg', objet.dossier_id)]
+
+
+CHARGEURS = {
+    'DOSSIER': ChargeurDossiers(),
+    'PARTIE': ChargeurParties(),
+    'AUDIENCE': ChargeurAudiences(),
+    'DECISION': ChargeurDecisions(),
+}
+
+
+def mettre_en_attente(import_registre, lignes, taille=2000):
+    """Recopie les lignes lues dans la table d'attente, par lots ; renvoie leur nombre"""
+    lignes, total = iter(lignes), 0
+    while lot := list(islice(lignes, taille)):
+        LigneImport.objects.bulk_create([
+            LigneImport(import_registre=import_registre, numero=numero, donnees=donnees) for numero, donnees in lot
+        ])
+        total += len(lot)
+    import_registre.lignes += total
+    import_registre.save(update_fields=['lignes', 'date_modification'])
+    return total
+
+
+def lots(import_registre, etat, taille):
+    """Lots des lignes dans l'état ``etat``, dans l'ordre du fichier (pagination sur le numéro de ligne)"""
+    apres = 0
+    while True:
+        lot = list(import_registre.lignes_import.filter(etat=etat, numero__gt=apres).order_by('numero')[:taille])
+        if not lot:
+            return
+        yield lot
+        apres = lot[-1].numero
+
+
+def compter(import_registre, etat):
+    decompte = dict(import_registre.lignes_import.order_by().values('etat').annotate(
+        nombre=Count('id')).values_list('etat', 'nombre'))
+    import_registre.etat = etat
+    import_registre.rejetees = decompte.get('REJETEE', 0)
+    import_registre.importees = decompte.get('IMPORTEE', 0)
+    import_registre.save(update_fields=['etat', 'rejetees', 'importees', 'date_modification'])
+
+
+def classer(import_registre, lot, preparees, etat, suivant, **valeurs):
+    """Enregistre l'issue d'un lot ; renvoie le nombre de lignes rejetées.
+
+    Seules les lignes rejetées, qui ont chacune leurs erreurs, sont mises à
+    jour une à une ; les autres passent à ``suivant`` en un seul UPDATE sur
+    la plage de numéros du lot.
+    """
+    now = timezone.now()
+    rejetees = []
+    for ligne, erreurs, objet in preparees:
+        if erreurs:
+            ligne.etat, ligne.erreurs, ligne.date_modification = 'REJETEE', erreurs, now
+            rejetees.append(ligne)
+    LigneImport.objects.bulk_update(rejetees, ['etat', 'erreurs', 'date_modification'], batch_size=200)
+    import_registre.lignes_import.filter(etat=etat, numero__range=(lot[0].numero, lot[-1].numero)).update(
+        etat=suivant, date_modification=now, **valeurs)
+    return len(rejetees)
+
+
+def valider(import_registre, taille=2000):
+    """Contrôle les lignes en attente de l'import ; renvoie le nombre de lignes rejetées"""
+    chargeur = CHARGEURS[import_registre.type_donnees]
+    vus, rejetees = set(), 0
+    for lot in lots(import_registre, 'A_VALIDER', taille):
+        rejetees += classer(import_registre, lot, chargeur.preparer(lot, vus), 'A_VALIDER', 'VALIDE')
+    compter(import_registre, 'VALIDE')
+    return rejetees
+
+
+def charger(import_registre, taille=2000):
+    """Crée les objets des lignes valides, une transaction par lot ; renvoie le nombre d'objets créés"""
+    chargeur = CHARGEURS[import_registre.type_donnees]
+    vus, magistrats, crees = set(), set(), 0
+    for lot in lots(import_registre, 'VALIDE', taille):
+        with transaction.atomic():
+            preparees = chargeur.preparer(lot, vus)
+            objets = [objet for ligne, erreurs, objet in preparees if not erreurs]
+            if objets:
+                chargeur.enregistrer(objets)
+            classer(import_registre, lot, preparees, 'VALIDE', 'IMPORTEE', objet_id=F('id'))
+        magistrats |= chargeur.magistrats(objets)
+        crees += len(objets)
+    if magistrats:
+        charges.recalculer_magistrats(magistrats)
+    compter(import_registre, 'TERMINE')
+    return crees
+
+
+def importer(type_donnees, chemin, taille=2000, cree_par_id=None):
+    """Importe un fichier de bout en bout ; renvoie l'import et ses décomptes"""
+    lignes = lire(chemin)
+    import_registre = ImportRegistre.objects.create(type_donnees=type_donnees, fichier=Path(chemin).name,
+                                                    cree_par_id=cree_par_id)
+    mettre_en_attente(import_registre, lignes, taille)
+    valider(import_registre, taille)
+    charger(import_registre, taille)
+    return import_registre
+
+
+def rapport(import_registre, sortie):
+    """Écrit en CSV les lignes rejetées de l'import, avec leurs erreurs et leurs colonnes d'origine"""
+    writer = None
+    for lot in lots(import_registre, 'REJETEE', 2000):
+        for ligne in lot:
+            if writer is None:
+                writer = csv.DictWriter(sortie, ['ligne', 'erreurs', *ligne.donnees], extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow({'ligne': ligne.numero, 'erreurs': ' | '.join(ligne.erreurs), **ligne.donnees})
@@ -0,0 +1,119 @@
+"""Chaîne de possession des scellés.
+
+Chaque transfert ajoute une ligne :class:`~core.models.MouvementScelle` —
+jamais modifiée ni supprimée — dont l'empreinte SHA-256 couvre son contenu
+et l'empreinte du mouvement précédent : altérer ou retirer un mouvement
+rompt la chaîne, ce que :func:`verifier` détecte. Le rang est unique par
+scellé, si bien que deux transferts concurrents ne peuvent pas tous deux
+prolonger la même chaîne.
+
+``Scelle.lieu_conservation`` est la projection du dernier mouvement, avec
+son rang et son empreinte : un transfert n'a pas à relire l'historique, et
+l'inventaire d'un lieu est une lecture indexée de la table des scellés.
+"""
+import hashlib
+import json
+from itertools import groupby
+from operator import attrgetter
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .acces import TOUT
+from .models import MouvementScelle, Scelle
+
+
+GENESE = '0' * 64
+
+
+def empreinte(scelle_id, rang, lieu_depart, lieu_arrivee, motif, observations, effectue_par_id, date_mouvement,
+              precedente):
+    """Empreinte d'un mouvement ; le format est figé, les mouvements déjà enregistrés en dépendent"""
+    contenu = json.dumps([
+        str(scelle_id), rang, lieu_depart, lieu_arrivee, motif, observations, effectue_par_id,
+        date_mouvement.isoformat(), precedente,
+    ], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(contenu.encode()).hexdigest()
+
+
+def empreinte_mouvement(mouvement):
+    return empreinte(mouvement.scelle_id, mouvement.rang, mouvement.lieu_depart, mouvement.lieu_arrivee,
+                     mouvement.motif, mouvement.observations, mouvement.effectue_par_id, mouvement.date_mouvement,
+                     mouvement.empreinte_precedente)
+
+
+def transferer(queryset, lieu, motif, observations='', effectue_par_id=None):
+    """Transfère vers ``lieu`` les scellés de ``queryset`` qui n'y sont pas déjà ; renvoie les mouvements"""
+    now = timezone.now()
+    with transaction.atomic():
+        scelles = list(queryset.select_for_update().order_by('pk').only(
+            'pk', 'lieu_conservation', 'rang_chaine', 'empreinte_chaine'))
+        mouvements, modifies = [], []
+        for scelle in scelles:
+            if scelle.lieu_conservation == lieu:
+                continue
+            mouvement = MouvementScelle(
+                scelle_id=scelle.pk, rang=scelle.rang_chaine + 1, lieu_depart=scelle.lieu_conservation,
+                lieu_arrivee=lieu, motif=motif, observations=observations, effectue_par_id=effectue_par_id,
+                date_mouvement=now, empreinte_precedente=scelle.empreinte_chaine or GENESE,
+            )
+            mouvement.empreinte = empreinte_mouvement(mouvement)
+            mouvements.append(mouvement)
+            scelle.lieu_conservation, scelle.rang_chaine = lieu, mouvement.rang
+            scelle.empreinte_chaine, scelle.date_modification = mouvement.empreinte, now
+            modifies.append(scelle)
+        # Un rang déjà pris (transfert concurrent) fait échouer l'ensemble
+        MouvementScelle.objects.bulk_create(mouvements)
+        Scelle.objects.bulk_update(modifies, ['lieu_conservation', 'rang_chaine', 'empreinte_chaine',
+                                              'date_modification'])
+    return mouvements
+
+
+def transferer_dossier(dossier_id, lieu, motif, acces=TOUT, **kwargs):
+    """Transfère en une opération tous les scellés actifs du dossier"""
+    return transferer(Scelle.objects.visibles(acces).filter(dossier_id=dossier_id, est_actif=True), lieu, motif,
+                      **kwargs)
+
+
+def rupture(scelle, mouvements):
+    """Rang du premier mouvement en cause dans la chaîne de ``scelle`` ; ``None`` si elle est intacte.
+
+    ``mouvements`` sont ceux du scellé par rang croissant : la chaîne doit
+    être continue depuis le rang 1, chaque empreinte exacte et la projection
+    du scellé conforme au dernier mouvement.
+    """
+    rang, precedente, lieu = 0, GENESE, scelle.lieu_conservation
+    for mouvement in mouvements:
+        if (mouvement.rang != rang + 1 or mouvement.empreinte_precedente != precedente
+                or mouvement.empreinte != empreinte_mouvement(mouvement)):
+            return mouvement.rang
+        rang, precedente, lieu = mouvement.rang, mouvement.empreinte, mouvement.lieu_arrivee
+    if (scelle.rang_chaine, scelle.empreinte_chaine or GENESE, scelle.lieu_conservation) != (rang, precedente, lieu):
+        return rang + 1
+    return None
+
+
+def verifier(queryset=None):
+    """``{scellé: rang}`` des chaînes rompues parmi ``queryset`` (tous les scellés par défaut), en deux requêtes"""
+    queryset = Scelle.objects.all() if queryset is None else queryset
+    scelles = {scelle.pk: scelle for scelle in queryset.only('pk', 'lieu_conservation', 'rang_chaine',
+                                                               'empreinte_chaine')}
+    mouvements = MouvementScelle.objects.filter(scelle__in=queryset).order_by('scelle', 'rang').iterator()
+    groupes = {pk: list(groupe) for pk, groupe in groupby(mouvements, key=attrgetter('scelle_id'))}
+    ruptures = {pk: rupture(scelle, groupes.get(pk, [])) for pk, scelle in scelles.items()}
+    return {pk: rang for pk, rang in ruptures.items() if rang is not None}
+
+
+def inventaire(lieu, acces=TOUT):
+    """Scellés actifs conservés à ``lieu``, par dossier puis numéro"""
+    return Scelle.objects.visibles(acces).filter(lieu_conservation=lieu, est_actif=True).order_by(
+        'dossier__numero_rg', 'numero_scelle',
+    ).values('id', 'numero_scelle', 'type_scelle', 'description', 'date_saisie', 'dossier_id', 'dossier__numero_rg',
+             'rang_chaine')
+
+
+def lieux(acces=TOUT):
+    """Nombre de scellés actifs par lieu de conservation"""
+    return Scelle.objects.visibles(acces).filter(est_actif=True).values('lieu_conservation').annotate(
+        scelles=Count('id')).order_by('lieu_conservation')
@@ -1,34 +1,12 @@
-import uuid
 from rest_framework import serializers
 from .models import (
     Tribunal, Parquet, Magistrat, Avocat, Partie, NatureAffaire, Dossier,
     PartieAuDossier, Audience, PieceJointe, Note, Frais, RequisitionParquet,
     ProcedureEnquete, Classement, AlternativePoursuites,
-    Attribution, VoieRecours, Decision, Scelle
+    Attribution, VoieRecours, Decision, Scelle, Calendrier
 )
 
 from django.contrib.auth.models import User
-from django.db import models
-
-
-class Calendrier(models.Model): # Placeholder if not fully defined in models.py
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    date_creation = models.DateTimeField(auto_now_add=True)
-    date_modification = models.DateTimeField(auto_now=True)
-    est_actif = models.BooleanField(default=True)
-    date = models.DateField()
-    tribunal = models.ForeignKey(Tribunal, on_delete=models.CASCADE)
-    magistrat = models.ForeignKey(Magistrat, on_delete=models.CASCADE, related_name='alternatives_as_magistrat_calendar_custom') # custom to avoid conflict
-    est_disponible = models.BooleanField(default=True)
-    observations = models.TextField(blank=True)
-
-    class Meta:
-        unique_together = ['date', 'tribunal', 'magistrat']
-        verbose_name = "Calendrier"
-        verbose_name_plural = "Calendriers"
-
-    def __str__(self):
-        return f"{self.tribunal.nom} - {self.magistrat.utilisateur.get_full_name()} - {self.date}"
 
 
 # User serializer
@@ -94,6 +72,8 @@ class DossierSerializer(serializers.ModelSerializer):
         model = Dossier
         fields = '__all__'
         read_only_fields = ('id', 'date_creation', 'date_modification')
+        # Omis à la création : attribué par core.numeros
+        extra_kwargs = {'numero_rg': {'required': False}}
 
 class PartieAuDossierSerializer(serializers.ModelSerializer):
     dossier_details = DossierSerializer(source='dossier', read_only=True)
@@ -255,6 +235,7 @@ class DecisionSerializer(serializers.ModelSerializer):
         model = Decision
         fields = '__all__'
         read_only_fields = ('id', 'date_creation', 'date_modification')
+        extra_kwargs = {'numero_decision': {'required': False}}
 
 class ScelleSerializer(serializers.ModelSerializer):
     dossier_details = DossierSerializer(source='dossier', read_only=True)
@@ -263,4 +244,6 @@ class ScelleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Scelle
         fields = '__all__'
-        read_only_fields = ('id', 'date_creation', 'date_modification')
+        # Le lieu ne change que par un mouvement (core.scelles.transferer)
+        read_only_fields = ('id', 'date_creation', 'date_modification', 'lieu_conservation', 'rang_chaine',
+                            'empreinte_chaine')
@@ -0,0 +1,160 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import acces, charges, choices, events, jetons, numeros, parties, recours
+from .models import (
+    Attribution, Audience, Avocat, Decision, Dossier, Magistrat, NatureAffaire, Note, PartieAuDossier, Tribunal,
+    VoieRecours,
+)
+
+
+def dossier_scope(instance):
+    """(tribunal, confidentialité) du dossier d'un objet, sans recharger un dossier déjà en cache"""
+    if instance._meta.get_field('dossier').is_cached(instance):
+        return instance.dossier.tribunal_id, instance.dossier.est_confidentiel
+    scope = Dossier.objects.filter(pk=instance.dossier_id).values_list('tribunal_id', 'est_confidentiel')
+    return scope.first() or (None, True)
+
+
+def operation(instance, created=False, deleted=False):
+    if deleted or not instance.est_actif:
+        return 'delete'
+    return 'create' if created else 'update'
+
+
+def broadcast(tribunal_id, event):
+    # Diffusé après validation : les clients ne voient jamais un état annulé
+    transaction.on_commit(partial(events.publish, tribunal_id, event))
+
+
+@receiver(post_save, sender=Dossier)
+@receiver(post_delete, sender=Dossier)
+def diffuser_dossier(sender, instance, created=False, raw=False, **kwargs):
+    if raw or instance.est_confidentiel:
+        return
+    deleted = kwargs['signal'] is post_delete
+    broadcast(instance.tribunal_id, events.dossier_event(instance, operation(instance, created, deleted)))
+
+
+@receiver(post_save, sender=Audience)
+@receiver(post_delete, sender=Audience)
+def diffuser_audience(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not instance.est_publique:
+        return
+    tribunal_id, confidentiel = dossier_scope(instance)
+    if not confidentiel:
+        deleted = kwargs['signal'] is post_delete
+        broadcast(tribunal_id, events.audience_event(instance, operation(instance, created, deleted)))
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def diffuser_note(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not instance.est_publique:
+        return
+    tribunal_id, confidentiel = dossier_scope(instance)
+    if not confidentiel:
+        deleted = kwargs['signal'] is post_delete
+        broadcast(tribunal_id, events.note_event(instance, operation(instance, created, deleted)))
+
+
+@receiver(post_save, sender=NatureAffaire)
+@receiver(post_delete, sender=NatureAffaire)
+@receiver(post_save, sender=Tribunal)
+@receiver(post_delete, sender=Tribunal)
+def invalider_choix(sender, **kwargs):
+    transaction.on_commit(choices.invalidate)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Magistrat)
+@receiver(post_delete, sender=Magistrat)
+@receiver(post_save, sender=Avocat)
+@receiver(post_delete, sender=Avocat)
+def invalider_acces(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.utilisateur_id
+    transaction.on_commit(partial(acces.invalider, user_id))
+    if sender is not User or not instance.is_active:
+        # Les jetons déjà émis portent l'ancien profil
+        transaction.on_commit(partial(jetons.revoquer_utilisateur, user_id))
+
+
+# Numéros de registre laissés vides à la création : attribués par core.numeros
+@receiver(pre_save, sender=Dossier)
+def numeroter_dossier(sender, instance, raw=False, **kwargs):
+    if not raw and instance._state.adding and not instance.numero_rg:
+        instance.numero_rg = numeros.numero_rg(instance.tribunal_id, instance.date_enregistrement.year)
+
+
+@receiver(pre_save, sender=Decision)
+def numeroter_decision(sender, instance, raw=False, **kwargs):
+    if not raw and instance._state.adding and not instance.numero_decision:
+        tribunal_id = Dossier.objects.filter(pk=instance.dossier_id).values_list('tribunal_id', flat=True).get()
+        instance.numero_decision = numeros.numero_decision(tribunal_id, instance.date_decision.year)
+
+
+# Index de charge : les valeurs d'avant sauvegarde désignent les anciens titulaires
+SUIVI_CHARGE = {
+    Dossier: ('magistrat_siege_id', 'magistrat_parquet_id'),
+    Audience: ('magistrat_id',),
+    Attribution: ('attribue_a_id',),
+}
+
+
+@receiver(pre_save, sender=Dossier)
+@receiver(pre_save, sender=Audience)
+@receiver(pre_save, sender=Attribution)
+def memoriser_titulaires(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    fields = SUIVI_CHARGE[sender]
+    instance._titulaires = sender.objects.filter(pk=instance.pk).values_list(*fields).first() or ()
+
+
+@receiver(post_save, sender=Dossier)
+@receiver(post_delete, sender=Dossier)
+@receiver(post_save, sender=Audience)
+@receiver(post_delete, sender=Audience)
+@receiver(post_save, sender=Attribution)
+@receiver(post_delete, sender=Attribution)
+def actualiser_charges(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    titulaires = {getattr(instance, field) for field in SUIVI_CHARGE[sender]}
+    titulaires.update(getattr(instance, '_titulaires', ()))
+    titulaires.discard(None)
+    if sender is Attribution:
+        transaction.on_commit(partial(charges.recalculer, titulaires))
+    elif sender is Dossier:
+        dossier_id = None if kwargs['signal'] is post_delete else instance.pk
+        transaction.on_commit(partial(charges.recalculer_magistrats, titulaires, dossier_id))
+    elif titulaires:
+        transaction.on_commit(partial(charges.recalculer_magistrats, titulaires))
+
+
+@receiver(post_save, sender=VoieRecours)
+@receiver(post_delete, sender=VoieRecours)
+def reconstruire_fermeture(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Les deux arbres : un recours retiré détache le sous-arbre du dossier de recours
+    for dossier_id in (instance.dossier_origine_id, instance.dossier_recours_id):
+        transaction.on_commit(partial(recours.reconstruire, dossier_id))
+
+
+# Index des parties : mis à jour dans la transaction, comme le serait un trigger
+@receiver(post_save, sender=PartieAuDossier)
+def indexer_lien(sender, instance, raw=False, **kwargs):
+    if not raw:
+        parties.indexer([instance.pk])
+
+
+@receiver(post_save, sender=Dossier)
+def indexer_dossier(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        parties.actualiser_dossier(instance)
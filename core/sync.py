@@ -0,0 +1,98 @@
+"""Synchronisation incrémentale pour les clients hors ligne.
+
+Le client conserve un filigrane opaque qui encode, pour chaque modèle, la
+position ``(date_modification, id)`` du dernier changement reçu. Chaque appel
+renvoie les lignes modifiées depuis, par lots, et les identifiants des lignes
+désactivées (``est_actif=False``) en guise de pierres tombales. Les lignes
+que l'utilisateur ne peut pas voir (voir :mod:`core.acces`) sont elles aussi
+renvoyées comme pierres tombales : un dossier devenu confidentiel disparaît
+ainsi du poste d'un utilisateur qui n'y a pas accès.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+
+from .acces import TOUT
+from .models import (
+    Tribunal, Parquet, Magistrat, Avocat, Partie, NatureAffaire, Dossier,
+    PartieAuDossier, Audience, PieceJointe, Note, Frais, PaiementFrais, RequisitionParquet,
+    ProcedureEnquete, Classement, AlternativePoursuites,
+    Attribution, VoieRecours, Decision, Scelle, MouvementScelle
+)
+
+
+# Ordre des références : un client qui applique les lots dans cet ordre
+# reçoit les lignes référencées avant celles qui les référencent.
+SYNC_MODELS = {model._meta.model_name: model for model in [
+    Tribunal, Parquet, Magistrat, Avocat, Partie, NatureAffaire, Dossier,
+    PartieAuDossier, Audience, PieceJointe, Note, Frais, PaiementFrais, RequisitionParquet,
+    ProcedureEnquete, Classement, AlternativePoursuites,
+    Attribution, VoieRecours, Decision, Scelle, MouvementScelle,
+]}
+
+
+class InvalidWatermark(ValueError):
+    pass
+
+
+def encode_watermark(cursors):
+    payload = {name: [moment.isoformat(), str(pk)] for name, (moment, pk) in cursors.items()}
+    raw = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_watermark(token):
+    if not token:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return {name: (datetime.fromisoformat(moment), pk)
+                for name, (moment, pk) in json.loads(raw).items() if name in SYNC_MODELS}
+    except (ValueError, TypeError) as exc:
+        raise InvalidWatermark("Filigrane de synchronisation invalide") from exc
+
+
+def changes_since(cursors, limit, names=None, acces=TOUT):
+    """Lignes modifiées après chaque curseur, au plus ``limit`` par modèle.
+
+    Les changements des dernières ``SYNC_SETTLE_SECONDS`` sont différés au
+    prochain appel : une transaction encore en cours pourrait y valider une
+    ligne datée d'avant le filigrane renvoyé.
+    """
+    until = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    changes, deleted, complete = {}, {}, True
+    cursors = dict(cursors)
+    for name in names or SYNC_MODELS:
+        model = SYNC_MODELS[name]
+        queryset = model.objects.filter(date_modification__lte=until)
+        if name in cursors:
+            moment, pk = cursors[name]
+            queryset = queryset.filter(
+                Q(date_modification__gt=moment) | Q(date_modification=moment, pk__gt=pk)
+            )
+        fields = [field.attname for field in model._meta.concrete_fields]
+        filtre = acces.filtre(model)
+        if filtre:
+            queryset = queryset.annotate(visible=ExpressionWrapper(filtre, output_field=BooleanField()))
+            fields.append('visible')
+        rows = list(queryset.order_by('date_modification', 'pk').values(*fields)[:limit])
+        if not rows:
+            continue
+        if len(rows) == limit:
+            complete = False
+        cursors[name] = (rows[-1]['date_modification'], rows[-1]['id'])
+        for row in rows:
+            if not row.pop('visible', True):
+                row['est_actif'] = False
+        changes[name] = [row for row in rows if row['est_actif']]
+        deleted[name] = [row['id'] for row in rows if not row['est_actif']]
+    return {
+        'changes': {name: rows for name, rows in changes.items() if rows},
+        'deleted': {name: ids for name, ids in deleted.items() if ids},
+        'watermark': encode_watermark(cursors),
+        'complete': complete,
+    }
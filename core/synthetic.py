@@ -0,0 +1,285 @@
+"""Génération de données judiciaires synthétiques pour les tests et benchmarks.
+
+Les volumes suivent l'organisation réelle d'un ressort : chaque tribunal a ses
+parquets et magistrats, et des dossiers dont le nombre de parties, d'audiences,
+de pièces et de frais suit des distributions plausibles. Les états sont
+cohérents avec les dates (audiences passées terminées, décisions pour les
+dossiers jugés, frais en retard après échéance).
+"""
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import parties as parties_index
+from .models import (
+    Tribunal, Parquet, Magistrat, Avocat, Partie, NatureAffaire, Dossier,
+    PartieAuDossier, Audience, PieceJointe, Note, Frais, Decision,
+)
+
+
+NATURES = [
+    ('CIV-CONT', "Contentieux civil", 'CIVILE'),
+    ('CIV-FAM', "Affaires familiales", 'CIVILE'),
+    ('CIV-FONC', "Litiges fonciers", 'CIVILE'),
+    ('PEN-DEL', "Délits", 'PENALE'),
+    ('PEN-CRIM', "Crimes", 'PENALE'),
+    ('PEN-FLAG', "Flagrance", 'PENALE'),
+    ('COM-LIT', "Litiges commerciaux", 'COMMERCIALE'),
+    ('COM-PROC', "Procédures collectives", 'COMMERCIALE'),
+    ('ADM-REC', "Recours administratifs", 'ADMINISTRATIVE'),
+    ('SOC-TRAV', "Conflits du travail", 'SOCIALE'),
+]
+
+VILLES = ["Kinshasa", "Lubumbashi", "Goma", "Bukavu", "Kisangani", "Matadi",
+          "Kananga", "Mbuji-Mayi", "Kolwezi", "Bunia", "Kindu", "Mbandaka"]
+
+PRENOMS = ["Jean", "Marie", "Joseph", "Pierre", "Grace", "Patrick", "Esther", "Paul",
+           "Chantal", "Didier", "Ruth", "Emmanuel", "Nadine", "Olivier", "Sarah", "Éric"]
+
+NOMS = ["Kabila", "Mukendi", "Tshibangu", "Kalala", "Mbuyi", "Ilunga", "Kasongo",
+        "Lukusa", "Mwamba", "Ngoy", "Banza", "Kazadi", "Mutombo", "Nzuzi", "Lumbu"]
+
+FORMES = ["SARL", "SA", "SAS", "ASBL", "SNC"]
+
+# Poids des états d'un dossier (un registre compte surtout des dossiers en cours)
+ETATS_DOSSIER = [
+    ('ENREGISTRE', 18), ('INSTRUCTION', 14), ('MISE_EN_ETAT', 14), ('PRET_PLAIDOIRIE', 8),
+    ('EN_DELIBERE', 6), ('JUGE', 15), ('CLOS', 12), ('RADIE', 3), ('DESISTEMENT', 2),
+    ('APPEL', 3), ('POURVOI', 1), ('CLASSE_SANS_SUITE', 2), ('RENVOI_CORRECTIONNEL', 1),
+    ('RENVOI_ASSISES', 1),
+]
+ETATS_JUGES = {'JUGE', 'CLOS', 'APPEL', 'POURVOI'}
+
+URGENCES = [('NORMALE', 80), ('URGENTE', 10), ('TRES_URGENTE', 4), ('REFERE', 4),
+            ('FLAGRANT_DELIT', 2)]
+
+MONTANTS_FRAIS = {
+    'DROIT_GREFFE': (10, 150), 'TIMBRE_FISCAL': (5, 50), 'CONSIGNATION': (100, 2000),
+    'EXPERTISE': (200, 5000), 'SIGNIFICATION': (20, 200), 'AMENDE': (50, 10000),
+    'DOMMAGES_INTERETS': (500, 50000), 'DEPENS': (50, 1500), 'AUTRE': (10, 500),
+}
+
+
+@dataclass(frozen=True)
+class Volumes:
+    """Volumes générés ; ``at_scale`` multiplie les tribunaux et dossiers"""
+    tribunaux: int = 4
+    dossiers_par_tribunal: int = 250
+    magistrats_par_tribunal: int = 8
+    avocats: int = 60
+
+    @classmethod
+    def at_scale(cls, scale):
+        return cls(
+            tribunaux=max(1, round(cls.tribunaux * scale)),
+            dossiers_par_tribunal=max(1, round(cls.dossiers_par_tribunal * scale)),
+            magistrats_par_tribunal=cls.magistrats_par_tribunal,
+            avocats=max(4, round(cls.avocats * scale)),
+        )
+
+
+class Generator:
+    """Génère un jeu de données complet, reproductible pour une graine donnée"""
+
+    def __init__(self, volumes=None, seed=0, batch_size=1000, today=None):
+        self.volumes = volumes or Volumes()
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.today = today or timezone.localdate()
+        # Suffixe propre à l'exécution : permet d'alimenter une base déjà peuplée
+        self.tag = uuid.UUID(int=self.random.getrandbits(128)).hex[:6]
+        self.counts = {}
+
+    def weighted(self, choices):
+        values, weights = zip(*choices)
+        return self.random.choices(values, weights)[0]
+
+    def day_offset(self, low, high):
+        return self.today + timedelta(days=self.random.randint(low, high))
+
+    def bulk(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(objects)
+        return objects
+
+    @transaction.atomic
+    def run(self):
+        natures = self.natures()
+        avocats = self.avocats()
+        for index in range(self.volumes.tribunaux):
+            tribunal, parquets, siege, parquet_magistrats = self.tribunal(index)
+            self.dossiers(index, tribunal, parquets, siege, parquet_magistrats, natures, avocats)
+        return self.counts
+
+    def natures(self):
+        existing = {nature.code: nature for nature in NatureAffaire.objects.all()}
+        missing = [NatureAffaire(code=code, nom=nom, matiere=matiere)
+                   for code, nom, matiere in NATURES if code not in existing]
+        self.bulk(NatureAffaire, missing)
+        return list(existing.values()) + missing
+
+    def users(self, prefix, count):
+        users = [User(username=f"{prefix}-{self.tag}-{n}", first_name=self.random.choice(PRENOMS),
+                      last_name=self.random.choice(NOMS), password='!')
+                 for n in range(count)]
+        return self.bulk(User, users)
+
+    def avocats(self):
+        users = self.users('avocat', self.volumes.avocats)
+        return self.bulk(Avocat, [
+            Avocat(utilisateur=user, numero_barreau=f"B-{self.tag}-{n:05d}",
+                   cabinet=f"Cabinet {user.last_name}", telephone=f"+24381{n:07d}",
+                   adresse=f"{n} avenue du Palais, {self.random.choice(VILLES)}",
+                   date_serment=self.day_offset(-365 * 30, -365),
+                   barreau=f"Barreau de {self.random.choice(VILLES)}")
+            for n, user in enumerate(users)
+        ])
+
+    def tribunal(self, index):
+        ville = VILLES[index % len(VILLES)]
+        type_tribunal = self.weighted([('TGI', 5), ('TRIPAIX', 4), ('COUR_APPEL', 1),
+                                       ('TRIBUNAL_COMMERCE', 1), ('TRIBUNAL_DU_TRAVAIL', 1)])
+        label = dict(Tribunal.TYPES_TRIBUNAL)[type_tribunal]
+        tribunal = self.bulk(Tribunal, [Tribunal(
+            nom=f"{label} de {ville} {index + 1}", type_tribunal=type_tribunal,
+            juridiction=ville, adresse=f"Palais de justice, {ville}",
+        )])[0]
+        parquets = self.bulk(Parquet, [
+            Parquet(nom=f"Parquet {n + 1} de {ville}", tribunal=tribunal,
+                    type_parquet=self.random.choice(['PGI', 'PPTP']),
+                    adresse=f"Palais de justice, {ville}", competence_territoriale=ville)
+            for n in range(self.random.randint(1, 2))
+        ])
+        count = self.volumes.magistrats_par_tribunal
+        users = self.users(f"magistrat-{index}", count)
+        magistrats = []
+        for n, user in enumerate(users):
+            du_parquet = n % 3 == 2
+            magistrats.append(Magistrat(
+                utilisateur=user, numero_employe=f"M-{self.tag}-{index}-{n:04d}",
+                type_magistrat='PARQUET' if du_parquet else 'SIEGE', tribunal=tribunal,
+                parquet=self.random.choice(parquets) if du_parquet else None,
+                date_nomination=self.day_offset(-365 * 25, -30),
+                grade_siege='' if du_parquet else self.random.choice(['JUGE', 'JUGE', 'PRESIDENT_CHAMBRE']),
+                grade_parquet='SUBSTITUT' if du_parquet else '',
+            ))
+        self.bulk(Magistrat, magistrats)
+        siege = [m for m in magistrats if m.type_magistrat == 'SIEGE']
+        parquet_magistrats = [m for m in magistrats if m.type_magistrat == 'PARQUET']
+        return tribunal, parquets, siege, parquet_magistrats
+
+    def partie(self):
+        if self.random.random() < 0.2:
+            nom = self.random.choice(NOMS)
+            forme = self.random.choice(FORMES)
+            return Partie(prenom='', nom=nom, raison_sociale=f"{nom} {forme}",
+                          forme_juridique=forme, est_personne_morale=True,
+                          numero_identification=f"RCCM-{self.random.randint(10000, 99999)}",
+                          adresse=f"{self.random.randint(1, 500)} boulevard du 30 Juin")
+        return Partie(prenom=self.random.choice(PRENOMS), nom=self.random.choice(NOMS),
+                      date_naissance=self.day_offset(-365 * 80, -365 * 18),
+                      lieu_naissance=self.random.choice(VILLES),
+                      adresse=f"{self.random.randint(1, 500)} avenue {self.random.choice(NOMS)}")
+
+    def dossiers(self, index, tribunal, parquets, siege, parquet_magistrats, natures, avocats):
+        dossiers, liens, parties, audiences, pieces, notes, frais, decisions = ([] for _ in range(8))
+        for n in range(self.volumes.dossiers_par_tribunal):
+            nature = self.random.choice(natures)
+            penal = nature.matiere == 'PENALE'
+            etat = self.weighted(ETATS_DOSSIER)
+            enregistrement = self.day_offset(-365 * 4, 0)
+            dossier = Dossier(
+                numero_rg=f"RG/{self.tag}/{index}/{enregistrement.year}/{n:06d}",
+                numero_parquet=f"RMP/{n:06d}" if penal else '',
+                intitule=f"Affaire {self.random.choice(NOMS)} c/ {self.random.choice(NOMS)}",
+                objet_litige=nature.nom, nature_affaire=nature, tribunal=tribunal,
+                parquet=self.random.choice(parquets) if penal else None,
+                magistrat_siege=self.random.choice(siege) if siege else None,
+                magistrat_parquet=self.random.choice(parquet_magistrats) if penal and parquet_magistrats else None,
+                etat=etat, urgence=self.weighted(URGENCES), date_enregistrement=enregistrement,
+                date_cloture=self.day_offset(-30, 0) if etat == 'CLOS' else None,
+                chambre=f"{self.random.randint(1, 4)}e chambre",
+                est_confidentiel=self.random.random() < 0.05,
+            )
+            dossiers.append(dossier)
+
+            qualites = ['PREVENU', 'PARTIE_CIVILE'] if penal else ['DEMANDEUR', 'DEFENDEUR']
+            for qualite in qualites + ['TEMOIN'] * self.random.choice([0, 0, 0, 1, 2]):
+                partie = self.partie()
+                parties.append(partie)
+                liens.append(PartieAuDossier(
+                    dossier=dossier, partie=partie, qualite=qualite,
+                    avocat=self.random.choice(avocats) if qualite != 'TEMOIN' and self.random.random() < 0.7 else None,
+                    date_constitution=enregistrement))
+
+            juge = etat in ETATS_JUGES
+            for k in range(min(int(self.random.expovariate(1 / 3)), 12)):
+                jour = enregistrement + timedelta(days=30 * (k + 1) + self.random.randint(-5, 5))
+                passee = jour < self.today
+                audiences.append(Audience(
+                    dossier=dossier, magistrat=dossier.magistrat_siege or self.random.choice(siege),
+                    type_audience=self.random.choice(['MISE_EN_ETAT', 'PLAIDOIRIE', 'RENVOI', 'APPEL_CAUSE']),
+                    date_prevue=timezone.make_aware(datetime.combine(jour, time(self.random.randint(8, 15)))),
+                    salle=f"Salle {self.random.randint(1, 6)}",
+                    etat=self.weighted([('TERMINEE', 80), ('REPORTEE', 15), ('ANNULEE', 5)]) if passee else 'PROGRAMMEE',
+                    est_publique=not dossier.est_confidentiel,
+                ))
+
+            for k in range(self.random.randint(0, 5)):
+                type_piece = self.random.choice(['ASSIGNATION', 'CONCLUSIONS', 'PIECE_COMMUNICATION', 'REQUETE'])
+                pieces.append(PieceJointe(
+                    dossier=dossier, titre=f"{dict(PieceJointe.TYPES_PIECE)[type_piece]} {k + 1}",
+                    type_piece=type_piece, fichier=f"pieces_dossier/{dossier.id}/{k + 1}.pdf",
+                    numero_piece=str(k + 1), est_confidentielle=self.random.random() < 0.05))
+
+            for _ in range(self.random.choice([0, 0, 1, 1, 2])):
+                notes.append(Note(dossier=dossier, contenu="Observation du greffe.",
+                                  est_publique=self.random.random() < 0.3))
+
+            for _ in range(self.random.randint(1, 3)):
+                type_frais = self.random.choice(list(MONTANTS_FRAIS))
+                montant = Decimal(self.random.randint(*MONTANTS_FRAIS[type_frais]))
+                echeance = enregistrement + timedelta(days=self.random.choice([15, 30, 60, 90]))
+                paye = self.weighted([(montant, 55), (Decimal(0), 35), ((montant / 2).quantize(Decimal('1')), 10)])
+                if paye == montant:
+                    etat_frais = 'PAYE'
+                elif echeance < self.today:
+                    etat_frais = 'EN_RETARD'
+                else:
+                    etat_frais = 'PARTIEL' if paye else 'A_PAYER'
+                frais.append(Frais(
+                    dossier=dossier, type_frais=type_frais, montant=montant, montant_paye=paye,
+                    date_echeance=echeance, etat=etat_frais,
+                    date_paiement=min(echeance, self.today) if etat_frais == 'PAYE' else None))
+
+            if juge:
+                jour = min(enregistrement + timedelta(days=self.random.randint(60, 500)), self.today)
+                decisions.append(Decision(
+                    dossier=dossier, type_decision='JUGEMENT' if tribunal.type_tribunal != 'COUR_APPEL' else 'ARRET',
+                    numero_decision=f"D/{self.tag}/{index}/{n:06d}", date_decision=jour,
+                    date_lecture=jour, sens_decision=self.weighted(
+                        [('ACCUEIL', 40), ('REJET', 30), ('PARTIEL', 25), ('IRRECEVABLE', 5)]),
+                    dispositif="Par ces motifs, statuant publiquement…",
+                    motifs="Attendu que…", est_executoire=self.random.random() < 0.6))
+
+        self.bulk(Dossier, dossiers)
+        self.bulk(Partie, parties)
+        self.bulk(PartieAuDossier, liens)
+        # bulk_create ne déclenche pas les signaux qui tiennent l'index des parties
+        parties_index.indexer([lien.pk for lien in liens])
+        self.bulk(Audience, audiences)
+        self.bulk(PieceJointe, pieces)
+        self.bulk(Note, notes)
+        self.bulk(Frais, frais)
+        self.bulk(Decision, decisions)
+
+
+def generate(scale=1.0, seed=0, batch_size=1000):
+    """Peuple la base au niveau ``scale`` et renvoie le nombre de lignes par modèle"""
+    return Generator(Volumes.at_scale(scale), seed=seed, batch_size=batch_size).run()
@@ -1,3 +1,1636 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import math
+import tempfile
+import threading
+import zipfile
+from collections import Counter
+from io import BytesIO, StringIO
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, ProtectedError, Q, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from . import (
+    acces, admission, benchmarks, calendrier, charges, choices, compression, convocations, documents, doublons,
+    events, instrumentation, jetons, ledger, numeros, parties, plans, recours, reprise, scelles, sync,
+)
+from .budgets import QueryBudget, QueryBudgetExceeded, QueryCounter, check_budget
+from .db_routers import PrimaryReplicaRouter, read_from_replica
+from .management.commands import nettoyer_audiences
+from .middleware import ReplicaRoutingMiddleware
+from .models import (
+    Attribution, Audience, Avocat, Calendrier, ChargeTravail, Convocation, Decision, DocumentGenere, Dossier, Frais,
+    FusionPartie, ImportRegistre, IndexPartie, JobCheckpoint, Magistrat, MouvementScelle, NatureAffaire, PaiementFrais,
+    Partie, PartieAuDossier, PieceJointe, RegleCalendrier, Scelle, SequenceJudiciaire, StatistiqueTribunal, Tribunal,
+    VoieRecours,
+)
+from .renderers import FastJSONRenderer
+from .serializers import (
+    AudienceSerializer, DossierSerializer, PartieAuDossierSerializer, PieceJointeSerializer, TribunalSerializer,
+)
+from .synthetic import Generator, Volumes
+from .views import TribunalViewSet
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_stay_on_primary_by_default(self):
+        self.assertEqual(self.router.db_for_read(Tribunal), 'default')
+
+    def test_reads_go_to_replica_when_allowed(self):
+        with read_from_replica():
+            self.assertIn(self.router.db_for_read(Tribunal), ['replica1', 'replica2'])
+        self.assertEqual(self.router.db_for_read(Tribunal), 'default')
+
+    def test_writes_and_migrations_target_primary(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_write(Tribunal), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+
+    def dispatch(self, request):
+        seen = {}
+
+        def get_response(request):
+            seen['alias'] = self.router.db_for_read(Tribunal)
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        return ReplicaRoutingMiddleware(get_response)(request), seen['alias']
+
+    def test_eligible_action_reads_from_replica(self):
+        response, alias = self.dispatch(self.factory.get('/api/core/'))
+        self.assertIn(alias, ['replica1', 'replica2'])
+
+    def test_ineligible_view_reads_from_primary(self):
+        response, alias = self.dispatch(self.factory.get('/metrics/'))
+        self.assertEqual(alias, 'default')
+
+    def test_write_pins_client_to_primary(self):
+        response, _ = self.dispatch(self.factory.post('/api/core/'))
+        cookie = response.cookies['bdj_primary']
+        self.assertEqual(cookie['max-age'], 5)
+
+        request = self.factory.get('/api/core/')
+        request.COOKIES['bdj_primary'] = cookie.value
+        response, alias = self.dispatch(request)
+        self.assertEqual(alias, 'default')
+        self.assertNotIn('bdj_primary', response.cookies)
+
+
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        Tribunal.objects.create(nom="TGI Gombe", type_tribunal='TGI',
+                                juridiction="Kinshasa", adresse="Gombe")
+
+    def test_list_within_budget(self):
+        response = self.client.get('/api/core/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.db_counter.queries, 1)
+
+    def test_overrun_fails_in_tests(self):
+        budget = {'list': QueryBudget(max_queries=0)}
+        with mock.patch.object(TribunalViewSet, 'query_budget', budget):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/core/')
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    def test_overrun_is_logged_in_production(self):
+        counter = QueryCounter()
+        counter.queries = 3
+        with self.assertLogs('core.budgets', 'WARNING') as logs:
+            check_budget(QueryBudget(max_queries=2), counter, "GET /api/core/")
+        self.assertIn("3 requêtes (max 2)", logs.output[0])
+
+    @override_settings(DEFAULT_QUERY_BUDGET={'max_queries': 0})
+    def test_default_budget_applies_to_undeclared_actions(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.post('/api/core/', {'nom': "TGI Matete", 'type_tribunal': 'TGI',
+                                            'juridiction': "Kinshasa", 'adresse': "Matete"})
+
+
+@override_settings(
+    INSTRUMENTATION_ENABLED=True,
+    MIDDLEWARE=['core.middleware.InstrumentationMiddleware', *settings.MIDDLEWARE],
+)
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        instrumentation.registry.reset()
+        Tribunal.objects.create(nom="TGI Gombe", type_tribunal='TGI',
+                                juridiction="Kinshasa", adresse="Gombe")
+
+    def test_phases_are_exclusive(self):
+        with instrumentation.track_request() as timings:
+            with instrumentation.phase('serialization'):
+                with instrumentation.phase('db'):
+                    pass
+            durations = timings.breakdown()
+        parts = sum(durations[name] for name in ('db', 'serialization', 'render', 'other'))
+        self.assertAlmostEqual(parts, durations['total'], places=6)
+
+    def test_request_breakdown_is_recorded(self):
+        response = self.client.get('/api/core/')
+        for name in ('db', 'serialization', 'render', 'total'):
+            self.assertIn(f"{name};dur=", response['Server-Timing'])
+
+        metrics = self.client.get('/metrics/').content.decode()
+        self.assertIn('bdj_requests_total{view="tribunal-list",method="GET",status="200"} 1', metrics)
+        self.assertIn('bdj_db_queries_total{view="tribunal-list"} 1', metrics)
+        self.assertIn('bdj_request_phase_seconds_count{view="tribunal-list",phase="serialization"} 1',
+                      metrics)
+
+    def test_serialization_is_timed_at_the_renderer(self):
+        # Les plans compilés ne passent pas par Serializer.data : seul le renderer voit toutes les réponses
+        with instrumentation.track_request() as timings:
+            FastJSONRenderer().render([{'id': n, 'nom': "Tribunal"} for n in range(1000)])
+        self.assertGreater(timings.phases['serialization'], 0)
+
+    async def test_async_views_are_instrumented(self):
+        response = await self.async_client.get('/api/async/recherche/', {'q': "TGI"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("db;dur=", response['Server-Timing'])
+        # Requêtes exécutées dans le thread de l'ORM asynchrone, comptées quand même
+        self.assertEqual(instrumentation.registry.queries['recherche-async'], 2)
+
+    def test_metrics_restricted_to_local_clients(self):
+        response = self.client.get('/metrics/', REMOTE_ADDR='10.0.0.8')
+        self.assertEqual(response.status_code, 403)
+
+    def test_profile_header_writes_folded_stacks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILE_DIR=Path(directory)):
+                response = self.client.get('/api/core/', HTTP_X_PROFILE='1')
+            path = Path(directory) / response['X-Profile-File']
+            self.assertTrue(path.exists())
+            for line in path.read_text().splitlines():
+                stack, count = line.rsplit(' ', 1)
+                self.assertTrue(count.isdigit())
+
+
+class InstrumentationDisabledTests(TestCase):
+
+    def test_metrics_endpoint_hidden(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+
+
+class SyntheticDataTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        volumes = Volumes(tribunaux=2, dossiers_par_tribunal=30, magistrats_par_tribunal=6, avocats=5)
+        cls.counts = Generator(volumes, seed=1).run()
+
+    def test_volumes(self):
+        self.assertEqual(Tribunal.objects.count(), 2)
+        self.assertEqual(Magistrat.objects.count(), 12)
+        self.assertEqual(Dossier.objects.count(), 60)
+        self.assertEqual(self.counts['Dossier'], 60)
+        self.assertGreaterEqual(PartieAuDossier.objects.count(), 120)
+
+    def test_states_are_consistent(self):
+        self.assertFalse(Decision.objects.exclude(dossier__etat__in=['JUGE', 'CLOS', 'APPEL', 'POURVOI']).exists())
+        self.assertFalse(Frais.objects.filter(etat='PAYE').exclude(montant_paye=F('montant')).exists())
+        self.assertFalse(Audience.objects.filter(etat='PROGRAMMEE', date_prevue__lt=timezone.now()).exists())
+
+
+class BenchmarkSuiteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=10, magistrats_par_tribunal=3, avocats=4)).run()
+
+    def test_every_benchmark_runs(self):
+        results = benchmarks.run_benchmarks(repeat=1)
+        self.assertEqual(set(results), set(benchmarks.registry))
+        for result in results.values():
+            self.assertGreaterEqual(result['median_ms'], 0)
+
+    def test_regressions(self):
+        baselines = {'a': {'median_ms': 10, 'queries': 1}}
+        self.assertEqual(benchmarks.regressions({'a': {'median_ms': 12, 'queries': 1}}, baselines, 0.25), [])
+        self.assertEqual(len(benchmarks.regressions({'a': {'median_ms': 13, 'queries': 2}}, baselines, 0.25)), 2)
+
+    def test_gains_cover_build_only(self):
+        results = {'serialize.dossier_build_drf': {'median_ms': 100}, 'serialize.dossier_build_plan': {'median_ms': 25},
+                   'serialize.dossier_list': {'median_ms': 100}, 'serialize.dossier_list_plan': {'median_ms': 50}}
+        self.assertEqual(benchmarks.gains(results),
+                         [('serialize.dossier_build_drf', 'serialize.dossier_build_plan', 4.0, 5)])
+
+
+async def collect(chunks):
+    return b''.join([chunk async for chunk in chunks])
+
+
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=20, magistrats_par_tribunal=3, avocats=4)).run()
+        cls.audience = Audience.objects.visibles(acces.ANONYME).select_related('dossier').first()
+
+    async def test_search_matches_sync_view(self):
+        sync = await self.async_client.get('/api/recherche/', {'q': 'Affaire', 'limit': 5})
+        response = await self.async_client.get('/api/async/recherche/', {'q': 'Affaire', 'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(len(response.json()['dossiers']), 5)
+        self.assertEqual(response.asgi_request.db_counter.queries, 2)
+
+    async def test_search_requires_two_characters(self):
+        response = await self.async_client.get('/api/async/recherche/', {'q': 'A'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_docket(self):
+        jour = self.audience.date_prevue.date().isoformat()
+        url = f'/api/async/tribunaux/{self.audience.dossier.tribunal_id}/role/'
+        response = await self.async_client.get(url, {'date': jour})
+        numeros = [row['dossier__numero_rg'] for row in response.json()['audiences']]
+        self.assertIn(self.audience.dossier.numero_rg, numeros)
+        sync = await self.async_client.get(url.replace('/async', ''), {'date': jour})
+        self.assertEqual(response.json(), sync.json())
+
+    def test_attachment_streaming(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            pieces = PieceJointe.objects.filter(dossier=self.audience.dossier_id, est_confidentielle=False)
+            piece = pieces.first() or PieceJointe(
+                dossier=self.audience.dossier, titre="Requête", type_piece='REQUETE')
+            content = b"%PDF-1.4 " + b"x" * 200_000
+            piece.fichier.save('requête_d\'appel.pdf', ContentFile(content))
+
+            response = self.client.get(f'/api/async/pieces/{piece.pk}/fichier/')
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Disposition'],
+                             "attachment; filename*=utf-8''requ%C3%AAte_dappel.pdf")
+            self.assertEqual(async_to_sync(collect)(response.streaming_content), content)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+
+            missing = PieceJointe.objects.exclude(pk=piece.pk).first()
+            if missing is not None:
+                self.assertEqual(self.client.get(f'/api/async/pieces/{missing.pk}/fichier/').status_code, 404)
+
+
+class EventFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=5, magistrats_par_tribunal=3, avocats=4)).run()
+        cls.tribunal = Tribunal.objects.get()
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.addCleanup(events.get_broker.cache_clear)
+
+    async def test_broker_delivers_and_replays(self):
+        broker = events.InProcessBroker()
+        stream = broker.subscribe('c', heartbeat=0.01)
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        broker.publish('c', {'n': 1})
+        self.assertEqual(await pending, (1, {'n': 1}))
+        self.assertIsNone(await anext(stream))
+        await stream.aclose()
+
+        broker.publish('c', {'n': 2})
+        replay = broker.subscribe('c', last_event_id=1)
+        self.assertEqual(await anext(replay), (2, {'n': 2}))
+        await replay.aclose()
+
+    def test_audience_change_is_published_after_commit(self):
+        audience = Audience.objects.filter(est_publique=True).select_related('dossier').first()
+        with mock.patch('core.events.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                audience.etat = 'EN_COURS'
+                audience.save()
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+        tribunal_id, event = publish.call_args.args
+        self.assertEqual(tribunal_id, self.tribunal.pk)
+        self.assertEqual(event['type'], 'audience')
+        self.assertEqual(event['etat'], 'EN_COURS')
+
+    def test_private_notes_are_not_published(self):
+        dossier = Dossier.objects.filter(est_confidentiel=False).first()
+        with mock.patch('core.events.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                dossier.notes.create(contenu="Note interne", est_publique=False)
+        publish.assert_not_called()
+
+    async def test_stream_filters_by_tribunal(self):
+        response = await self.async_client.get('/api/async/evenements/', {'tribunal': str(self.tribunal.pk)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        events.publish(None, {'type': 'dossier', 'id': 'ailleurs'})
+        events.publish(self.tribunal.pk, {'type': 'audience', 'id': 'ici'})
+        message = (await pending).decode()
+        self.assertIn('event: audience', message)
+        self.assertIn('"id":"ici"', message)
+        await stream.aclose()
+
+    async def test_invalid_tribunal(self):
+        response = await self.async_client.get('/api/async/evenements/', {'tribunal': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=15, magistrats_par_tribunal=3, avocats=4)).run()
+
+    def pull(self, since='', **params):
+        received, deleted, calls = {}, {}, 0
+        while True:
+            payload = self.client.get('/api/sync/', {'since': since, **params}).json()
+            calls += 1
+            for name, rows in payload['changes'].items():
+                for row in rows:
+                    received.setdefault(name, {})[row['id']] = row
+            for name, ids in payload['deleted'].items():
+                deleted.setdefault(name, set()).update(ids)
+            since = payload['watermark']
+            if payload['complete']:
+                return received, deleted, since, calls
+
+    def test_batches_cover_every_row_once(self):
+        received, deleted, watermark, calls = self.pull(limit=7)
+        self.assertGreater(calls, 1)
+        # Anonyme : les dossiers confidentiels et les audiences non publiques restent sur le serveur
+        self.assertEqual(len(received['dossier']), Dossier.objects.visibles(acces.ANONYME).count())
+        self.assertEqual(len(received['audience']), Audience.objects.visibles(acces.ANONYME).count())
+        self.assertEqual(received.keys() - sync.SYNC_MODELS.keys(), set())
+
+        received, deleted, _, _ = self.pull(watermark)
+        self.assertEqual(received, {})
+
+    def test_only_changes_and_tombstones_after_watermark(self):
+        *_, watermark, _ = self.pull(limit=500)
+        dossier, retire = Dossier.objects.all()[:2]
+        dossier.etat = 'JUGE'
+        dossier.save()
+        retire.est_actif = False
+        retire.save()
+
+        received, deleted, _, _ = self.pull(watermark)
+        self.assertEqual(list(received), ['dossier'])
+        self.assertEqual(received['dossier'][str(dossier.pk)]['etat'], 'JUGE')
+        self.assertEqual(deleted, {'dossier': {str(retire.pk)}})
+
+    def test_model_filter_and_compression(self):
+        response = self.client.get('/api/sync/', {'models': 'tribunal,dossier'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(self.client.get('/api/sync/', {'models': 'inconnu'}).status_code, 400)
+
+    def test_invalid_watermark(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'pas-un-filigrane'}).status_code, 400)
+
+
+class FastRendererTests(TestCase):
+
+    def test_output_identical_to_drf(self):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=10, magistrats_par_tribunal=3, avocats=4)).run()
+        payload = benchmarks.dossier_payload(25)
+        payload[0]['intitule'] = "Séparateur\u2028de ligne — « guillemets »"
+        extra = {'montant': Decimal('12.50'), 'quand': timezone.now(), 'jour': date(2026, 1, 2), 'n': None}
+        for data in (payload, extra):
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back_to_drf(self):
+        rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+
+    def test_floats_match_drf(self):
+        data = {'valeurs': [0.1, -0.0, 1 / 3, 1e-4, 1e15, 1e16, 1e-7, -2.5e300], 'imbrique': [{'x': 5e-324}]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render([1.5]), b'[1.5]')
+        self.assertEqual(FastJSONRenderer().render([Decimal('1E+20')]), JSONRenderer().render([Decimal('1E+20')]))
+        for valeur in (math.nan, math.inf, -math.inf, Decimal('NaN')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render(ReturnList([{'liste': (valeur,)}], serializer=None))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionTests(TestCase):
+
+    def setUp(self):
+        for n in range(10):
+            Tribunal.objects.create(nom=f"Tribunal de Paix {n}", type_tribunal='TRIPAIX',
+                                    juridiction="Kinshasa", adresse="Palais de justice")
+
+    def test_negotiation(self):
+        codecs = {'zstd': None, 'br': None, 'gzip': None}
+        self.assertEqual(compression.negotiate('gzip, br, zstd', codecs), 'zstd')
+        self.assertEqual(compression.negotiate('gzip;q=1, br;q=0.5', codecs), 'gzip')
+        self.assertEqual(compression.negotiate('zstd;q=0, *;q=0.1', codecs), 'br')
+        self.assertIsNone(compression.negotiate('identity', codecs))
+        self.assertIsNone(compression.negotiate('', codecs))
+
+    def test_api_response_is_compressed(self):
+        plain = self.client.get('/api/core/', HTTP_ACCEPT='application/json')
+        response = self.client.get('/api/core/', HTTP_ACCEPT='application/json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+
+    def test_html_is_left_alone(self):
+        response = self.client.get('/api/core/', HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class ChoicesBundleTests(TestCase):
+
+    def setUp(self):
+        choices.invalidate()
+        self.tribunal = Tribunal.objects.create(nom="Tribunal de Paix de Gombe", type_tribunal='TRIPAIX',
+                                                juridiction="Kinshasa", adresse="Palais de justice")
+
+    def test_bundle_contains_choices_and_references(self):
+        data = self.client.get('/api/choix/').json()
+        self.assertIn({'value': 'TRIPAIX', 'label': 'Tribunal de Paix'}, data['choix']['tribunal']['type_tribunal'])
+        self.assertIn('etat', data['choix']['dossier'])
+        self.assertEqual([t['id'] for t in data['tribunaux']], [str(self.tribunal.pk)])
+
+    def test_versioned_url_is_immutable(self):
+        response = self.client.get('/api/choix/')
+        version = response['ETag'].strip('"')
+        self.assertEqual(self.client.get('/api/choix/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        versioned = self.client.get(f'/api/choix/{version}/')
+        self.assertIn('immutable', versioned['Cache-Control'])
+        self.assertEqual(versioned.content, response.content)
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/choix/{version}/')
+
+    def test_reference_change_yields_new_version(self):
+        before = self.client.get('/api/choix/')['ETag'].strip('"')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tribunal.nom = "Tribunal de Paix de Lingwala"
+            self.tribunal.save()
+        after = self.client.get('/api/choix/')['ETag'].strip('"')
+        self.assertNotEqual(before, after)
+        stale = self.client.get(f'/api/choix/{before}/')
+        self.assertRedirects(stale, f'/api/choix/{after}/')
+
+
+class FeeLedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=2, dossiers_par_tribunal=10, magistrats_par_tribunal=3, avocats=4)).run()
+        cls.dossier = Dossier.objects.first()
+
+    def frais(self, montant, echeance, **fields):
+        return Frais.objects.create(dossier=self.dossier, type_frais='DROIT_GREFFE', montant=Decimal(montant),
+                                    date_echeance=echeance, **fields)
+
+    def test_rollover_is_one_update(self):
+        today = timezone.localdate()
+        echu = self.frais('100', today - timedelta(days=1))
+        a_venir = self.frais('100', today + timedelta(days=1))
+        with self.assertNumQueries(1):
+            ledger.basculer_retards(today)
+        echu.refresh_from_db()
+        a_venir.refresh_from_db()
+        self.assertEqual((echu.etat, a_venir.etat), ('EN_RETARD', 'A_PAYER'))
+        self.assertFalse(Frais.objects.filter(etat__in=['A_PAYER', 'PARTIEL'], date_echeance__lt=today).exists())
+
+    def test_payments_are_ledger_entries(self):
+        frais = self.frais('100', timezone.localdate() + timedelta(days=30))
+        ledger.enregistrer_paiement(frais, '40', numero_recu='R-1')
+        self.assertEqual((frais.montant_paye, frais.etat), (Decimal('40'), 'PARTIEL'))
+        ledger.enregistrer_paiement(frais, '60', numero_recu='R-2')
+        self.assertEqual((frais.montant_paye, frais.etat), (Decimal('100'), 'PAYE'))
+        self.assertEqual(PaiementFrais.objects.filter(frais=frais).count(), 2)
+        with self.assertRaises(ledger.PaiementInvalide):
+            ledger.enregistrer_paiement(frais, '0')
+
+    def test_recalculation_matches_rules(self):
+        today = timezone.localdate()
+        frais = self.frais('100', today - timedelta(days=1), montant_paye=Decimal('100'), etat='EN_RETARD')
+        ledger.recalculer_etats(today)
+        frais.refresh_from_db()
+        self.assertEqual(frais.etat, 'PAYE')
+
+    def test_receivables_report(self):
+        expected = {}
+        for frais in Frais.objects.exclude(etat='EXONERE').select_related('dossier'):
+            key = str(frais.dossier.tribunal_id)
+            expected[key] = expected.get(key, 0) + frais.montant - frais.montant_paye
+        response = self.client.get('/api/frais/creances/')
+        rows = response.json()['creances']
+        self.assertEqual({row['dossier__tribunal']: Decimal(row['solde']) for row in rows}, expected)
+        par_dossier = self.client.get('/api/frais/creances/', {'par': 'dossier'}).json()['creances']
+        self.assertEqual(sum(Decimal(row['solde']) for row in par_dossier), sum(expected.values()))
+        self.assertEqual(self.client.get('/api/frais/creances/', {'par': 'magistrat'}).status_code, 400)
+
+
+class BatchJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=2, dossiers_par_tribunal=20, magistrats_par_tribunal=3, avocats=4)).run()
+
+    def run_job(self, name, *args):
+        call_command(name, '--chunk-size', '5', *args, stdout=StringIO())
+        return JobCheckpoint.objects.get(nom=name)
+
+    def test_rollover_job(self):
+        today = timezone.localdate()
+        Frais.objects.update(etat='A_PAYER', montant_paye=0)
+        overdue = Frais.objects.filter(date_echeance__lt=today).count()
+        checkpoint = self.run_job('actualiser_frais')
+        self.assertEqual((checkpoint.etat, checkpoint.traites, checkpoint.modifies), ('TERMINE', overdue, overdue))
+        self.assertEqual(Frais.objects.filter(etat='EN_RETARD').count(), overdue)
+
+    def test_resumes_after_failure(self):
+        Audience.objects.update(etat='PROGRAMMEE', date_prevue=timezone.now() - timedelta(days=10))
+        total = Audience.objects.count()
+        original, calls = nettoyer_audiences.Command.process_chunk, []
+
+        def flaky(command, pks, options):
+            calls.append(pks)
+            if len(calls) == 2:
+                raise RuntimeError("panne")
+            return original(command, pks, options)
+
+        with mock.patch.object(nettoyer_audiences.Command, 'process_chunk', flaky), self.assertRaises(RuntimeError):
+            self.run_job('nettoyer_audiences')
+        checkpoint = JobCheckpoint.objects.get(nom='nettoyer_audiences')
+        self.assertEqual((checkpoint.etat, checkpoint.traites), ('ECHEC', 5))
+        self.assertEqual(checkpoint.dernier_pk, str(calls[0][-1]))
+
+        checkpoint = self.run_job('nettoyer_audiences')
+        self.assertEqual((checkpoint.etat, checkpoint.traites), ('TERMINE', total))
+        self.assertEqual(Audience.objects.filter(etat='REPORTEE').count(), total)
+
+    def test_other_options_restart_from_scratch(self):
+        Audience.objects.update(etat='PROGRAMMEE', date_prevue=timezone.now() - timedelta(days=10))
+        total = Audience.objects.count()
+        original, calls = nettoyer_audiences.Command.process_chunk, []
+
+        def flaky(command, pks, options):
+            calls.append(pks)
+            if len(calls) == 2:
+                raise RuntimeError("panne")
+            return original(command, pks, options)
+
+        with mock.patch.object(nettoyer_audiences.Command, 'process_chunk', flaky), self.assertRaises(RuntimeError):
+            self.run_job('nettoyer_audiences', '--jours', '5')
+        self.assertEqual(JobCheckpoint.objects.get(nom='nettoyer_audiences').dernier_pk, str(calls[0][-1]))
+
+        # Les lignes du premier lot redeviennent concernées : un parcours repris les sauterait
+        Audience.objects.update(etat='PROGRAMMEE')
+        checkpoint = self.run_job('nettoyer_audiences', '--jours', '3')
+        self.assertEqual((checkpoint.etat, checkpoint.traites), ('TERMINE', total))
+        self.assertEqual(Audience.objects.filter(etat='REPORTEE').count(), total)
+
+    def test_archiving_and_statistics(self):
+        Dossier.objects.update(etat='CLOS', date_cloture=date(2000, 1, 15))
+        self.run_job('archiver_dossiers')
+        self.assertFalse(Dossier.objects.filter(date_archivage__isnull=True).exists())
+
+        self.run_job('statistiques')
+        totals = StatistiqueTribunal.objects.aggregate(enregistres=Sum('dossiers_enregistres'),
+                                                       clotures=Sum('dossiers_clotures'))
+        self.assertEqual(totals, {'enregistres': Dossier.objects.count(), 'clotures': Dossier.objects.count()})
+        self.run_job('statistiques')
+        self.assertEqual(StatistiqueTribunal.objects.filter(mois=date(2000, 1, 1)).count(), 2)
+
+
+class WorkloadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=30, magistrats_par_tribunal=4, avocats=4)).run()
+        cls.tribunal = Tribunal.objects.get()
+
+    def setUp(self):
+        charges.recalculer()
+
+    def expected_score(self, magistrat):
+        ouverts = Dossier.objects.exclude(etat__in=charges.ETATS_TERMINES).filter(
+            Q(magistrat_siege=magistrat) | Q(magistrat_parquet=magistrat))
+        now = timezone.now()
+        audiences = Audience.objects.filter(magistrat=magistrat, etat='PROGRAMMEE',
+                                            date_prevue__range=(now, now + charges.HORIZON_AUDIENCES))
+        return sum(charges.poids(d.urgence) for d in ouverts) + audiences.count()
+
+    def test_index_matches_recount(self):
+        for magistrat in Magistrat.objects.all():
+            self.assertEqual(ChargeTravail.objects.get(utilisateur=magistrat.utilisateur_id).score,
+                             self.expected_score(magistrat))
+
+    def test_signals_keep_index_current(self):
+        dossier = Dossier.objects.exclude(etat__in=charges.ETATS_TERMINES).exclude(magistrat_siege=None).first()
+        ancien = dossier.magistrat_siege
+        nouveau = Magistrat.objects.filter(type_magistrat=ancien.type_magistrat).exclude(pk=ancien.pk).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            dossier.magistrat_siege = nouveau
+            dossier.save()
+        for magistrat in (ancien, nouveau):
+            self.assertEqual(ChargeTravail.objects.get(utilisateur=magistrat.utilisateur_id).score,
+                             self.expected_score(magistrat))
+
+        greffier = User.objects.create(username='greffier')
+        with self.captureOnCommitCallbacks(execute=True):
+            Attribution.objects.create(dossier=dossier, attribue_a=greffier, type_attribution='GREFFIER')
+        self.assertEqual(greffier.charge_travail.dossiers_ouverts, 1)
+
+    def test_heap_picks_least_loaded(self):
+        repartiteur = charges.Repartiteur([('a', 5), ('b', 1), ('c', 3)])
+        self.assertEqual([repartiteur.choisir(3) for _ in range(4)], ['b', 'c', 'b', 'a'])
+
+    def test_batch_assignment_balances_load(self):
+        Dossier.objects.update(magistrat_siege=None, etat='ENREGISTRE', est_confidentiel=False)
+        charges.recalculer()
+        url = f'/api/core/{self.tribunal.pk}/repartir/'
+        self.assertEqual(self.client.post(url, {'fonction': 'SIEGE'}, content_type='application/json').status_code, 401)
+        headers = {'Authorization': f'Bearer {jetons.emettre(Magistrat.objects.first().utilisateur)[0]}'}
+        with mock.patch('core.events.publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'fonction': 'SIEGE'}, content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['attributions']), Dossier.objects.count())
+        for dossiers in (5, 'abc', ['pas-un-uuid']):
+            self.assertEqual(self.client.post(url, {'dossiers': dossiers}, content_type='application/json',
+                                              headers=headers).status_code, 400)
+        # bulk_update contourne post_save : un événement par dossier attribué, publié après validation
+        self.assertEqual({call.args[1]['id'] for call in publish.call_args_list},
+                         {str(pk) for pk in response.json()['attributions']})
+        scores = [row['utilisateur__charge_travail__score']
+                  for row in self.client.get(f'/api/core/{self.tribunal.pk}/charges/').json()
+                  if row['type_magistrat'] == 'SIEGE']
+        siege = Magistrat.objects.filter(type_magistrat='SIEGE')
+        self.assertEqual(sorted(scores), sorted(self.expected_score(m) for m in siege))
+        self.assertLessEqual(max(scores) - min(scores), max(charges.POIDS_URGENCE.values()) + 10)
+
+
+class AppealChainTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=6, magistrats_par_tribunal=3, avocats=4)).run()
+        cls.a, cls.b, cls.c, cls.d = Dossier.objects.order_by('numero_rg')[:4]
+
+    def recours(self, origine, cible, type_recours='APPEL'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return VoieRecours.objects.create(dossier_origine=origine, dossier_recours=cible, type_recours=type_recours,
+                                              tribunal_recours=cible.tribunal, motifs="Motifs")
+
+    def setUp(self):
+        self.ab = self.recours(self.a, self.b)
+        self.recours(self.b, self.c, 'POURVOI_CASSATION')
+        self.recours(self.a, self.d, 'OPPOSITION')
+
+    def test_tree_in_one_query(self):
+        with self.assertNumQueries(1):
+            arbre = recours.arbre(self.c.pk)
+        self.assertEqual(arbre['id'], self.a.pk)
+        enfants = {enfant['id']: enfant for enfant in arbre['enfants']}
+        self.assertEqual(enfants.keys(), {self.b.pk, self.d.pk})
+        self.assertEqual(enfants[self.b.pk]['recours']['type_recours'], 'APPEL')
+        self.assertEqual([e['id'] for e in enfants[self.b.pk]['enfants']], [self.c.pk])
+
+        response = self.client.get(f'/api/dossiers/{self.d.pk}/recours/')
+        self.assertEqual(response.json()['arbre']['id'], str(self.a.pk))
+
+    def test_closure_table(self):
+        self.assertEqual(list(recours.ancetres(self.c.pk).values_list('ancetre', 'profondeur')),
+                         [(self.b.pk, 1), (self.a.pk, 2)])
+        self.assertEqual(recours.descendants(self.a.pk).count(), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ab.delete()
+        self.assertEqual(list(recours.ancetres(self.c.pk).values_list('ancetre', flat=True)), [self.b.pk])
+        self.assertEqual(list(recours.descendants(self.a.pk).values_list('descendant', flat=True)), [self.d.pk])
+        lignee = self.client.get(f'/api/dossiers/{self.b.pk}/recours/lignee/').json()
+        self.assertEqual((lignee['ancetres'], [d['descendant'] for d in lignee['descendants']]), ([], [str(self.c.pk)]))
+
+    def test_unknown_dossier(self):
+        self.assertEqual(self.client.get(f'/api/dossiers/{Tribunal.objects.get().pk}/recours/').status_code, 404)
+
+
+class PartyIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=2, dossiers_par_tribunal=10, magistrats_par_tribunal=3, avocats=3)).run()
+
+    def test_generator_populates_index(self):
+        self.assertEqual(IndexPartie.objects.count(), PartieAuDossier.objects.count())
+
+    def test_party_history_in_one_query(self):
+        lien = PartieAuDossier.objects.first()
+        partie = lien.partie
+        for dossier in Dossier.objects.exclude(pk=lien.dossier_id)[:5]:
+            PartieAuDossier.objects.create(dossier=dossier, partie=partie, qualite='TIERS')
+        with self.assertNumQueries(1):
+            rows = list(parties.dossiers_partie(partie.pk))
+        expected = PartieAuDossier.objects.filter(partie=partie).select_related('dossier')
+        self.assertEqual(sorted((row['numero_rg'], row['qualite']) for row in rows),
+                         sorted((l.dossier.numero_rg, l.qualite) for l in expected))
+        response = self.client.get(f'/api/parties/{partie.pk}/dossiers/')
+        self.assertEqual(len(response.json()['dossiers']),
+                         IndexPartie.objects.filter(partie=partie, est_confidentiel=False).count())
+
+    def test_dossier_changes_propagate(self):
+        lien = PartieAuDossier.objects.exclude(avocat=None).select_related('dossier').first()
+        dossier = lien.dossier
+        dossier.etat, dossier.intitule, dossier.est_confidentiel = 'ENREGISTRE', "Intitulé modifié", False
+        dossier.save()
+        self.assertIn(str(dossier.pk), [row['dossier_id'] for row in
+                                         self.client.get(f'/api/avocats/{lien.avocat_id}/dossiers/').json()['dossiers']])
+        dossier.etat = 'CLOS'
+        dossier.save()
+        ligne = IndexPartie.objects.get(lien=lien)
+        self.assertEqual((ligne.intitule, ligne.dossier_ouvert), ("Intitulé modifié", False))
+        self.assertNotIn(dossier.pk, [row['dossier_id'] for row in parties.dossiers_avocat(lien.avocat_id)])
+
+        dossier.est_actif = False
+        dossier.save()
+        self.assertFalse(IndexPartie.objects.filter(dossier=dossier).exists())
+        dossier.est_actif = True
+        dossier.save()
+        self.assertTrue(IndexPartie.objects.filter(lien=lien).exists())
+
+    def test_rebuild_job(self):
+        IndexPartie.objects.all().delete()
+        call_command('indexer_parties', stdout=StringIO())
+        self.assertEqual(IndexPartie.objects.count(), PartieAuDossier.objects.count())
+
+
+class PartyDedupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=3, magistrats_par_tribunal=3, avocats=3)).run()
+        cls.d1, cls.d2 = Dossier.objects.all()[:2]
+
+    def partie(self, prenom, nom, naissance=None, **fields):
+        return Partie.objects.create(prenom=prenom, nom=nom, date_naissance=naissance, adresse="Kinshasa", **fields)
+
+    def setUp(self):
+        naissance = date(1971, 6, 4)
+        self.p1 = self.partie("Joseph", "Kabila", naissance, email="jk@example.cd", telephone="0810000000")
+        self.p2 = self.partie("JOSEPH", "KABILA", naissance)
+        self.p3 = self.partie("Joseph", "Kabilla", naissance)
+        self.homonyme = self.partie("Joseph", "Kabila", date(1985, 1, 1))
+        self.s1 = self.partie("", "", est_personne_morale=True, raison_sociale="SARL Bralima")
+        self.s2 = self.partie("", "", est_personne_morale=True, raison_sociale="Bralima S.A.R.L.")
+        for partie, dossier in ((self.p1, self.d1), (self.p2, self.d1), (self.p3, self.d2)):
+            PartieAuDossier.objects.create(dossier=dossier, partie=partie, qualite='DEMANDEUR')
+        self.queryset = Partie.objects.filter(pk__in=[p.pk for p in (
+            self.p1, self.p2, self.p3, self.homonyme, self.s1, self.s2)])
+
+    def test_detection(self):
+        groupes, _, _ = doublons.detecter(self.queryset)
+        self.assertEqual(sorted(sorted(f.pk for f in groupe) for groupe in groupes),
+                         sorted([sorted([self.p1.pk, self.p2.pk, self.p3.pk]), sorted([self.s1.pk, self.s2.pk])]))
+        self.assertEqual(doublons.survivants(groupes)[self.p2.pk], self.p1.pk)
+
+    def test_merge_repoints_links(self):
+        avant = timezone.now()
+        resultat = doublons.dedoublonner(self.queryset)
+        self.assertEqual(resultat['doublons'], 3)
+        actives = Partie.objects.filter(pk__in=self.queryset, est_actif=True)
+        self.assertEqual(actives.count(), 3)
+        self.assertTrue({self.p1, self.homonyme} <= set(actives))
+        liens = PartieAuDossier.objects.filter(partie=self.p1)
+        self.assertEqual(sorted(liens.values_list('dossier_id', flat=True)), sorted([self.d1.pk, self.d2.pk]))
+        self.assertFalse(PartieAuDossier.objects.filter(partie__in=[self.p2, self.p3], est_actif=True).exists())
+        # Lien en collision (même dossier, même qualité) : désactivé, pas supprimé, pour que /api/sync/ le propage
+        retire = PartieAuDossier.objects.get(partie=self.p2)
+        self.assertFalse(retire.est_actif)
+        self.assertGreater(retire.date_modification, avant)
+        self.assertGreater(liens.get(dossier=self.d2).date_modification, avant)
+        self.assertEqual(IndexPartie.objects.filter(partie=self.p1).count(), 2)
+        self.assertFalse(IndexPartie.objects.filter(lien=retire).exists())
+        self.assertEqual(FusionPartie.objects.filter(survivant=self.p1).count(), 2)
+
+    def test_pairs_shared_by_several_blocks(self):
+        with mock.patch.object(doublons, 'score', wraps=doublons.score) as score:
+            _, a_revoir, _ = doublons.detecter(self.queryset)
+        comparees = [frozenset((a.pk, b.pk)) for a, b in (call.args for call in score.call_args_list)]
+        # p1 et p2 partagent deux blocs (nom ; nom et naissance) : une fois réunies, la paire n'est plus comparée
+        self.assertEqual(max(Counter(comparees).values()), 1)
+        self.assertEqual(len({frozenset((a.pk, b.pk)) for a, b, _ in a_revoir}), len(a_revoir))
+
+    def test_oversized_block_is_windowed(self):
+        rawbank = [self.partie("", "", est_personne_morale=True, raison_sociale="Rawbank SA") for _ in range(60)]
+        groupes, _, _ = doublons.detecter(Partie.objects.filter(pk__in=[p.pk for p in rawbank]))
+        self.assertEqual([sorted(f.pk for f in groupe) for groupe in groupes], [sorted(p.pk for p in rawbank)])
+
+    def test_group_with_conflicting_identifiers_is_refused(self):
+        naissance = date(1990, 3, 1)
+        sans_identifiant = self.partie("Moise", "Katumbi", naissance)
+        identifies = [self.partie("Moise", "Katumbi", naissance, numero_identification=numero)
+                      for numero in ("CD-001", "CD-002")]
+        queryset = Partie.objects.filter(pk__in=[p.pk for p in (sans_identifiant, *identifies)])
+        groupes, a_revoir, scores = doublons.detecter(queryset)
+        self.assertEqual((groupes, scores), ([], {}))
+        self.assertEqual({frozenset((a.pk, b.pk)) for a, b, _ in a_revoir},
+                         {frozenset((sans_identifiant.pk, partie.pk)) for partie in identifies})
+
+    def test_dry_run(self):
+        call_command('dedoublonner_parties', '--dry-run', stdout=StringIO())
+        self.assertFalse(FusionPartie.objects.exists())
+
+
+class ConfidentialityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=6, magistrats_par_tribunal=3, avocats=3)).run()
+        Dossier.objects.update(est_confidentiel=False, magistrat_siege=None, magistrat_parquet=None)
+        Audience.objects.update(est_publique=True)
+        PieceJointe.objects.update(est_confidentielle=False)
+        cls.secret, cls.public = Dossier.objects.all()[:2]
+        cls.magistrat = Magistrat.objects.first()
+        Dossier.objects.filter(pk=cls.secret.pk).update(est_confidentiel=True, magistrat_siege=cls.magistrat)
+        cls.greffier = User.objects.create_user('greffier')
+        cls.admin = User.objects.create_superuser('admin')
+
+    def visibles(self, acces):
+        return set(Dossier.objects.visibles(acces).values_list('pk', flat=True))
+
+    def test_roles(self):
+        self.assertNotIn(self.secret.pk, self.visibles(acces.ANONYME))
+        self.assertIn(self.public.pk, self.visibles(acces.ANONYME))
+        self.assertIn(self.secret.pk, self.visibles(acces.acces_pour(self.magistrat.utilisateur)))
+        self.assertNotIn(self.secret.pk, self.visibles(acces.acces_pour(self.greffier)))
+        self.assertIn(self.secret.pk, self.visibles(acces.acces_pour(self.admin)))
+        Attribution.objects.create(dossier=self.secret, attribue_a=self.greffier, type_attribution='GREFFIER')
+        self.assertIn(self.secret.pk, self.visibles(acces.acces_pour(self.greffier)))
+
+    def test_avocat_constitue(self):
+        avocats = PartieAuDossier.objects.filter(dossier=self.secret).exclude(avocat=None).values('avocat')
+        lien = PartieAuDossier.objects.exclude(avocat=None).exclude(avocat__in=avocats).first()
+        droits = acces.acces_pour(lien.avocat.utilisateur)
+        self.assertNotIn(self.secret.pk, self.visibles(droits))
+        PartieAuDossier.objects.filter(pk=lien.pk).update(dossier=self.secret)
+        self.assertIn(self.secret.pk, self.visibles(droits))
+
+    def test_single_query_and_cached_access(self):
+        user = self.magistrat.utilisateur
+        acces.invalider(user.pk)
+        with self.assertNumQueries(1):
+            acces.acces_pour(user)
+        with self.assertNumQueries(1):
+            rows = list(Audience.objects.visibles(acces.acces_pour(user)).values('id'))
+        self.assertEqual(len(rows), Audience.objects.count())
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        with self.assertNumQueries(1):
+            acces.acces_pour(user)
+
+    def test_restricted_rows(self):
+        audience = Audience.objects.exclude(dossier=self.secret).first()
+        Audience.objects.filter(pk=audience.pk).update(est_publique=False)
+        self.assertFalse(Audience.objects.visibles(acces.ANONYME).filter(pk=audience.pk).exists())
+        droits = acces.Acces(magistrat_id=audience.magistrat_id)
+        self.assertTrue(Audience.objects.visibles(droits).filter(pk=audience.pk).exists())
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_sync_tombstones_hidden_rows(self):
+        payload = sync.changes_since({}, 500, ['dossier'], acces.ANONYME)
+        self.assertIn(self.secret.pk, payload['deleted']['dossier'])
+        self.assertNotIn(self.secret.pk, [row['id'] for row in payload['changes']['dossier']])
+        payload = sync.changes_since({}, 500, ['dossier'], acces.acces_pour(self.magistrat.utilisateur))
+        self.assertIn(self.secret.pk, [row['id'] for row in payload['changes']['dossier']])
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_parties_follow_their_dossiers(self):
+        cachee = Partie.objects.create(prenom="Gaston", nom="Zzyzx", adresse="Goma")
+        PartieAuDossier.objects.create(dossier=self.secret, partie=cachee, qualite='TIERS')
+        lien = PartieAuDossier.objects.create(dossier=self.public, partie=cachee, qualite='TIERS')
+        self.assertTrue(Partie.objects.visibles(acces.ANONYME).filter(pk=cachee.pk).exists())
+        PartieAuDossier.objects.filter(pk=lien.pk).update(est_actif=False)
+        self.assertFalse(Partie.objects.visibles(acces.ANONYME).filter(pk=cachee.pk).exists())
+        self.assertEqual(Partie.objects.visibles(acces.acces_pour(self.magistrat.utilisateur)).filter(
+            pk=cachee.pk).count(), 1)
+        self.assertEqual(self.client.get('/api/recherche/', {'q': "Zzyzx"}).json()['parties'], [])
+        payload = sync.changes_since({}, 5000, ['partie'], acces.ANONYME)
+        self.assertIn(cachee.pk, payload['deleted']['partie'])
+
+    def test_endpoints(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            piece = PieceJointe.objects.create(dossier=self.public, type_piece='REQUETE', titre="Rapport",
+                                               est_confidentielle=True,
+                                               fichier=ContentFile(b'secret', name='rapport.txt'))
+            self.assertEqual(self.client.get(f'/api/pieces/{piece.pk}/fichier/').status_code, 404)
+            self.client.force_login(self.admin)
+            self.assertEqual(self.client.get(f'/api/pieces/{piece.pk}/fichier/').status_code, 200)
+            self.client.logout()
+        self.assertEqual(self.client.get(f'/api/dossiers/{self.secret.pk}/recours/').status_code, 404)
+        self.assertEqual(self.client.get('/api/recherche/', {'q': self.secret.numero_rg}).json()['dossiers'], [])
+        self.client.force_login(self.magistrat.utilisateur)
+        dossiers = self.client.get('/api/recherche/', {'q': self.secret.numero_rg}).json()['dossiers']
+        self.assertEqual([row['id'] for row in dossiers], [str(self.secret.pk)])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TokenAuthTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=4, magistrats_par_tribunal=2, avocats=2)).run()
+        cls.magistrat = Magistrat.objects.select_related('utilisateur').first()
+        cls.user = cls.magistrat.utilisateur
+        cls.user.set_password('secret-123')
+        cls.user.save()
+        cls.secret = Dossier.objects.first()
+        Dossier.objects.filter(pk=cls.secret.pk).update(est_confidentiel=True, magistrat_siege=cls.magistrat)
+
+    def obtenir(self):
+        response = self.client.post('/api/jetons/', {'username': self.user.username, 'password': 'secret-123'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def bearer(self, jeton):
+        return {'Authorization': f'Bearer {jeton}'}
+
+    def test_issue_and_use_without_queries(self):
+        payload = self.obtenir()
+        self.assertEqual(payload['role'], self.magistrat.type_magistrat)
+        response = self.client.get('/api/recherche/', {'q': self.secret.numero_rg},
+                                   headers=self.bearer(payload['jeton']))
+        self.assertEqual([row['id'] for row in response.json()['dossiers']], [str(self.secret.pk)])
+        # Authentification et droits résolus depuis le jeton : seules les deux recherches touchent la base
+        self.assertEqual(response.wsgi_request.db_counter.queries, 2)
+        principal = response.wsgi_request.user
+        self.assertEqual((principal.id, principal.tribunal_id), (self.user.pk, str(self.magistrat.tribunal_id)))
+
+        response = self.client.get('/api/core/', headers=self.bearer(payload['jeton']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.db_counter.queries, 1)
+
+    def test_rejected_tokens(self):
+        self.assertEqual(self.client.post('/api/jetons/', {'username': self.user.username, 'password': 'x'},
+                                          content_type='application/json').status_code, 401)
+        jeton = self.obtenir()['jeton']
+        response = self.client.get('/api/recherche/', {'q': 'Affaire'}, headers=self.bearer(jeton[:-2] + 'xx'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+        self.assertEqual(self.client.get('/api/core/', headers=self.bearer('abc')).status_code, 401)
+        with override_settings(API_TOKEN_TTL_SECONDS=0):
+            response = self.client.get('/api/recherche/', {'q': 'Affaire'}, headers=self.bearer(jeton))
+        self.assertEqual(response.json()['detail'], "Jeton expiré")
+
+    def test_revocation(self):
+        jeton = self.obtenir()['jeton']
+        principal = jetons.lire(jeton)
+        self.assertEqual(self.client.post('/api/jetons/revoquer/', headers=self.bearer(jeton)).status_code, 204)
+        response = self.client.get('/api/recherche/', {'q': 'Affaire'}, headers=self.bearer(jeton))
+        self.assertEqual(response.json()['detail'], "Jeton révoqué")
+        # Un autre processus relit la liste partagée par le cache
+        self.assertTrue(jetons.ListeRevocation().contient(principal))
+        self.assertFalse(jetons.ListeRevocation().contient(jetons.lire(self.obtenir()['jeton'])))
+
+    def test_concurrent_revocations_are_kept(self):
+        principaux = [jetons.lire(self.obtenir()['jeton']) for _ in range(2)]
+        # Deux processus révoquent chacun un jeton : chaque révocation a sa propre clé, rien n'est réécrit
+        for principal in principaux:
+            jetons.ListeRevocation().ajouter(jetons={principal.jti: principal.expiration})
+        cles = [jetons.cle_jeton(principal.jti) for principal in principaux]
+        self.assertEqual(cache.get_many(cles), {cle: principal.expiration for cle, principal in zip(cles, principaux)})
+        self.assertTrue(all(jetons.ListeRevocation().contient(principal) for principal in principaux))
+
+    def test_principal_loads_only_known_user_attributes(self):
+        principal = jetons.lire(self.obtenir()['jeton'])
+        with self.assertNumQueries(0):
+            self.assertIsNone(getattr(principal, 'profil_inexistant', None))
+        with self.assertNumQueries(1):
+            self.assertEqual(principal.email, self.user.email)
+
+    def test_deactivation_revokes_user_tokens(self):
+        jeton = self.obtenir()['jeton']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/api/core/', headers=self.bearer(jeton)).status_code, 401)
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/core/', headers=self.bearer(self.obtenir()['jeton'])).status_code, 200)
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={'search': '3/min'}, CONCURRENCY_LIMITS={'heavy': 1},
+                   SYNC_SETTLE_SECONDS=0)
+class AdmissionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_token_bucket(self):
+        debit = admission.Debit.depuis('3/min')
+        self.assertEqual([admission.prendre('seau', debit, now=100) for _ in range(4)], [0, 0, 0, 20])
+        self.assertEqual(admission.prendre('seau', debit, now=110), 10)
+        self.assertEqual(admission.prendre('seau', debit, now=120), 0)
+
+    def test_rate_limit_per_client(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/recherche/', {'q': 'Affaire'}).status_code, 200)
+        response = self.client.get('/api/recherche/', {'q': 'Affaire'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        self.assertEqual(self.client.get('/api/recherche/', {'q': 'Affaire'}, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        # Endpoint sans classe de débit
+        self.assertEqual(self.client.get('/api/choix/').status_code, 200)
+
+    def test_concurrency_shedding(self):
+        self.assertTrue(admission.entrer('heavy'))
+        response = self.client.get('/api/sync/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+        admission.sortir('heavy')
+        self.assertEqual(self.client.get('/api/sync/').status_code, 200)
+        self.assertEqual(cache.get('core:concurrence:heavy'), 0)
+
+    def test_concurrency_counter_stays_current(self):
+        with mock.patch.object(cache, 'touch', wraps=cache.touch) as touch:
+            self.assertTrue(admission.entrer('heavy'))
+        touch.assert_called_once_with('core:concurrence:heavy', admission.CONCURRENCY_TTL)
+        # Compteur expiré pendant la requête, puis recréé à zéro
+        cache.set('core:concurrence:heavy', 0)
+        admission.sortir('heavy')
+        self.assertEqual(cache.get('core:concurrence:heavy'), 0)
+        self.assertTrue(admission.entrer('heavy'))
+        self.assertFalse(admission.entrer('heavy'))
+
+
+class SerializerPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=2, dossiers_par_tribunal=8, magistrats_par_tribunal=3, avocats=3)).run()
+
+    def assertSameOutput(self, serializer_class, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset.all(), many=True).data)
+        with self.assertNumQueries(1):
+            rows = plans.serialiser(serializer_class, queryset.all())
+        self.assertEqual(JSONRenderer().render(rows), expected)
+
+    def test_byte_identical_to_drf(self):
+        self.assertSameOutput(DossierSerializer, Dossier.objects.order_by('numero_rg'))
+        self.assertSameOutput(AudienceSerializer, Audience.objects.order_by('date_prevue', 'id'))
+        self.assertSameOutput(PartieAuDossierSerializer, PartieAuDossier.objects.order_by('id'))
+        # Relations nulles : objet imbriqué rendu None
+        Dossier.objects.filter(pk=Dossier.objects.first().pk).update(magistrat_siege=None, parquet=None)
+        self.assertSameOutput(DossierSerializer, Dossier.objects.order_by('numero_rg'))
+
+    def test_fallback_and_viewset(self):
+        with self.assertRaises(plans.NonCompilable):
+            plans.compiler(PieceJointeSerializer)
+        self.assertIsInstance(plans.serialiser(PieceJointeSerializer, PieceJointe.objects.all()), list)
+        response = self.client.get('/api/core/')
+        self.assertEqual(response.content, FastJSONRenderer().render(
+            TribunalSerializer(Tribunal.objects.all(), many=True).data))
+
+
+class CalendarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=3, magistrats_par_tribunal=2, avocats=1)).run()
+        cls.magistrat = Magistrat.objects.order_by('id').first()
+        cls.tribunal = Tribunal.objects.get()
+        # Lundi 2 janvier 2040, une semaine sur deux, lundi et jeudi matin
+        cls.regle = RegleCalendrier.objects.create(
+            magistrat=cls.magistrat, tribunal=cls.tribunal, jours=calendrier.masque('lundi', 'jeudi'),
+            heure_debut=time(9), heure_fin=time(12), toutes_les_semaines=2, date_debut=date(2040, 1, 2),
+        )
+
+    def test_occurrences(self):
+        jours = list(calendrier.occurrences(self.regle, date(2040, 1, 1), date(2040, 1, 31)))
+        self.assertEqual(jours, [date(2040, 1, d) for d in (2, 5, 16, 19, 30)])
+        self.regle.date_fin = date(2040, 1, 16)
+        self.assertEqual(list(calendrier.occurrences(self.regle, date(2040, 1, 10), date(2040, 3, 1))),
+                         [date(2040, 1, 16)])
+
+    def test_generation_is_idempotent(self):
+        self.assertEqual(calendrier.generer([self.regle], date(2040, 1, 1), date(2040, 1, 31)), 5)
+        Calendrier.objects.filter(date=date(2040, 1, 5)).update(heure_fin=time(11))
+        calendrier.generer([self.regle], date(2040, 1, 1), date(2040, 1, 31))
+        self.assertEqual(Calendrier.objects.count(), 5)
+        self.assertEqual(Calendrier.objects.get(date=date(2040, 1, 5)).heure_fin, time(11))
+
+    def test_free_slots(self):
+        calendrier.generer([self.regle], date(2040, 1, 1), date(2040, 1, 31))
+        Calendrier.objects.create(magistrat=self.magistrat, tribunal=self.tribunal, date=date(2040, 1, 16),
+                                  heure_debut=time(11), heure_fin=time(13), est_disponible=False)
+        Audience.objects.filter(pk=Audience.objects.order_by('id').first().pk).update(
+            magistrat=self.magistrat, etat='PROGRAMMEE', est_actif=True,
+            date_prevue=timezone.make_aware(datetime(2040, 1, 19, 10)),
+        )
+        with self.assertNumQueries(2):
+            libres = calendrier.creneaux_libres(self.tribunal.pk, date(2040, 1, 1), date(2040, 1, 31))
+        self.assertEqual([creneau['date'] for creneau in libres], [date(2040, 1, d) for d in (2, 5, 30)])
+
+        response = self.client.get(f'/api/tribunaux/{self.tribunal.pk}/creneaux/',
+                                   {'debut': '2040-01-01', 'fin': '2040-01-31', 'magistrat': self.magistrat.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['creneaux'][0], {
+            'magistrat': str(self.magistrat.pk), 'date': '2040-01-02', 'heure_debut': '09:00:00',
+            'heure_fin': '12:00:00',
+        })
+        self.assertEqual(self.client.get(f'/api/tribunaux/{self.tribunal.pk}/creneaux/',
+                                         {'debut': '2040-01-01', 'fin': '2042-01-01'}).status_code, 400)
+
+    def test_command(self):
+        call_command('generer_calendrier', annee=2040, stdout=StringIO())
+        self.assertEqual(Calendrier.objects.filter(regle=self.regle).count(), 53)
+
+
+class Echec(convocations.Transport):
+
+    def envoyer(self, convocation):
+        raise ConnectionError("serveur injoignable")
+
+
+class ConvocationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=3, magistrats_par_tribunal=2, avocats=2)).run()
+        Audience.objects.update(etat='ANNULEE')
+        cls.audience = Audience.objects.order_by('id').first()
+        Audience.objects.filter(pk=cls.audience.pk).update(
+            etat='PROGRAMMEE', est_actif=True, date_prevue=timezone.now() + timedelta(days=3))
+        liens = PartieAuDossier.objects.filter(dossier_id=cls.audience.dossier_id)
+        Partie.objects.filter(pk__in=liens.values('partie_id')).update(email='', adresse='1 rue du Palais')
+        cls.premiere = liens.order_by('id').first()
+        Partie.objects.filter(pk=cls.premiere.partie_id).update(email='partie@example.org')
+        cls.attendues = liens.count() + liens.exclude(avocat=None).values('avocat_id').distinct().count()
+
+    def test_planning_is_batched_and_idempotent(self):
+        self.assertGreater(self.attendues, 1)
+        with self.assertNumQueries(4):
+            self.assertEqual(convocations.planifier_lot([self.audience.pk]), self.attendues)
+        self.assertEqual(convocations.planifier(), 0)
+        convocation = Convocation.objects.get(partie_id=self.premiere.partie_id)
+        self.assertEqual((convocation.canal, convocation.destinataire), ('EMAIL', 'partie@example.org'))
+        self.assertIn(self.audience.dossier.numero_rg, convocation.objet)
+        self.assertIn(f"salle {self.audience.salle}", convocation.corps)
+
+    def test_parties_sharing_an_address_are_each_convoked(self):
+        menage = [Partie.objects.create(prenom=prenom, nom="Kabila", adresse="12 avenue du Marché")
+                  for prenom in ("Jean", "Marie")]
+        for partie in menage:
+            PartieAuDossier.objects.create(dossier_id=self.audience.dossier_id, partie=partie, qualite='TIERS')
+        self.assertEqual(convocations.planifier_lot([self.audience.pk]), self.attendues + 2)
+        courriers = Convocation.objects.filter(destinataire="12 avenue du Marché")
+        self.assertEqual(set(courriers.values_list('partie_id', flat=True)), {partie.pk for partie in menage})
+        self.assertEqual(convocations.planifier_lot([self.audience.pk]), 0)
+
+    @override_settings(CONVOCATION_MAX_TENTATIVES=2)
+    def test_retry_with_backoff_then_failure(self):
+        convocations.planifier()
+        canaux = {'EMAIL': Echec(), 'COURRIER': Echec()}
+        self.assertEqual(convocations.traiter(canaux=canaux), Counter(EN_ATTENTE=self.attendues))
+        self.assertTrue(all(c.prochain_essai > timezone.now() for c in Convocation.objects.all()))
+        self.assertEqual(convocations.traiter(canaux=canaux), Counter())
+        Convocation.objects.update(prochain_essai=timezone.now())
+        self.assertEqual(convocations.vider(canaux=canaux), Counter(ECHEC=self.attendues))
+        self.assertEqual(Convocation.objects.first().derniere_erreur, "ConnectionError: serveur injoignable")
+
+    def test_claim_is_exclusive_until_lease_expires(self):
+        convocations.planifier()
+        self.assertEqual(len(convocations.prendre(100)), self.attendues)
+        self.assertEqual(convocations.prendre(100), [])
+        plus_tard = timezone.now() + timedelta(seconds=settings.CONVOCATION_LEASE_SECONDS + 1)
+        self.assertEqual(len(convocations.prendre(100, now=plus_tard)), self.attendues)
+
+    def test_rescheduled_hearing(self):
+        convocations.planifier()
+        Audience.objects.filter(pk=self.audience.pk).update(date_prevue=timezone.now() + timedelta(days=5))
+        self.assertEqual(convocations.vider(canaux={'EMAIL': Echec(), 'COURRIER': Echec()}),
+                         Counter(ANNULEE=self.attendues))
+        self.assertEqual(convocations.planifier(), self.attendues)
+
+    def test_command_with_email_and_file_transports(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            CONVOCATION_FILE=Path(tmp) / 'courriers.jsonl',
+            CONVOCATION_TRANSPORTS={'EMAIL': 'core.convocations.EmailTransport',
+                                    'COURRIER': 'core.convocations.FichierTransport'},
+        ):
+            call_command('envoyer_convocations', stdout=StringIO())
+            courriers = (Path(tmp) / 'courriers.jsonl').read_text().splitlines()
+        emails = Convocation.objects.filter(canal='EMAIL').count()
+        self.assertEqual(len(mail.outbox), emails)
+        self.assertEqual(len(courriers), self.attendues - emails)
+        self.assertEqual(Convocation.objects.filter(etat='ENVOYEE').count(), self.attendues)
+
+
+class DocumentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=3, magistrats_par_tribunal=2, avocats=2)).run()
+        cls.dossier = Dossier.objects.filter(decision__isnull=True, est_confidentiel=False).first()
+        cls.decision = Decision.objects.create(
+            dossier=cls.dossier, type_decision='ORDONNANCE', numero_decision='ORD-2025-001',
+            date_decision=date(2025, 3, 14), sens_decision='ACCUEIL', motifs="Attendu que (la demande) est fondée",
+            dispositif="Fait droit à la demande",
+        )
+        cls.user = User.objects.create_user('greffier')
+
+    def setUp(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def test_pdf_and_odt(self):
+        texte = "Titre\n  Partie – retrait\n" + "Ligne de procès-verbal assez longue. " * 300
+        contenu = documents.pdf("Acte", texte)
+        self.assertTrue(contenu.startswith(b'%PDF-1.4') and contenu.endswith(b'%%EOF\n'))
+        self.assertIn('(  Partie – retrait)'.encode('cp1252'), contenu)
+        self.assertGreater(contenu.count(b'/Type /Page '), 1)
+        self.assertEqual(documents.pdf("Acte", texte), contenu)
+
+        archive = zipfile.ZipFile(BytesIO(documents.odt("Acte", texte)))
+        self.assertEqual(archive.namelist()[0], 'mimetype')
+        self.assertEqual(archive.getinfo('mimetype').compress_type, zipfile.ZIP_STORED)
+        paragraphes = ElementTree.fromstring(archive.read('content.xml')).iter(
+            '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}p')
+        self.assertEqual([p.text for p in paragraphes][:2], ['Titre', None])
+
+    def test_cached_until_sources_change(self):
+        # Sources (2), cache (1), pièce et document (2), dans un point de sauvegarde
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(7):
+            piece, regenere = documents.generer('decision', [self.decision.pk])[self.decision.pk]
+        self.assertTrue(regenere)
+        self.assertEqual((piece.dossier_id, piece.type_piece), (self.dossier.pk, 'ORDONNANCE'))
+        self.assertIn(b'Attendu que \\(la demande\\)', piece.fichier.read())
+        with self.assertNumQueries(3):
+            self.assertEqual(documents.generer('decision', [self.decision.pk])[self.decision.pk], (piece, False))
+
+        # Sources modifiées, document identique : la pièce est conservée
+        Decision.objects.filter(pk=self.decision.pk).update(date_modification=timezone.now())
+        self.assertEqual(documents.generer('decision', [self.decision.pk])[self.decision.pk], (piece, True))
+
+        self.decision.dispositif = "Rejette la demande"
+        self.decision.save()
+        nouvelle, regenere = documents.generer('decision', [self.decision.pk])[self.decision.pk]
+        self.assertNotEqual(nouvelle.pk, piece.pk)
+        self.assertFalse(PieceJointe.objects.get(pk=piece.pk).est_actif)
+        self.assertEqual(DocumentGenere.objects.get().piece, nouvelle)
+
+    def test_removed_party_changes_version(self):
+        version = documents.MODELES['decision'].sources([self.decision.pk])[self.decision.pk][1]
+        # Le lien retiré n'est plus lu : aucune date de modification ne le reflèterait
+        PartieAuDossier.objects.filter(pk=PartieAuDossier.objects.filter(dossier=self.dossier).first().pk).update(
+            est_actif=False)
+        self.assertNotEqual(documents.MODELES['decision'].sources([self.decision.pk])[self.decision.pk][1], version)
+
+    def test_unicode_outside_pdf_font_fails_loudly(self):
+        with self.assertRaisesMessage(documents.DocumentIrrepresentable, "« ɛ »"):
+            documents.pdf("Acte", "Mokɛngɛ")
+        archive = zipfile.ZipFile(BytesIO(documents.odt("Acte", "Mokɛngɛ")))
+        self.assertIn("Mokɛngɛ", archive.read('content.xml').decode())
+
+    def test_rollback_writes_no_file(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            piece = documents.generer('decision', [self.decision.pk])[self.decision.pk][0]
+            raise RuntimeError
+        self.assertFalse(piece.fichier.storage.exists(piece.fichier.name))
+
+    def test_pool_rendering(self):
+        sources = documents.MODELES['convocation'].sources(Audience.objects.values_list('pk', flat=True)[:4])
+        taches = [('convocation', 'odt', "Convocation", contexte) for row, version, contexte in sources.values()]
+        with documents.pool_rendu(2) as pool:
+            self.assertEqual(documents.rendre_tous(taches, pool), documents.rendre_tous(taches))
+
+    def test_endpoint(self):
+        url = f'/api/documents/decision/{self.decision.pk}/'
+        self.assertEqual(self.client.post(url).status_code, 401)
+        headers = {'Authorization': f'Bearer {jetons.emettre(self.user)[0]}'}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(response.json()['fichier'])['Content-Type'], 'application/pdf')
+        self.assertEqual(self.client.post(url, headers=headers).status_code, 200)
+        self.assertEqual(self.client.post(f'{url}?format=odt', headers=headers).status_code, 201)
+        self.assertEqual(self.client.post(url.replace('decision', 'bail'), headers=headers).status_code, 400)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('generer_documents', 'proces_verbal', '--format', 'odt', stdout=out)
+        self.assertEqual(DocumentGenere.objects.filter(modele='proces_verbal').count(),
+                         Audience.objects.filter(est_actif=True).count())
+
+
+class ScelleCustodyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=2, magistrats_par_tribunal=2, avocats=1)).run()
+        cls.dossier, cls.autre = Dossier.objects.order_by('numero_rg')[:2]
+        Dossier.objects.filter(pk=cls.dossier.pk).update(est_confidentiel=False)
+        Dossier.objects.filter(pk=cls.autre.pk).update(est_confidentiel=True)
+        for dossier, numeros in [(cls.dossier, ['1', '2', '3']), (cls.autre, ['1'])]:
+            for numero in numeros:
+                Scelle.objects.create(dossier=dossier, numero_scelle=numero, type_scelle='PIECE_CONVICTION',
+                                      description="Téléphone", date_saisie=date(2025, 1, 6), saisi_par="OPJ")
+        cls.user = User.objects.create_user('greffier-scelles')
+
+    def test_bulk_transfer_appends_chained_events(self):
+        with self.assertNumQueries(5):
+            mouvements = scelles.transferer_dossier(self.dossier.pk, 'Greffe', "Dépôt")
+        self.assertEqual(len(mouvements), 3)
+        scelles.transferer_dossier(self.dossier.pk, 'Laboratoire', "Expertise", effectue_par_id=self.user.pk)
+        self.assertEqual(scelles.transferer_dossier(self.dossier.pk, 'Laboratoire', "Expertise"), [])
+
+        scelle = Scelle.objects.get(dossier=self.dossier, numero_scelle='2')
+        premier, second = scelle.mouvements.order_by('rang')
+        self.assertEqual(premier.empreinte_precedente, scelles.GENESE)
+        self.assertEqual(second.empreinte_precedente, premier.empreinte)
+        self.assertEqual((second.lieu_depart, second.lieu_arrivee), ('Greffe', 'Laboratoire'))
+        self.assertEqual((scelle.lieu_conservation, scelle.rang_chaine, scelle.empreinte_chaine),
+                         ('Laboratoire', 2, second.empreinte))
+        self.assertEqual(scelles.verifier(), {})
+
+    def test_tampering_is_detected(self):
+        scelles.transferer_dossier(self.dossier.pk, 'Greffe', "Dépôt")
+        scelles.transferer_dossier(self.dossier.pk, 'Laboratoire', "Expertise")
+        un, deux, trois = Scelle.objects.filter(dossier=self.dossier).order_by('numero_scelle')
+        MouvementScelle.objects.filter(scelle=un, rang=1).update(lieu_arrivee='Domicile')
+        MouvementScelle.objects.filter(scelle=deux, rang=1).delete()
+        Scelle.objects.filter(pk=trois.pk).update(lieu_conservation='Greffe')
+        self.assertEqual(scelles.verifier(), {un.pk: 1, deux.pk: 2, trois.pk: 3})
+
+        mouvement = MouvementScelle.objects.filter(scelle=trois).first()
+        with self.assertRaises(ValueError):
+            mouvement.save()
+        with self.assertRaises(ValueError):
+            mouvement.delete()
+
+    def test_deletions_cannot_break_the_chain(self):
+        scelles.transferer_dossier(self.dossier.pk, 'Greffe', "Dépôt", effectue_par_id=self.user.pk)
+        with self.assertRaises(ProtectedError):
+            self.user.delete()
+        with self.assertRaises(ProtectedError):
+            Scelle.objects.filter(dossier=self.dossier).delete()
+        self.assertEqual(MouvementScelle.objects.filter(effectue_par=self.user).count(), 3)
+        self.assertEqual(scelles.verifier(), {})
+
+    def test_stale_chain_head_is_rejected(self):
+        scelles.transferer_dossier(self.dossier.pk, 'Greffe', "Dépôt")
+        # Transfert concurrent : même rang calculé depuis une projection périmée
+        Scelle.objects.filter(dossier=self.dossier).update(rang_chaine=0, lieu_conservation='')
+        with self.assertRaises(IntegrityError):
+            scelles.transferer_dossier(self.dossier.pk, 'Laboratoire', "Expertise")
+        self.assertEqual(MouvementScelle.objects.filter(lieu_arrivee='Laboratoire').count(), 0)
+
+    def test_endpoints(self):
+        url = f'/api/dossiers/{self.dossier.pk}/scelles/transfert/'
+        self.assertEqual(self.client.post(url, {'lieu': 'Greffe'}, content_type='application/json').status_code, 401)
+        headers = {'Authorization': f'Bearer {jetons.emettre(self.user)[0]}'}
+        response = self.client.post(url, {'lieu': 'Greffe', 'motif': "Dépôt"}, content_type='application/json',
+                                    headers=headers)
+        self.assertEqual(len(response.json()['mouvements']), 3)
+        scelles.transferer_dossier(self.autre.pk, 'Greffe', "Dépôt")
+
+        # Le scellé du dossier confidentiel n'apparaît pas à un client anonyme
+        inventaire = self.client.get('/api/scelles/inventaire/', {'lieu': 'Greffe'}).json()
+        self.assertEqual([row['numero_scelle'] for row in inventaire['scelles']], ['1', '2', '3'])
+        self.assertEqual(self.client.get('/api/scelles/inventaire/').json()['lieux'],
+                         [{'lieu_conservation': 'Greffe', 'scelles': 3}])
+        scelle = Scelle.objects.get(dossier=self.dossier, numero_scelle='1')
+        chaine = self.client.get(f'/api/scelles/{scelle.pk}/mouvements/').json()
+        self.assertTrue(chaine['intacte'])
+        self.assertEqual(chaine['mouvements'][0]['effectue_par'], self.user.pk)
+
+
+class RepriseRegistreTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=1, magistrats_par_tribunal=2, avocats=1)).run()
+        cls.tribunal = Tribunal.objects.get()
+        cls.magistrat = Magistrat.objects.filter(type_magistrat='SIEGE').first()
+        cls.nature = Dossier.objects.get().nature_affaire
+        cls.avocat = Avocat.objects.get()
+        cls.existant = Dossier.objects.get().numero_rg
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def fichier(self, nom, lignes, delimiter=';'):
+        chemin = Path(self.tmp.name) / nom
+        chemin.write_text('\n'.join(delimiter.join(ligne) for ligne in lignes) + '\n', encoding='utf-8-sig')
+        return chemin
+
+    def dossiers(self, *numeros):
+        entete = ['Numero_RG', 'intitule', 'tribunal', 'nature', 'magistrat_siege', 'urgence', 'date_enregistrement']
+        return self.fichier('dossiers.csv', [entete] + [
+            [numero, f"Affaire {numero}", self.tribunal.nom, self.nature.code, self.magistrat.numero_employe,
+             'Très urgente', '05/03/2019'] for numero in numeros
+        ])
+
+    def test_dossiers_are_staged_validated_and_loaded(self):
+        chemin = self.fichier('dossiers.csv', [
+            ['numero_rg', 'intitule', 'tribunal', 'nature', 'urgence', 'date_enregistrement', 'est_confidentiel'],
+            ['RG/2019/001', "Affaire A", self.tribunal.nom, self.nature.code, 'Urgente', '05/03/2019', 'oui'],
+            ['', '', '', '', '', '', ''],
+            ['RG/2019/002', "Affaire B", "Tribunal inconnu", self.nature.code, '', '2019-03-06', ''],
+            ['RG/2019/001', "Affaire A bis", self.tribunal.nom, self.nature.code, '', '', ''],
+            [self.existant, "Déjà repris", self.tribunal.nom, self.nature.code, '', '', ''],
+            ['RG/2019/003', "", self.tribunal.nom, self.nature.code, 'Lente', '31/02/2019', 'peut-être'],
+        ])
+        import_registre = reprise.importer('DOSSIER', chemin)
+        self.assertEqual((import_registre.lignes, import_registre.importees, import_registre.rejetees), (5, 1, 4))
+
+        erreurs = dict(import_registre.lignes_import.values_list('numero', 'erreurs'))
+        self.assertEqual(erreurs[2], [])
+        self.assertEqual(erreurs[4], ["tribunal : tribunal « Tribunal inconnu » introuvable"])
+        self.assertEqual(erreurs[5], ["numero_rg : en double dans le fichier"])
+        self.assertEqual(erreurs[6], [f"numero_rg : le dossier {self.existant} existe déjà"])
+        self.assertEqual([erreur.split(' :')[0] for erreur in erreurs[7]],
+                         ['intitule', 'urgence', 'date_enregistrement', 'est_confidentiel'])
+
+        dossier = Dossier.objects.get(numero_rg='RG/2019/001')
+        ligne = import_registre.lignes_import.get(numero=2)
+        self.assertEqual((ligne.etat, ligne.objet_id), ('IMPORTEE', dossier.pk))
+        self.assertEqual((dossier.urgence, dossier.date_enregistrement, dossier.est_confidentiel),
+                         ('URGENTE', date(2019, 3, 5), True))
+
+    def test_related_rows_resolve_references_set_wise(self):
+        reprise.importer('DOSSIER', self.dossiers('RG/1', 'RG/2'))
+        chemin = self.fichier('parties.csv', [
+            ['numero_rg', 'qualite', 'nom', 'prenom', 'numero_identification', 'avocat', 'date_constitution'],
+            ['RG/1', 'Demandeur', 'Kabila', 'Jean', 'ID-1', self.avocat.numero_barreau, '01/04/2019'],
+            ['RG/2', 'DEFENDEUR', 'Kabila', 'Jean', 'ID-1', '', ''],
+            ['RG/1', 'DEFENDEUR', 'Mbuyi', 'Anne', '', '', ''],
+            ['RG/1', 'DEMANDEUR', 'Kabila', 'Jean', 'ID-1', '', ''],
+            ['RG/9', 'DEMANDEUR', 'Tshala', 'Paul', '', 'B-404', ''],
+        ], delimiter=',')
+        import_registre = reprise.importer('PARTIE', chemin)
+        self.assertEqual((import_registre.importees, import_registre.rejetees), (3, 2))
+        self.assertEqual(Partie.objects.filter(numero_identification='ID-1').count(), 1)
+        self.assertEqual(IndexPartie.objects.filter(numero_rg__in=['RG/1', 'RG/2']).count(), 3)
+        self.assertEqual(import_registre.lignes_import.get(numero=6).erreurs,
+                         ["numero_rg : dossier « RG/9 » introuvable", "avocat : avocat « B-404 » introuvable"])
+
+        # Parties déjà reprises : la constitution existante est signalée, pas dupliquée
+        import_registre = reprise.importer('PARTIE', chemin)
+        self.assertEqual((import_registre.importees, import_registre.rejetees), (1, 4))
+        self.assertEqual(import_registre.lignes_import.get(numero=2).erreurs,
+                         ["numero_identification : la partie ID-1 est déjà constituée au dossier"])
+
+        audiences = self.fichier('audiences.csv', [
+            ['numero_rg', 'type_audience', 'date_prevue', 'salle', 'magistrat', 'etat'],
+            ['RG/1', 'Plaidoirie', '12/05/2019 09:30', 'Salle 1', self.magistrat.numero_employe, 'Terminée'],
+            ['RG/1', 'PLAIDOIRIE', '2019-05-12T09:30', 'Salle 1', self.magistrat.numero_employe, ''],
+        ])
+        import_registre = reprise.importer('AUDIENCE', audiences)
+        self.assertEqual((import_registre.importees, import_registre.rejetees), (1, 1))
+        audience = Audience.objects.get(dossier__numero_rg='RG/1')
+        self.assertEqual((audience.etat, timezone.localtime(audience.date_prevue).hour), ('TERMINEE', 9))
+
+        decisions = self.fichier('decisions.csv', [
+            ['numero_rg', 'numero_decision', 'type_decision', 'date_decision', 'sens_decision', 'dispositif'],
+            ['RG/1', 'JGT/1', 'JUGEMENT', '01/06/2019', 'Accueil partiel', "Condamne"],
+            ['RG/1', 'JGT/2', 'JUGEMENT', '02/06/2019', 'REJET', "Condamne"],
+        ])
+        self.assertEqual(reprise.importer('DECISION', decisions).importees, 1)
+        decision = Decision.objects.get(dossier__numero_rg='RG/1')
+        self.assertEqual((decision.numero_decision, decision.sens_decision), ('JGT/1', 'PARTIEL'))
+
+    def test_queries_do_not_grow_with_rows(self):
+        def requetes(numeros):
+            import_registre = ImportRegistre.objects.create(type_donnees='DOSSIER', fichier='dossiers.csv')
+            reprise.mettre_en_attente(import_registre, reprise.lire(self.dossiers(*numeros)))
+            with CaptureQueriesContext(connection) as queries:
+                reprise.valider(import_registre)
+                reprise.charger(import_registre)
+            self.assertEqual(import_registre.importees, len(numeros))
+            return len(queries)
+
+        self.assertEqual(requetes([f'RG/A/{i}' for i in range(3)]), requetes([f'RG/B/{i}' for i in range(40)]))
+
+    def test_command_reports_rejected_rows(self):
+        chemin = self.dossiers('RG/1', self.existant)
+        stdout = StringIO()
+        call_command('importer_registre', 'DOSSIER', str(chemin), '--controle-seul', stdout=stdout)
+        import_registre = ImportRegistre.objects.get()
+        self.assertEqual((import_registre.etat, Dossier.objects.filter(numero_rg='RG/1').count()), ('VALIDE', 0))
+
+        rapport = Path(self.tmp.name) / 'rejets.csv'
+        call_command('importer_registre', 'DOSSIER', '--reprendre', str(import_registre.pk), '--rapport',
+                     str(rapport), stdout=stdout)
+        self.assertTrue(Dossier.objects.filter(numero_rg='RG/1').exists())
+        with open(rapport, newline='', encoding='utf-8') as fichier:
+            rejets = list(csv.DictReader(fichier))
+        self.assertEqual([(rejet['ligne'], rejet['numero_rg']) for rejet in rejets], [('3', self.existant)])
+
+        with self.assertRaisesMessage(CommandError, "non pris en charge"):
+            call_command('importer_registre', 'DOSSIER', 'registre.ods', stdout=stdout)
+
+
+class NumeroJudiciaireTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(Volumes(tribunaux=1, dossiers_par_tribunal=1, magistrats_par_tribunal=1, avocats=1)).run()
+        cls.tribunal = Tribunal.objects.get()
+        Tribunal.objects.filter(pk=cls.tribunal.pk).update(code='KIN')
+        cls.nature = Dossier.objects.get().nature_affaire
+
+    def dossier(self, annee=2025, **kwargs):
+        return Dossier.objects.create(intitule="Affaire", objet_litige="Litige", nature_affaire=self.nature,
+                                      tribunal=self.tribunal, date_enregistrement=date(annee, 3, 1), **kwargs)
+
+    def test_numbers_follow_per_tribunal_year_and_type(self):
+        self.assertEqual([self.dossier().numero_rg for _ in range(2)], ['RG/KIN/2025/000001', 'RG/KIN/2025/000002'])
+        self.assertEqual(self.dossier(2026).numero_rg, 'RG/KIN/2026/000001')
+        self.assertEqual(self.dossier(numero_rg='RG/LIBRE/1').numero_rg, 'RG/LIBRE/1')
+
+        serializer = DossierSerializer(data={'intitule': "Affaire", 'objet_litige': "Litige",
+                                             'nature_affaire': self.nature.pk, 'tribunal': self.tribunal.pk,
+                                             'date_enregistrement': '2025-06-01'})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save().numero_rg, 'RG/KIN/2025/000003')
+
+        decision = Decision.objects.create(dossier=self.dossier(), type_decision='JUGEMENT', sens_decision='REJET',
+                                           date_decision=date(2025, 9, 1), dispositif="Rejette", motifs="")
+        self.assertEqual(decision.numero_decision, 'DEC/KIN/2025/000001')
+
+    def test_sequence_starts_after_existing_numbers(self):
+        self.dossier(numero_rg='RG/KIN/2024/000041')
+        self.dossier(2024, numero_rg='RG/KIN/2024/000007/bis')
+        self.assertEqual(self.dossier(2024).numero_rg, 'RG/KIN/2024/000042')
+
+    def test_gaps_are_reported(self):
+        code, premier, fin = numeros.reserver(self.tribunal.pk, 2025, 'RG', 10)
+        self.assertEqual((code, premier, fin), ('KIN', 1, 11))
+        for rang in [1, 2, 5, 9]:
+            self.dossier(numero_rg=f'RG/KIN/2025/{rang:06d}')
+        self.assertEqual(numeros.trous(self.tribunal.pk, 2025, 'RG'), [(3, 4), (6, 8), (10, 10)])
+        self.assertEqual(numeros.trous(self.tribunal.pk, 2025, 'DECISION'), [])
+
+        stdout = StringIO()
+        call_command('numeros_manquants', '--annee', '2025', stdout=stdout)
+        self.assertIn("6 manquants sur 10 (3-4, 6-8, 10)", stdout.getvalue())
+
+
+class NumeroConcurrenceTests(TransactionTestCase):
+
+    def test_concurrent_allocators_never_share_a_number(self):
+        tribunal = Tribunal.objects.create(nom="TGI Gombe", type_tribunal='TGI', juridiction="Kinshasa",
+                                           adresse="Palais de justice", code='GOM')
+        # Deux processus simulés, de quatre threads chacun, avec de petits blocs pour multiplier les réservations
+        allocateurs = [numeros.Allocateur(taille=5), numeros.Allocateur(taille=5)]
+        attribues, erreurs = [], []
+
+        def intake(allocateur):
+            try:
+                for _ in range(25):
+                    attribues.append(allocateur.attribuer('RG', tribunal.pk, 2025))
+            except Exception as exc:
+                erreurs.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=intake, args=(allocateur,)) for allocateur in allocateurs for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(erreurs, [])
+        self.assertEqual(len(set(attribues)), 200)
+
+        # Au plus un bloc entamé par processus reste à distribuer : ce sont les seuls trous
+        prochain = SequenceJudiciaire.objects.get().prochain
+        self.assertLessEqual(prochain - 1 - 200, 2 * 4)
+        nature = NatureAffaire.objects.create(nom="Civil", code='CIV', matiere='CIVIL')
+        Dossier.objects.bulk_create(Dossier(numero_rg=numero, intitule="Affaire", objet_litige="Litige",
+                                            nature_affaire=nature, tribunal=tribunal) for numero in attribues)
+        trous = numeros.trous(tribunal.pk, 2025, 'RG')
+        self.assertEqual(sum(dernier - premier + 1 for premier, dernier in trous), prochain - 1 - 200)
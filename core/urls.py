@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views, views
 from .views import TribunalViewSet
 
 router = DefaultRouter()
@@ -7,4 +8,28 @@ router.register(r'core', TribunalViewSet)
 
 urlpatterns = [
     path('api/', include(router.urls)),
+    path('api/recherche/', views.recherche, name='recherche'),
+    path('api/tribunaux/<uuid:tribunal_id>/role/', views.role_audience, name='role-audience'),
+    path('api/tribunaux/<uuid:tribunal_id>/creneaux/', views.creneaux_libres, name='creneaux-libres'),
+    path('api/pieces/<uuid:pk>/fichier/', views.piece_fichier, name='piece-fichier'),
+    path('api/documents/<str:modele>/<uuid:pk>/', views.generer_document, name='generer-document'),
+    path('api/scelles/inventaire/', views.inventaire_scelles, name='inventaire-scelles'),
+    path('api/scelles/<uuid:pk>/mouvements/', views.mouvements_scelle, name='mouvements-scelle'),
+    path('api/dossiers/<uuid:pk>/scelles/transfert/', views.transferer_scelles, name='transfert-scelles'),
+    path('api/sync/', views.synchronisation, name='synchronisation'),
+    path('api/parties/<uuid:pk>/dossiers/', views.dossiers_partie, name='dossiers-partie'),
+    path('api/avocats/<uuid:pk>/dossiers/', views.dossiers_avocat, name='dossiers-avocat'),
+    path('api/dossiers/<uuid:pk>/recours/', views.arbre_recours, name='arbre-recours'),
+    path('api/dossiers/<uuid:pk>/recours/lignee/', views.lignee_recours, name='lignee-recours'),
+    path('api/frais/creances/', views.creances, name='creances'),
+    path('api/jetons/', views.emettre_jeton, name='jetons'),
+    path('api/jetons/revoquer/', views.revoquer_jeton, name='jetons-revoquer'),
+    path('api/choix/', views.choix, name='choix'),
+    path('api/choix/<str:version>/', views.choix_version, name='choix-version'),
+    path('api/async/recherche/', async_views.recherche, name='recherche-async'),
+    path('api/async/tribunaux/<uuid:tribunal_id>/role/', async_views.role_audience,
+         name='role-audience-async'),
+    path('api/async/pieces/<uuid:pk>/fichier/', async_views.piece_fichier, name='piece-fichier-async'),
+    path('api/async/evenements/', async_views.evenements, name='evenements'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,23 @@
+def view_class(view_func):
+    """Classe derrière une vue (APIView/viewset DRF ou vue générique Django)"""
+    return getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None) or view_func
+
+
+def view_action(view_func, method):
+    """Action servie par la vue : action du viewset, sinon méthode HTTP en minuscules"""
+    actions = getattr(view_func, 'actions', None)
+    if actions is not None:
+        return actions.get(method.lower())
+    return method.lower()
+
+
+def view_declaration(view_func, method, name, default=None):
+    """Valeur déclarée par la vue sous ``name``, éventuellement indexée par action.
+
+    Une vue peut déclarer une valeur unique (``query_budget = QueryBudget(...)``)
+    ou un dictionnaire par action (``{'list': ..., 'retrieve': ...}``).
+    """
+    value = getattr(view_class(view_func), name, default)
+    if isinstance(value, dict):
+        return value.get(view_action(view_func, method), default)
+    return value
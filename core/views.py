@@ -1,12 +1,44 @@
+import json
+import mimetypes
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified,
+    HttpResponseRedirect, JsonResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Tribunal
+from . import (
+    calendrier, charges, choices, documents, instrumentation, jetons, ledger, parties, queries, recours, scelles, sync,
+)
+from .acces import acces_requete
+from .budgets import SESSION, QueryBudget, query_budget
+from .models import Dossier, Frais, MouvementScelle, PieceJointe, Scelle, Tribunal
+from .plans import PlanListMixin
 from .serializers import TribunalSerializer
 
-class TribunalViewSet(viewsets.ModelViewSet):
+class TribunalViewSet(PlanListMixin, viewsets.ModelViewSet):
     queryset = Tribunal.objects.all()
     serializer_class = TribunalSerializer
+    replica_actions = ('list', 'retrieve', 'charges')
+    rate_class = {'charges': 'stats', 'repartir': 'stats'}
+    concurrency_class = {'repartir': 'heavy'}
+    query_budget = {
+        'list': QueryBudget(max_queries=2, statement_timeout_ms=5000),
+        'retrieve': QueryBudget(max_queries=2, statement_timeout_ms=2000),
+        'charges': QueryBudget(max_queries=2),
+        'repartir': QueryBudget(max_queries=15, statement_timeout_ms=10000),
+    }
 
     @action(detail=True, methods=['post'])
     def create_a_tribunal(self, request, pk=None):
@@ -14,4 +46,369 @@ class TribunalViewSet(viewsets.ModelViewSet):
         tribunal.save()
         serializer = self.get_serializer(tribunal)
         return Response(serializer.data)
-    
+
+    @action(detail=True, methods=['get'])
+    def charges(self, request, pk=None):
+        """Charge de travail des magistrats du tribunal, du moins au plus chargé"""
+        tribunal = self.get_object()
+        return Response(list(charges.charges_tribunal(tribunal.pk)))
+
+    @action(detail=True, methods=['post'])
+    def repartir(self, request, pk=None):
+        """Attribue les dossiers donnés (par défaut : les dossiers ouverts sans magistrat)
+        aux magistrats les moins chargés du tribunal"""
+        if getattr(request, 'principal', None) is None:
+            return jeton_requis()
+        tribunal = self.get_object()
+        fonction = request.data.get('fonction', 'SIEGE')
+        if fonction not in charges.CHAMPS_FONCTION:
+            return Response({'detail': "fonction doit valoir 'SIEGE' ou 'PARQUET'"}, status=400)
+        dossiers = charges.dossiers_a_attribuer(tribunal.pk, fonction)
+        if 'dossiers' in request.data and not isinstance(request.data['dossiers'], list):
+            return Response({'detail': "dossiers doit être une liste d'identifiants"}, status=400)
+        try:
+            if 'dossiers' in request.data:
+                dossiers = Dossier.objects.filter(tribunal=tribunal, pk__in=request.data['dossiers']).only(
+                    'pk', 'urgence', charges.CHAMPS_FONCTION[fonction], *charges.CHAMPS_DIFFUSION)
+            dossiers = list(dossiers)
+        except ValidationError:
+            return Response({'detail': "Identifiant de dossier invalide"}, status=400)
+        repartiteur = charges.Repartiteur.pour_tribunal(tribunal.pk, fonction)
+        if not repartiteur:
+            return Response({'detail': "Aucun magistrat disponible pour cette fonction"}, status=409)
+        with transaction.atomic():
+            attributions = repartiteur.attribuer(dossiers, fonction)
+        return Response({'fonction': fonction, 'attributions': attributions})
+
+
+def metrics(request):
+    """Métriques Prometheus du processus (instrumentation activée, clients locaux)"""
+    if not settings.INSTRUMENTATION_ENABLED:
+        raise Http404
+    if not instrumentation.client_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(instrumentation.registry.render(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def search_params(request):
+    """Terme et limite de recherche validés ; ``None`` si le terme est trop court"""
+    terme = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    return (terme, limit) if len(terme) >= 2 else (None, limit)
+
+
+def parse_jour(request):
+    try:
+        return date.fromisoformat(request.GET['date']) if 'date' in request.GET else timezone.localdate()
+    except ValueError:
+        return None
+
+
+@query_budget(max_queries=3 + SESSION, statement_timeout_ms=2000)
+def recherche(request):
+    terme, limit = search_params(request)
+    if terme is None:
+        return JsonResponse({'detail': "Le terme de recherche doit compter au moins 2 caractères"}, status=400)
+    dossiers, parties = queries.recherche(terme, limit, acces_requete(request))
+    return JsonResponse({'dossiers': list(dossiers), 'parties': list(parties)})
+
+
+recherche.replica_actions = ('get',)
+recherche.rate_class = 'search'
+
+
+@query_budget(max_queries=2 + SESSION, statement_timeout_ms=2000)
+def role_audience(request, tribunal_id):
+    jour = parse_jour(request)
+    if jour is None:
+        return JsonResponse({'detail': "Date invalide (AAAA-MM-JJ attendu)"}, status=400)
+    audiences = queries.role_audience(tribunal_id, jour, acces_requete(request))
+    return JsonResponse({'date': jour, 'audiences': list(audiences)})
+
+
+role_audience.replica_actions = ('get',)
+role_audience.rate_class = 'search'
+
+
+CRENEAUX_JOURS_MAX = 366
+
+
+@query_budget(max_queries=2, statement_timeout_ms=2000)
+def creneaux_libres(request, tribunal_id):
+    """Créneaux libres des magistrats du tribunal (``debut`` et ``fin`` inclus, 30 jours par défaut)"""
+    try:
+        debut = date.fromisoformat(request.GET['debut']) if 'debut' in request.GET else timezone.localdate()
+        fin = date.fromisoformat(request.GET['fin']) if 'fin' in request.GET else debut + timedelta(days=30)
+    except ValueError:
+        return JsonResponse({'detail': "Date invalide (AAAA-MM-JJ attendu)"}, status=400)
+    if not 0 <= (fin - debut).days <= CRENEAUX_JOURS_MAX:
+        return JsonResponse({'detail': f"Période invalide ({CRENEAUX_JOURS_MAX} jours au plus)"}, status=400)
+    try:
+        creneaux = calendrier.creneaux_libres(tribunal_id, debut, fin, request.GET.get('magistrat'))
+    except ValidationError:
+        return JsonResponse({'detail': "Identifiant de magistrat invalide"}, status=400)
+    return JsonResponse({'debut': debut, 'fin': fin, 'creneaux': creneaux})
+
+
+creneaux_libres.replica_actions = ('get',)
+creneaux_libres.rate_class = 'search'
+
+
+@query_budget(max_queries=len(sync.SYNC_MODELS) + 1 + SESSION, statement_timeout_ms=10000)
+def synchronisation(request):
+    """Changements depuis le filigrane ``since`` ; rappeler tant que ``complete`` est faux"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 500)), 1), 5000)
+        cursors = sync.decode_watermark(request.GET.get('since', ''))
+    except ValueError as exc:
+        return JsonResponse({'detail': str(exc)}, status=400)
+    names = [name for name in request.GET.get('models', '').split(',') if name]
+    unknown = set(names) - set(sync.SYNC_MODELS)
+    if unknown:
+        return JsonResponse({'detail': f"Modèles inconnus : {', '.join(sorted(unknown))}"}, status=400)
+    return JsonResponse(sync.changes_since(cursors, limit, names, acces_requete(request)),
+                        json_dumps_params={'separators': (',', ':')})
+
+
+synchronisation.replica_actions = ('get',)
+synchronisation.rate_class = 'export'
+synchronisation.concurrency_class = 'heavy'
+
+
+@query_budget(max_queries=2 + SESSION, statement_timeout_ms=5000)
+def creances(request):
+    """Créances agrégées par tribunal (défaut) ou par dossier, filtrables par tribunal"""
+    par = request.GET.get('par', 'tribunal')
+    if par not in ledger.GROUPEMENTS:
+        return JsonResponse({'detail': "par doit valoir 'tribunal' ou 'dossier'"}, status=400)
+    queryset = Frais.objects.visibles(acces_requete(request))
+    if 'tribunal' in request.GET:
+        queryset = queryset.filter(dossier__tribunal_id=request.GET['tribunal'])
+    try:
+        rows = list(ledger.creances(par, queryset=queryset)[:500])
+    except ValidationError:
+        return JsonResponse({'detail': "Identifiant de tribunal invalide"}, status=400)
+    return JsonResponse({'par': par, 'creances': rows})
+
+
+creances.replica_actions = ('get',)
+creances.rate_class = 'stats'
+creances.concurrency_class = 'heavy'
+
+
+def list_limit(request, default=500, maximum=5000):
+    try:
+        return min(max(int(request.GET.get('limit', default)), 1), maximum)
+    except ValueError:
+        return default
+
+
+@query_budget(max_queries=2 + SESSION)
+def dossiers_partie(request, pk):
+    """Historique judiciaire d'une partie (index des participations)"""
+    dossiers = parties.dossiers_partie(pk, list_limit(request), acces_requete(request))
+    return JsonResponse({'partie': pk, 'dossiers': list(dossiers)})
+
+
+@query_budget(max_queries=2 + SESSION)
+def dossiers_avocat(request, pk):
+    """Dossiers en cours d'un avocat (index des participations)"""
+    dossiers = parties.dossiers_avocat(pk, list_limit(request), acces_requete(request))
+    return JsonResponse({'avocat': pk, 'dossiers': list(dossiers)})
+
+
+dossiers_partie.replica_actions = dossiers_avocat.replica_actions = ('get',)
+dossiers_partie.rate_class = dossiers_avocat.rate_class = 'search'
+
+
+@query_budget(max_queries=2 + SESSION)
+def arbre_recours(request, pk):
+    """Arbre complet des voies de recours contenant le dossier, décisions comprises"""
+    arbre = recours.arbre(pk, acces_requete(request))
+    if arbre is None:
+        raise Http404
+    return JsonResponse({'dossier': pk, 'arbre': arbre})
+
+
+@query_budget(max_queries=3 + SESSION)
+def lignee_recours(request, pk):
+    """Ascendants et descendants du dossier dans les voies de recours (table de fermeture)"""
+    acces = acces_requete(request)
+    return JsonResponse({
+        'dossier': pk,
+        'ancetres': list(recours.ancetres(pk, acces).values('ancetre', 'profondeur')),
+        'descendants': list(recours.descendants(pk, acces).values('descendant', 'profondeur')),
+    })
+
+
+arbre_recours.replica_actions = lignee_recours.replica_actions = ('get',)
+arbre_recours.rate_class = lignee_recours.rate_class = 'search'
+
+
+@query_budget(max_queries=2)
+def choix(request):
+    """Bundle courant, revalidé à chaque usage (ETag = version)"""
+    version, content = choices.get_bundle()
+    etag = f'"{version}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    response['Link'] = f'<{reverse("choix-version", args=[version])}>; rel="canonical"'
+    return response
+
+
+@query_budget(max_queries=2)
+def choix_version(request, version):
+    """Bundle d'une version donnée, immuable ; une version périmée redirige vers la courante"""
+    current, content = choices.get_bundle()
+    if version != current:
+        response = HttpResponseRedirect(reverse('choix-version', args=[current]))
+        response['Cache-Control'] = 'no-cache'
+        return response
+    response = HttpResponse(content, content_type='application/json')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+choix.replica_actions = choix_version.replica_actions = ('get',)
+
+
+@query_budget(max_queries=2 + SESSION)
+def piece_fichier(request, pk):
+    piece = get_object_or_404(PieceJointe.objects.visibles(acces_requete(request)), pk=pk, est_actif=True)
+    if not piece.fichier or not piece.fichier.storage.exists(piece.fichier.name):
+        raise Http404
+    return FileResponse(piece.fichier.open('rb'), as_attachment=True,
+                        content_type=mimetypes.guess_type(piece.fichier.name)[0])
+
+
+piece_fichier.rate_class = 'export'
+
+
+@csrf_exempt
+@require_POST
+@query_budget(max_queries=7, statement_timeout_ms=5000)
+def generer_document(request, modele, pk):
+    """Génère (ou reprend du cache) le document ``modele`` de l'objet et le rattache au dossier"""
+    principal = getattr(request, 'principal', None)
+    if principal is None:
+        return jeton_requis()
+    format = request.GET.get('format', 'pdf')
+    if modele not in documents.MODELES or format not in documents.FORMATS:
+        return JsonResponse({'detail': "Modèle ou format inconnu"}, status=400)
+    try:
+        resultat = documents.generer(modele, [pk], format, acces=acces_requete(request), depose_par_id=principal.id)
+    except documents.DocumentIrrepresentable as exc:
+        return JsonResponse({'detail': str(exc)}, status=422)
+    if pk not in resultat:
+        raise Http404
+    piece, regenere = resultat[pk]
+    return JsonResponse({
+        'piece': piece.pk, 'titre': piece.titre, 'type_piece': piece.type_piece, 'regenere': regenere,
+        'fichier': reverse('piece-fichier', args=[piece.pk]),
+    }, status=201 if regenere else 200)
+
+
+generer_document.rate_class = 'export'
+generer_document.concurrency_class = 'heavy'
+
+
+def jeton_requis():
+    response = JsonResponse({'detail': "Jeton requis"}, status=401)
+    response['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+@query_budget(max_queries=2 + SESSION)
+def inventaire_scelles(request):
+    """Scellés conservés à ``lieu`` ; sans ``lieu``, nombre de scellés par lieu"""
+    acces = acces_requete(request)
+    if 'lieu' not in request.GET:
+        return JsonResponse({'lieux': list(scelles.lieux(acces))})
+    lieu = request.GET['lieu']
+    return JsonResponse({'lieu': lieu, 'scelles': list(scelles.inventaire(lieu, acces)[:list_limit(request)])})
+
+
+@query_budget(max_queries=3 + SESSION)
+def mouvements_scelle(request, pk):
+    """Chaîne de possession d'un scellé et résultat de sa vérification"""
+    scelle = get_object_or_404(Scelle.objects.visibles(acces_requete(request)), pk=pk)
+    mouvements = list(MouvementScelle.objects.filter(scelle=scelle).order_by('rang'))
+    rupture = scelles.rupture(scelle, mouvements)
+    return JsonResponse({'scelle': scelle.pk, 'lieu': scelle.lieu_conservation, 'intacte': rupture is None,
+                         'rupture': rupture, 'mouvements': [{
+                             'rang': mouvement.rang, 'lieu_depart': mouvement.lieu_depart,
+                             'lieu_arrivee': mouvement.lieu_arrivee, 'motif': mouvement.motif,
+                             'observations': mouvement.observations, 'effectue_par': mouvement.effectue_par_id,
+                             'date_mouvement': mouvement.date_mouvement, 'empreinte': mouvement.empreinte,
+                         } for mouvement in mouvements]})
+
+
+inventaire_scelles.replica_actions = mouvements_scelle.replica_actions = ('get',)
+inventaire_scelles.rate_class = mouvements_scelle.rate_class = 'search'
+
+
+@csrf_exempt
+@require_POST
+@query_budget(max_queries=5)
+def transferer_scelles(request, pk):
+    """Transfère tous les scellés du dossier vers ``lieu`` (JSON : ``lieu``, ``motif``, ``observations``)"""
+    principal = getattr(request, 'principal', None)
+    if principal is None:
+        return jeton_requis()
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'detail': "Corps JSON invalide"}, status=400)
+    lieu, motif = str(data.get('lieu', '')).strip(), str(data.get('motif', '')).strip()
+    if not lieu or not motif:
+        return JsonResponse({'detail': "lieu et motif sont requis"}, status=400)
+    mouvements = scelles.transferer_dossier(pk, lieu[:200], motif[:200], acces=acces_requete(request),
+                                            observations=str(data.get('observations', '')),
+                                            effectue_par_id=principal.id)
+    return JsonResponse({'lieu': lieu, 'mouvements': [
+        {'scelle': mouvement.scelle_id, 'rang': mouvement.rang, 'lieu_depart': mouvement.lieu_depart,
+         'empreinte': mouvement.empreinte} for mouvement in mouvements
+    ]})
+
+
+@csrf_exempt
+@require_POST
+@query_budget(max_queries=2)
+def emettre_jeton(request):
+    """Jeton d'accès contre ``username`` et ``password`` (JSON ou formulaire)"""
+    try:
+        data = json.loads(request.body or b'{}') if request.content_type == 'application/json' else request.POST
+    except ValueError:
+        return JsonResponse({'detail': "Corps JSON invalide"}, status=400)
+    user = authenticate(request, username=data.get('username'), password=data.get('password'))
+    if user is None:
+        return JsonResponse({'detail': "Identifiants invalides"}, status=401)
+    try:
+        jeton, principal = jetons.emettre(user)
+    except jetons.JetonInvalide as exc:
+        return JsonResponse({'detail': str(exc)}, status=401)
+    return JsonResponse({'jeton': jeton, 'type': 'Bearer', 'role': principal.role,
+                         'expire': jetons.expiration_iso(principal)})
+
+
+@csrf_exempt
+@require_POST
+@query_budget(max_queries=0)
+def revoquer_jeton(request):
+    """Révoque le jeton qui authentifie la requête"""
+    principal = getattr(request, 'principal', None)
+    if principal is None:
+        return jeton_requis()
+    jetons.revoquer(principal)
+    return HttpResponse(status=204)
+
+
+emettre_jeton.rate_class = 'auth'